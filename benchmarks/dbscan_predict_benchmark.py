@@ -0,0 +1,103 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import scipy as sp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.outliners import DBSCANWrapper
+
+
+def loop_predict(model, X_new):
+    # The per-sample, per-core-point loop DBSCANWrapper.predict used to run
+    y_new = np.ones(shape=len(X_new), dtype=int) * -1
+    for j, x_new in enumerate(X_new):
+        for i, x_core in enumerate(model.components_):
+            if sp.spatial.distance.cosine(x_new, x_core) < model.eps:
+                y_new[j] = model.labels_[model.core_sample_indices_[i]]
+                break
+    return y_new
+
+
+def make_model(core_number, feature_number, eps, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(8, feature_number))
+    X = centers[rng.integers(len(centers), size=core_number)] + rng.normal(scale=0.3, size=(core_number, feature_number))
+    return DBSCANWrapper(eps=eps, min_samples=2, metric='cosine').fit(X), rng
+
+
+def run_benchmark(core_number, sample_number, feature_number, eps, run_loop):
+    model, rng = make_model(core_number, feature_number, eps)
+    X_new = rng.normal(size=(sample_number, feature_number))
+
+    start_time = time.perf_counter()
+    y_new = model.predict(X_new)
+    vectorized_spent = time.perf_counter() - start_time
+
+    loop_spent = None
+    if run_loop:
+        start_time = time.perf_counter()
+        y_loop = loop_predict(model, X_new)
+        loop_spent = time.perf_counter() - start_time
+        assert np.array_equal(y_new, y_loop), "vectorized predict differs from the loop"
+
+    return len(model.components_), vectorized_spent / sample_number, loop_spent and loop_spent / sample_number
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-c",
+        "--core_numbers",
+        type=int,
+        nargs="+",
+        default=[500, 2000, 5000],
+        help="Number of training samples (most of them become core points)",
+    )
+    parser.add_argument(
+        "-n",
+        "--sample_number",
+        type=int,
+        default=2000,
+        help="Number of samples predicted per measurement",
+    )
+    parser.add_argument(
+        "-f",
+        "--feature_number",
+        type=int,
+        default=20,
+        help="Number of features per sample",
+    )
+    parser.add_argument(
+        "-e",
+        "--eps",
+        type=float,
+        default=0.05,
+        help="DBSCAN eps (cosine distance)",
+    )
+    parser.add_argument(
+        "--skip_loop",
+        action="store_true",
+        help="Do not measure (and check against) the reference loop",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    print(f"{'core points':>12} {'us/sample':>12} {'loop us/sample':>16}")
+    for core_number in args.core_numbers:
+        components, per_sample, loop_per_sample = run_benchmark(
+            core_number,
+            args.sample_number,
+            args.feature_number,
+            args.eps,
+            not args.skip_loop
+        )
+        loop_column = f"{loop_per_sample * 1e6:>16.1f}" if loop_per_sample is not None else f"{'-':>16}"
+        print(f"{components:>12} {per_sample * 1e6:>12.1f} {loop_column}")
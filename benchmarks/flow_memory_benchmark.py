@@ -0,0 +1,90 @@
+import gc
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.flow.flow import Flow
+
+
+class FakePacket:
+    __slots__ = ('time', 'length')
+
+    def __init__(self, time, length):
+        self.time = time
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+def make_packets(packet_number):
+    random.seed(0)
+    packets = []
+    current_time = 1000.0
+    for _ in range(packet_number):
+        current_time += random.choice([random.random() * 0.01, random.random() * 0.3])
+        packets.append(FakePacket(current_time, random.choice([66, 1514, random.randint(40, 1500)])))
+    return packets
+
+
+def run_benchmark(flow_number, packet_number, capacity):
+    # Packets are shared by every flow, so only the per-flow state is counted
+    packets = make_packets(packet_number)
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+
+    flows = []
+    for _ in range(flow_number):
+        flow = Flow(capacity=capacity)
+        for packet in packets:
+            flow.add_new_packet(packet)
+        flows.append(flow)
+
+    spent = time.perf_counter() - start_time
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated / flow_number, spent / (flow_number * packet_number)
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-n",
+        "--flow_number",
+        type=int,
+        default=100000,
+        help="Number of flows kept alive at once",
+    )
+    parser.add_argument(
+        "-p",
+        "--packet_numbers",
+        type=int,
+        nargs="+",
+        default=[1, 10, 31],
+        help="Packets added to every flow (the detector keeps at most end_threshold + 1)",
+    )
+    parser.add_argument(
+        "-e",
+        "--end_threshold",
+        type=int,
+        default=30,
+        help="Detector end threshold; flows are created with capacity end_threshold + 1",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    print(f"{'capacity':>10} {'packets':>8} {'bytes/flow':>12} {'us/packet':>10}")
+    for capacity in [None, args.end_threshold + 1]:
+        for packet_number in args.packet_numbers:
+            bytes_per_flow, per_packet = run_benchmark(args.flow_number, packet_number, capacity)
+            print(f"{str(capacity):>10} {packet_number:>8} {bytes_per_flow:>12.0f} {per_packet * 1e6:>10.1f}")
@@ -0,0 +1,97 @@
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils.fslru import FixSizeLRU
+from core.utils.fsbst import FixSizeBST
+
+
+STORAGE_CLASSES = {
+    "lru": FixSizeLRU,
+    "bst": FixSizeBST,
+}
+
+
+def make_flow_key(i):
+    return f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}:{1024 + i % 60000}<-->93.184.216.34:443"
+
+
+def run_benchmark(storage_cls, flow_number, packet_number, new_flow_ratio):
+    storage = storage_cls(flow_number)
+    keys = [make_flow_key(i) for i in range(flow_number)]
+    for key in keys:
+        storage.add_new_node(key, [])
+
+    random.seed(0)
+    next_key = flow_number
+    operations = []
+    for _ in range(packet_number):
+        if random.random() < new_flow_ratio:
+            operations.append(make_flow_key(next_key))
+            next_key += 1
+        else:
+            operations.append(keys[random.randrange(flow_number)])
+
+    start_time = time.perf_counter()
+    for key in operations:
+        # The same access pattern FlowStorage uses per packet
+        if storage.get_value(key) is None:
+            storage.add_new_node(key, [])
+    spent = time.perf_counter() - start_time
+
+    return spent / packet_number
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=STORAGE_CLASSES.keys(),
+        nargs="+",
+        default=["lru"],
+        help="Flow table backends to measure",
+    )
+    parser.add_argument(
+        "-n",
+        "--flow_numbers",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000, 1000000],
+        help="Number of concurrent flows kept in the table",
+    )
+    parser.add_argument(
+        "-p",
+        "--packet_number",
+        type=int,
+        default=200000,
+        help="Number of packets processed per measurement",
+    )
+    parser.add_argument(
+        "-r",
+        "--new_flow_ratio",
+        type=float,
+        default=0.05,
+        help="Share of packets opening a new flow (each one evicts the least recently used flow)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    print(f"{'backend':>8} {'flows':>10} {'ns/packet':>12}")
+    for backend in args.backend:
+        for flow_number in args.flow_numbers:
+            per_packet = run_benchmark(
+                STORAGE_CLASSES[backend],
+                flow_number,
+                args.packet_number,
+                args.new_flow_ratio
+            )
+            print(f"{backend:>8} {flow_number:>10} {per_packet * 1e9:>12.0f}")
@@ -0,0 +1,76 @@
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.models.model_pipeline import ModelPipeline
+
+LOAD_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+sys.path.insert(0, {root!r})
+from core.models.model_pipeline import ModelPipeline
+model_pipeline = ModelPipeline.from_config({path!r})
+print(time.perf_counter() - start_time)
+"""
+
+
+def cold_load_time(path, repeat):
+    # A fresh interpreter per run, so imports and file reads are counted
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", LOAD_SCRIPT.format(root=str(ROOT), path=str(path))],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return min(times)
+
+
+def cached_load_time(path, repeat):
+    ModelPipeline.from_config(path)
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        ModelPipeline.from_config(path)
+    return (time.perf_counter() - start_time) / repeat
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-c",
+        "--model_pipeline_config",
+        type=Path,
+        required=True,
+        help="pipeline_config.json with the step pickles",
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of cold starts per format (the fastest one is reported)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        artifact_path = ModelPipeline.from_config(args.model_pipeline_config).save_artifact(Path(tmp_dir) / "model.vpnm")
+
+        print(f"{'format':>10} {'cold start s':>13} {'repeated load ms':>17}")
+        for name, path in (("pickles", args.model_pipeline_config), ("artifact", artifact_path)):
+            print(
+                f"{name:>10} {cold_load_time(path, args.repeat):>13.2f} "
+                f"{cached_load_time(path, 20) * 1e3:>17.2f}"
+            )
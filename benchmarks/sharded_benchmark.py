@@ -0,0 +1,131 @@
+import sys
+import time
+import resource
+import random
+import argparse
+from pathlib import Path
+from scapy.all import Ether, IP, TCP
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.models.model_pipeline import ModelPipeline
+from core.sniffer.packet_decoder import decode_packet
+from core.sniffer.detect_worker import DetectWorker
+from core.sniffer.sharded_worker import ShardedDetector
+
+
+def make_records(flow_number, packet_number, concurrent_flows):
+    # `concurrent_flows` flows are open at a time and their packets interleave, like on a busy link
+    random.seed(0)
+    records = []
+    for flow_index in range(flow_number):
+        host = f"10.{(flow_index >> 16) & 0xff}.{(flow_index >> 8) & 0xff}.{flow_index & 0xff}"
+        sport = 1024 + flow_index % 60000
+        start_time = 1000.0 + (flow_index // concurrent_flows) * 0.5
+        for i in range(packet_number):
+            if i % 2:
+                packet = IP(src="93.184.216.34", dst=host) / TCP(sport=443, dport=sport)
+            else:
+                packet = IP(src=host, dst="93.184.216.34") / TCP(sport=sport, dport=443)
+            frame = bytes(Ether(src="00:00:00:00:00:01", dst="00:00:00:00:00:02") / packet / (b"x" * random.randrange(40, 1400)))
+            records.append(decode_packet(frame, start_time + i * 0.01 + random.random() * 0.005))
+    records.sort(key=lambda record: record.time)
+    return records
+
+
+def cpu_time(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_benchmark(model_pipeline_config, worker_number, records, start_threshold, end_threshold):
+    """
+    Wall time of feeding `records` through the detector and its verdict number, with the
+    CPU time spent in this process (routing and pickling for shards) and in the shard processes.
+    """
+    worker_kwargs = dict(
+        start_packet_number_threshold=start_threshold,
+        end_packet_number_threshold=end_threshold,
+        flow_storage_size=100000
+    )
+    verdicts = []
+    if worker_number == 1:
+        consumer = DetectWorker(ModelPipeline.from_config(model_pipeline_config), verdict_callback=verdicts.append, **worker_kwargs)
+    else:
+        consumer = ShardedDetector(model_pipeline_config, worker_number, verdict_callback=verdicts.append, **worker_kwargs)
+
+    start_time = time.perf_counter()
+    start_cpu_time = cpu_time(resource.RUSAGE_SELF)
+    start_shard_cpu_time = cpu_time(resource.RUSAGE_CHILDREN)
+    for record in records:
+        consumer.process_packet(record)
+    consumer.flush(expire_flows=True)
+    spent = time.perf_counter() - start_time
+    coordinator_cpu_time = cpu_time(resource.RUSAGE_SELF) - start_cpu_time
+
+    if worker_number > 1:
+        # Shard CPU time is known once the processes are joined; it includes loading the model
+        consumer.stop()
+    shard_cpu_time = cpu_time(resource.RUSAGE_CHILDREN) - start_shard_cpu_time
+    return spent, len(verdicts), coordinator_cpu_time, shard_cpu_time
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-c",
+        "--model_pipeline_config",
+        type=Path,
+        required=True,
+        help="pipeline_config.json (or artifact) every worker loads",
+    )
+    parser.add_argument(
+        "-w",
+        "--worker_numbers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+        help="Detector process counts to measure (1 is a single DetectWorker)",
+    )
+    parser.add_argument(
+        "-n",
+        "--flow_number",
+        type=int,
+        default=4000,
+        help="Number of flows in the generated capture",
+    )
+    parser.add_argument(
+        "-p",
+        "--packet_number",
+        type=int,
+        default=30,
+        help="Packets per flow",
+    )
+    parser.add_argument(
+        "--concurrent_flows",
+        type=int,
+        default=500,
+        help="Flows open at the same time",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    records = make_records(args.flow_number, args.packet_number, args.concurrent_flows)
+    print(f"{'workers':>8} {'packets/s':>12} {'verdicts':>9} {'main CPU us/packet':>19} {'shard CPU us/packet':>20}")
+    for worker_number in args.worker_numbers:
+        spent, verdict_number, coordinator_cpu_time, shard_cpu_time = run_benchmark(
+            args.model_pipeline_config,
+            worker_number,
+            records,
+            args.packet_number - 3,
+            args.packet_number
+        )
+        print(
+            f"{worker_number:>8} {len(records) / spent:>12.0f} {verdict_number:>9} "
+            f"{coordinator_cpu_time / len(records) * 1e6:>19.1f} {shard_cpu_time / len(records) * 1e6:>20.1f}"
+        )
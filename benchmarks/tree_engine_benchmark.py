@@ -0,0 +1,87 @@
+import sys
+import time
+import pickle
+import argparse
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.tree_ensemble import FlatTreeEnsemble
+
+MODELS_PATH = Path(__file__).resolve().parent.parent / "models"
+
+
+def load_classifiers(models_path):
+    for path in sorted(models_path.glob("*/*.pkl")):
+        if path.stem not in ("clf", "classifier") and not path.stem.startswith("gradientboost"):
+            continue
+        try:
+            with open(path, "rb") as f:
+                yield path, pickle.load(f)
+        except Exception as error:
+            print(f"skip {path.parent.name}: {error}")
+
+
+def rows_per_second(predict, X, batch_size, repeat):
+    batches = [X[start:start + batch_size] for start in range(0, len(X), batch_size)]
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for batch in batches:
+            predict(batch)
+    return repeat * len(X) / (time.perf_counter() - start_time)
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-p",
+        "--models_path",
+        type=Path,
+        default=MODELS_PATH,
+        help="Directory with model directories",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch_sizes",
+        type=int,
+        nargs="+",
+        default=[1, 64, 1024],
+        help="Rows per predict call",
+    )
+    parser.add_argument(
+        "-n",
+        "--row_number",
+        type=int,
+        default=2048,
+        help="Rows predicted per measurement",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    warnings.simplefilter("ignore")
+    rng = np.random.default_rng(0)
+
+    print(f"{'model':>50} {'classifier':>28} {'batch':>6} {'sklearn rows/s':>15} {'flat rows/s':>12}")
+    for path, classifier in load_classifiers(args.models_path):
+        flat = FlatTreeEnsemble.compile(classifier)
+        if flat is None:
+            print(f"{path.parent.name:>50} {type(classifier).__name__:>28} not supported, sklearn is used")
+            continue
+
+        X = rng.normal(size=(args.row_number, classifier.n_features_in_))
+        assert np.array_equal(flat.predict(X), classifier.predict(X)), f"{path}: predictions differ"
+        for batch_size in args.batch_sizes:
+            # Single-row sklearn calls are slow, measure them on fewer rows
+            sklearn_X = X[:min(len(X), 64 * batch_size)]
+            print(
+                f"{path.parent.name:>50} {type(classifier).__name__:>28} {batch_size:>6} "
+                f"{rows_per_second(classifier.predict, sklearn_X, batch_size, 1):>15.0f} "
+                f"{rows_per_second(flat.predict, X, batch_size, 1):>12.0f}"
+            )
@@ -0,0 +1,116 @@
+import os
+import glob
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+import pandas as pd
+from core.feature.columnar_features import extract_pcap_features
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        description="Build training datasets from pcap/pcapng files with the columnar feature engine",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "pcap",
+        type=str,
+        nargs="+",
+        help="Capture files (glob patterns are expanded)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output_dir",
+        type=Path,
+        default=None,
+        help="Directory for the datasets (default: next to every capture)",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=["csv", "parquet"],
+        default="csv",
+        help="Dataset file format",
+    )
+    parser.add_argument(
+        "--vpn_host",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Flows with one of these addresses are labeled vpn, all others normal",
+    )
+    parser.add_argument(
+        "--packet_number",
+        type=int,
+        default=31,
+        help="Features are extracted from the first packets of a flow",
+    )
+    parser.add_argument(
+        "--min_packet_number",
+        type=int,
+        default=27,
+        help="Flows with fewer packets are skipped",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Captures processed in parallel",
+    )
+    return parser
+
+
+def create_label(df, vpn_hosts):
+    is_vpn = pd.Series(False, index=df.index)
+    for vpn_host in vpn_hosts:
+        is_vpn |= df['Flow'].str.contains(vpn_host, regex=False)
+
+    normal_df = df[~is_vpn].copy()
+    normal_df['label'] = 'normal'
+
+    vpn_df = df[is_vpn].copy()
+    vpn_df['label'] = 'vpn'
+
+    return pd.concat([normal_df, vpn_df], ignore_index=True)
+
+
+def build_dataset(pcap_path, output_path, vpn_hosts, packet_number, min_packet_number):
+    start_time = time.perf_counter()
+    df = create_label(extract_pcap_features(pcap_path, packet_number, min_packet_number), vpn_hosts)
+    if output_path.suffix == ".parquet":
+        df.to_parquet(output_path, index=False)
+    else:
+        df.to_csv(output_path)
+    return pcap_path, output_path, len(df), time.perf_counter() - start_time
+
+
+def _build_dataset(task):
+    return build_dataset(*task)
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    pcap_paths = [Path(path) for pattern in args.pcap for path in (sorted(glob.glob(pattern)) or [pattern])]
+
+    tasks = []
+    for pcap_path in pcap_paths:
+        output_dir = args.output_dir or pcap_path.parent
+        output_path = output_dir.joinpath(pcap_path.with_suffix("." + args.format).name)
+        tasks.append((pcap_path, output_path, args.vpn_host, args.packet_number, args.min_packet_number))
+
+    jobs = max(1, min(args.jobs, len(tasks)))
+    if jobs == 1:
+        results = map(_build_dataset, tasks)
+    else:
+        # Every capture is read and extracted in its own process
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(_build_dataset, tasks)
+
+    for pcap_path, output_path, flow_number, time_spent in results:
+        print(f"{pcap_path}: {flow_number} flows -> {output_path} in {time_spent:.2f}s")
+
+    if jobs > 1:
+        pool.close()
+        pool.join()
@@ -0,0 +1,312 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from .feature import InterpacketIntervalFeature, PacketLengthFeature
+from .feature_storage import FeatureStorage
+from .packet_windows import PacketWindows
+from .interval_feature import (
+    InterpacketIntervalFunctionPerTimeFeature,
+    PacketLengthFunctionPerTimeFeature,
+    PacketNumberPerTimeFeature
+)
+from ..sniffer.pcap_sniffer import PcapSniffer
+from ..utils.filter_outliners import segment_outliner_mask
+
+
+def segment_offsets(segment_lengths):
+    offsets = np.zeros(len(segment_lengths), dtype=np.intp)
+    np.cumsum(segment_lengths[:-1], out=offsets[1:])
+    return offsets
+
+
+def reduce_segments(values, segment_lengths, reduce_rows):
+    """
+    Reduces every segment of `values` with `reduce_rows`, a function of the rows of a 2D array.
+
+    Segments of the same length are stacked into one matrix, so NumPy reduces each of them
+    exactly as it would reduce the segment on its own (the same pairwise summation order).
+    Segments must not be empty.
+    """
+    segment_lengths = np.asarray(segment_lengths, dtype=np.intp)
+    offsets = segment_offsets(segment_lengths)
+    result = np.empty(len(segment_lengths), dtype=np.float64)
+    for length in np.unique(segment_lengths):
+        segments = np.flatnonzero(segment_lengths == length)
+        result[segments] = reduce_rows(values[offsets[segments, None] + np.arange(length)])
+    return result
+
+
+def write_aggregated_features(values, segment_lengths, out):
+    """Columnar write_aggregated_feature: max, min, std, mean of every segment, NaN for empty ones."""
+    out[:] = np.nan
+    segments = np.flatnonzero(segment_lengths)
+    segment_lengths = segment_lengths[segments]
+    out[segments, 0] = reduce_segments(values, segment_lengths, lambda rows: np.max(rows, axis=1))
+    out[segments, 1] = reduce_segments(values, segment_lengths, lambda rows: np.min(rows, axis=1))
+    out[segments, 2] = reduce_segments(values, segment_lengths, lambda rows: np.std(rows, axis=1))
+    out[segments, 3] = reduce_segments(values, segment_lengths, lambda rows: np.mean(rows, axis=1))
+
+
+class FlowColumns:
+    __slots__ = ('flow_number', 'packet_numbers', 'offsets', 'flow_index', 'times', 'lengths')
+
+    def __init__(self, flow_ids, times, lengths, flow_number=None):
+        """
+        Packets of many flows as columns, grouped by flow and in arrival order inside a flow.
+
+        Parameters:
+        - flow_ids (np.ndarray): Flow number of every packet, 0 <= id < flow_number.
+        - times (np.ndarray): Packet times in seconds, in arrival order.
+        - lengths (np.ndarray): Packet lengths.
+        - flow_number (int): Number of flows, by default max(flow_ids) + 1.
+        """
+        flow_ids = np.asarray(flow_ids, dtype=np.intp)
+        if flow_number is None:
+            flow_number = int(flow_ids.max()) + 1 if len(flow_ids) else 0
+        order = np.argsort(flow_ids, kind='stable')
+
+        self.flow_number = flow_number
+        self.flow_index = flow_ids[order]
+        self.times = np.asarray(times, dtype=np.float64)[order]
+        # The same dtype as PacketHistory keeps
+        self.lengths = np.asarray(lengths, dtype=np.int32)[order]
+        self.packet_numbers = np.bincount(self.flow_index, minlength=flow_number)
+        self.offsets = segment_offsets(self.packet_numbers)
+
+    def __len__(self):
+        return self.flow_number
+
+    def packet_positions(self):
+        """Position of every packet inside its flow."""
+        return np.arange(len(self.times)) - self.offsets[self.flow_index]
+
+    def select(self, flows):
+        """Columns of the given flows only, renumbered in the given order."""
+        new_ids = np.full(self.flow_number, -1, dtype=np.intp)
+        new_ids[flows] = np.arange(len(flows))
+        packet_ids = new_ids[self.flow_index]
+        kept = packet_ids >= 0
+        return FlowColumns(packet_ids[kept], self.times[kept], self.lengths[kept], len(flows))
+
+
+class ColumnarWindows:
+    def __init__(self, max_interpacket_interval_time, columns):
+        """
+        PacketWindows of every flow at once.
+
+        A packet starts a window when it comes max_interpacket_interval_time or later after the
+        start of the current window of its flow. That depends on the previous window, so the
+        packets are walked by their position in the flow: one vectorized step over all flows
+        per position.
+        """
+        self.max_interpacket_interval_time = max_interpacket_interval_time
+        self.columns = columns
+        self.window_starts = self._find_window_starts()
+        self.start_positions = np.flatnonzero(self.window_starts)
+        self.window_sizes = np.diff(np.append(self.start_positions, len(self.window_starts)))
+        self.window_flows = columns.flow_index[self.start_positions]
+
+    def _find_window_starts(self):
+        columns = self.columns
+        positions = columns.packet_positions()
+        packets_by_position = np.argsort(positions, kind='stable')
+        position_bounds = np.searchsorted(positions[packets_by_position], np.arange(positions.max(initial=-1) + 2))
+
+        window_starts = np.zeros(len(positions), dtype=bool)
+        # 0 is falsy like the None PacketWindows starts with, so the first packet always starts a window
+        current_interval_time = np.zeros(columns.flow_number, dtype=np.float64)
+        for position in range(len(position_bounds) - 1):
+            packets = packets_by_position[position_bounds[position]:position_bounds[position + 1]]
+            flows = columns.flow_index[packets]
+            packet_times = columns.times[packets]
+            current = current_interval_time[flows]
+            starts = (current == 0) | (packet_times - current >= self.max_interpacket_interval_time)
+            current_interval_time[flows[starts]] = packet_times[starts]
+            window_starts[packets] = starts
+        return window_starts
+
+    def _filter_windows(self, values, window_sizes, min_window_size):
+        kept_windows = window_sizes > min_window_size
+        values = values[np.repeat(kept_windows, window_sizes)]
+        window_sizes = window_sizes[kept_windows]
+        window_flows = self.window_flows[kept_windows]
+
+        mask = segment_outliner_mask(values, window_sizes)
+        kept_numbers = np.bincount(np.repeat(np.arange(len(window_sizes)), window_sizes)[mask], minlength=len(window_sizes))
+        not_empty = kept_numbers > 0
+        return values[mask], kept_numbers[not_empty], window_flows[not_empty]
+
+    def filtered_intervals(self):
+        """Filtered interval values, their window sizes and the flow of every window."""
+        times = self.columns.times
+        intervals = times - np.repeat(times[self.start_positions], self.window_sizes)
+        # The first packet of a window has no interval
+        return self._filter_windows(intervals[~self.window_starts], self.window_sizes - 1, PacketWindows.MIN_INTERVAL_WINDOW_SIZE)
+
+    def filtered_lengths(self):
+        """Filtered packet lengths, their window sizes and the flow of every window."""
+        return self._filter_windows(self.columns.lengths, self.window_sizes, PacketWindows.MIN_LENGTH_WINDOW_SIZE)
+
+
+class ColumnarFeatureStorage:
+    def __init__(self, columns):
+        """
+        Every FeatureStorage feature of many flows, computed with vectorized group-by operations.
+
+        The result is bit for bit the feature vector FeatureStorage gives after the same packets:
+        NumPy reductions are applied to the same values in the same order, only over whole
+        columns instead of one flow at a time.
+
+        Parameters:
+        - columns (FlowColumns): Packets of the flows.
+        """
+        self.columns = columns
+        self.schema = FeatureStorage.get_schema()
+        self._windows = {}
+
+    def _get_windows(self, max_interpacket_interval_time):
+        windows = self._windows.get(max_interpacket_interval_time)
+        if windows is None:
+            windows = ColumnarWindows(max_interpacket_interval_time, self.columns)
+            self._windows[max_interpacket_interval_time] = windows
+        return windows
+
+    def _write_interpacket_interval(self, params, out):
+        columns = self.columns
+        sorted_times = columns.times[np.lexsort((columns.times, columns.flow_index))]
+        intervals = np.diff(sorted_times)[columns.flow_index[1:] == columns.flow_index[:-1]]
+
+        out[:] = np.nan
+        flows = np.flatnonzero(columns.packet_numbers >= 2)
+        interval_numbers = columns.packet_numbers[flows] - 1
+        interval_offsets = segment_offsets(interval_numbers)
+        sum_intervals = sorted_times[columns.offsets[flows] + interval_numbers] - sorted_times[columns.offsets[flows]]
+        out[flows, 0] = np.maximum.reduceat(intervals, interval_offsets) if len(flows) else []
+        out[flows, 1] = np.minimum.reduceat(intervals, interval_offsets) if len(flows) else []
+        out[flows, 2] = sum_intervals / interval_numbers
+        out[flows, 3] = sum_intervals
+
+    def _write_packet_length(self, params, out):
+        columns = self.columns
+        out[:] = np.nan
+        flows = np.flatnonzero(columns.packet_numbers)
+        if not len(flows):
+            return
+
+        lengths = columns.lengths.astype(np.int64)
+        offsets = columns.offsets[flows]
+        sum_lengths = np.add.reduceat(lengths, offsets)
+        out[flows, 0] = np.maximum.reduceat(lengths, offsets)
+        out[flows, 1] = np.minimum.reduceat(lengths, offsets)
+        out[flows, 2] = sum_lengths / columns.packet_numbers[flows]
+        out[flows, 3] = sum_lengths
+
+        # statistics.mode() semantics: the most common length, ties go to the one seen first
+        order = np.lexsort((lengths, columns.flow_index))
+        group_starts = np.flatnonzero(np.diff(columns.flow_index[order]) | np.diff(lengths[order]))
+        group_starts = np.concatenate(([0], group_starts + 1))
+        group_counts = np.diff(np.append(group_starts, len(order)))
+        group_first_seen = np.minimum.reduceat(order, group_starts)
+        group_flows = columns.flow_index[order[group_starts]]
+        best = np.lexsort((group_first_seen, -group_counts, group_flows))
+        best = best[np.concatenate(([True], np.diff(group_flows[best]) != 0))]
+        out[group_flows[best], 4] = lengths[group_first_seen[best]]
+
+    def _write_window_feature(self, window_values, func, out):
+        values, window_sizes, window_flows = window_values
+        window_results = reduce_segments(values, window_sizes, func.reduce_rows)
+        write_aggregated_features(window_results, np.bincount(window_flows, minlength=self.columns.flow_number), out)
+
+    def _write_interval_function_per_time(self, params, out):
+        windows = self._get_windows(params['max_interpacket_interval_time'])
+        self._write_window_feature(windows.filtered_intervals(), params['func'], out)
+
+    def _write_length_function_per_time(self, params, out):
+        windows = self._get_windows(params['max_interpacket_interval_time'])
+        self._write_window_feature(windows.filtered_lengths(), params['func'], out)
+
+    def _write_packet_number_per_time(self, params, out):
+        windows = self._get_windows(params['max_interpacket_interval_time'])
+        write_aggregated_features(
+            windows.window_sizes,
+            np.bincount(windows.window_flows, minlength=self.columns.flow_number),
+            out
+        )
+
+    FEATURE_WRITERS = {
+        InterpacketIntervalFeature: _write_interpacket_interval,
+        PacketLengthFeature: _write_packet_length,
+        InterpacketIntervalFunctionPerTimeFeature: _write_interval_function_per_time,
+        PacketLengthFunctionPerTimeFeature: _write_length_function_per_time,
+        PacketNumberPerTimeFeature: _write_packet_number_per_time,
+    }
+
+    def get_feature_matrix(self, out=None):
+        """Feature vectors of all flows, one row per flow in schema order."""
+        if out is None:
+            out = self.schema.empty(len(self.columns))
+
+        for (feature_type, params), feature_slice in zip(FeatureStorage.FEATURE_SPECS, FeatureStorage._feature_slices):
+            self.FEATURE_WRITERS[feature_type](self, params, out[:, feature_slice])
+        return out
+
+    def get_features(self):
+        return pd.DataFrame(self.get_feature_matrix(), columns=self.schema.feature_names)
+
+
+def read_flow_columns(pcap_path, packet_number=None):
+    """
+    Decodes a pcap/pcapng file into FlowColumns with the detector's packet decoder.
+
+    Parameters:
+    - pcap_path: Capture file.
+    - packet_number (int): Packets kept per flow, the first ones; None keeps all.
+
+    Returns:
+    - (list, FlowColumns): Flow keys in the order of their first packet and the packets of the flows.
+    """
+    flow_ids = {}
+    flow_keys = []
+    packet_numbers = []
+    ids, times, lengths = array('q'), array('d'), array('q')
+
+    for record in PcapSniffer(None, [pcap_path]).read_records(pcap_path):
+        flow_id = flow_ids.get(record.flow_key)
+        if flow_id is None:
+            flow_id = len(flow_keys)
+            flow_ids[record.flow_key] = flow_id
+            flow_keys.append(record.flow_key)
+            packet_numbers.append(0)
+        elif packet_number is not None and packet_numbers[flow_id] >= packet_number:
+            continue
+        packet_numbers[flow_id] += 1
+        ids.append(flow_id)
+        times.append(record.time)
+        lengths.append(record.wirelen)
+
+    columns = FlowColumns(
+        np.frombuffer(ids, dtype=np.int64),
+        np.frombuffer(times, dtype=np.float64),
+        np.frombuffer(lengths, dtype=np.int64),
+        len(flow_keys)
+    )
+    return flow_keys, columns
+
+
+def extract_pcap_features(pcap_path, packet_number=31, min_packet_number=27):
+    """
+    Feature rows of every flow of a capture, like the rows the per-flow dataset builder writes.
+
+    Every flow gets its first `packet_number` packets; flows with fewer than
+    `min_packet_number` of them are skipped.
+
+    Returns:
+    - pd.DataFrame: A "Flow" column followed by the FeatureStorage schema columns.
+    """
+    flow_keys, columns = read_flow_columns(pcap_path, packet_number)
+    flows = np.flatnonzero(columns.packet_numbers >= min_packet_number)
+    features = ColumnarFeatureStorage(columns.select(flows)).get_features()
+    features.insert(0, "Flow", [str(flow_keys[flow]) for flow in flows])
+    return features
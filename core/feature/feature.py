@@ -1,19 +1,37 @@
 import abc
-import statistics
+import math
 import pandas as pd
 import numpy as np
 from scapy.all import *
 
+from ..utils.ring_buffer import RingBuffer
+
 
 class FeatureInterface(abc.ABC):
-    @abc.abstractmethod
+    __slots__ = ()
+
     def extract_feature(self, packet):
+        self.extract_values(float(packet.time), len(packet))
+
+    @abc.abstractmethod
+    def extract_values(self, packet_time, packet_length):
+        """Adds a packet given its time (float seconds) and length; FeatureStorage reads both once per packet."""
         pass
 
     @abc.abstractmethod
-    def get_feature(self):
+    def get_feature_names(self):
         pass
 
+    @abc.abstractmethod
+    def write_feature(self, out):
+        """Writes the feature values into `out`, a float64 array of len(get_feature_names())."""
+        pass
+
+    def get_feature(self):
+        row = np.empty((1, len(self.get_feature_names())), dtype=np.float64)
+        self.write_feature(row[0])
+        return pd.DataFrame(row, columns=self.get_feature_names())
+
     @abc.abstractmethod
     def get_time_series_feature(self):
         pass
@@ -23,34 +41,81 @@ class InterpacketIntervalFeature(FeatureInterface):
     MIN_INTERPACKET_INTERVAL = "min_interpacket_interval"
     AVG_INTERPACKET_INTERVAL = "avg_interpacket_interval"
     SUM_INTERPACKET_INTERVAL = "sum_interpacket_interval"
-
-    def __init__(self):
-        self.packet_times = []
-
-    def extract_feature(self, packet):
-        self.packet_times.append(float(packet.time))
+    FEATURE_NAMES = [
+        MAX_INTERPACKET_INTERVAL,
+        MIN_INTERPACKET_INTERVAL,
+        AVG_INTERPACKET_INTERVAL,
+        SUM_INTERPACKET_INTERVAL,
+    ]
+    __slots__ = ('packet_times', '_last_time', '_min_interval', '_max_interval', '_max_interval_dirty')
+
+    def __init__(self, capacity=None):
+        # Kept sorted: out-of-order packets are inserted in place
+        self.packet_times = RingBuffer(capacity)
+        # The latest time, packet_times[-1]
+        self._last_time = None
+        self._min_interval = math.inf
+        self._max_interval = -math.inf
+        self._max_interval_dirty = False
+
+    def _update_interval_bounds(self, interval):
+        if interval < self._min_interval:
+            self._min_interval = interval
+        if interval > self._max_interval:
+            self._max_interval = interval
+
+    def _insert_packet_time(self, packet_time):
+        packet_times = self.packet_times.values()
+        index = int(np.searchsorted(packet_times, packet_time, side='right'))
+        next_time = packet_times[index]
+
+        if index == 0:
+            self._update_interval_bounds(next_time - packet_time)
+        else:
+            # The packet splits one interval in two: the minimum can only drop,
+            # the maximum has to be recomputed if the split interval was the maximum
+            previous_time = packet_times[index - 1]
+            split_interval = next_time - previous_time
+            if split_interval >= self._max_interval:
+                self._max_interval_dirty = True
+            self._update_interval_bounds(packet_time - previous_time)
+            self._update_interval_bounds(next_time - packet_time)
+
+        self.packet_times.insert(index, packet_time)
+
+    def extract_values(self, packet_time, packet_length):
+        if self._last_time is None:
+            self._last_time = packet_time
+            self.packet_times.append(packet_time)
+        elif packet_time >= self._last_time:
+            self._update_interval_bounds(packet_time - self._last_time)
+            self._last_time = packet_time
+            self.packet_times.append(packet_time)
+        else:
+            self._insert_packet_time(packet_time)
 
     def get_interpacket_intervals(self):
-        self.packet_times = sorted(self.packet_times)
-        return [b - a for a, b in zip(self.packet_times, self.packet_times[1:])]
+        return np.diff(self.packet_times.values())
 
-    def get_feature(self):
-        interpacket_intervals = self.get_interpacket_intervals()
+    def _get_max_interval(self):
+        if self._max_interval_dirty:
+            self._max_interval = max(self.get_interpacket_intervals())
+            self._max_interval_dirty = False
+        return self._max_interval
 
-        data = {}
+    def get_feature_names(self):
+        return self.FEATURE_NAMES
 
+    def write_feature(self, out):
         if len(self.packet_times) < 2:
-            data[self.MAX_INTERPACKET_INTERVAL] = [np.nan]
-            data[self.MIN_INTERPACKET_INTERVAL] = [np.nan]
-            data[self.AVG_INTERPACKET_INTERVAL] = [np.nan]
-            data[self.SUM_INTERPACKET_INTERVAL] = [np.nan]
-        else:
-            data[self.MAX_INTERPACKET_INTERVAL] = [np.max(interpacket_intervals)]
-            data[self.MIN_INTERPACKET_INTERVAL] = [np.min(interpacket_intervals)]
-            data[self.AVG_INTERPACKET_INTERVAL] = [np.mean(interpacket_intervals)]
-            data[self.SUM_INTERPACKET_INTERVAL] = [self.packet_times[-1] - self.packet_times[0]]
+            out[:] = np.nan
+            return
 
-        return pd.DataFrame(data)
+        sum_interval = float(self.packet_times[-1] - self.packet_times[0])
+        out[0] = self._get_max_interval()
+        out[1] = self._min_interval
+        out[2] = sum_interval / (len(self.packet_times) - 1)
+        out[3] = sum_interval
 
     def get_time_series_feature(self):
         return pd.DataFrame(self.get_interpacket_intervals(), columns=['interpacket_interval']) 
@@ -62,30 +127,72 @@ class PacketLengthFeature(FeatureInterface):
     AVG_PACKET_LENGTH = "avg_packet_length"
     SUM_PACKET_LENGTH = "sum_packet_length"
     MODE_PACKET_LENGTH = "mode_packet_length"
-
-    def __init__(self):
-        self.packet_lengths = []
-
-    def extract_feature(self, packet):
-        self.packet_lengths.append(len(packet))
-
-    def get_feature(self):
-        data = {}
-
-        if len(self.packet_lengths) < 1:
-            data[self.MAX_PACKET_LENGTH] = [np.nan] # TODO: Add list?
-            data[self.MIN_PACKET_LENGTH] = [np.nan]
-            data[self.AVG_PACKET_LENGTH] = [np.nan]
-            data[self.SUM_PACKET_LENGTH] = [np.nan]
-            data[self.MODE_PACKET_LENGTH] = [np.nan]
-        else:
-            data[self.MAX_PACKET_LENGTH] = [np.max(self.packet_lengths)]
-            data[self.MIN_PACKET_LENGTH] = [np.min(self.packet_lengths)]
-            data[self.AVG_PACKET_LENGTH] = [np.mean(self.packet_lengths)]
-            data[self.SUM_PACKET_LENGTH] = [np.sum(self.packet_lengths)]
-            data[self.MODE_PACKET_LENGTH] = [statistics.mode(self.packet_lengths)]
-
-        return pd.DataFrame(data)
+    FEATURE_NAMES = [
+        MAX_PACKET_LENGTH,
+        MIN_PACKET_LENGTH,
+        AVG_PACKET_LENGTH,
+        SUM_PACKET_LENGTH,
+        MODE_PACKET_LENGTH,
+    ]
+    __slots__ = (
+        'packet_lengths', '_packet_number', '_min_length', '_max_length', '_sum_length',
+        '_length_first_seen', '_length_counts', '_mode_length', '_mode_count'
+    )
+
+    def __init__(self, capacity=None):
+        self.packet_lengths = RingBuffer(capacity, dtype=np.int32)
+        self._packet_number = 0
+        self._min_length = math.inf
+        self._max_length = -math.inf
+        self._sum_length = 0
+
+        # statistics.mode() semantics: the most common value, ties go to the one seen first.
+        # Lengths map to their first-seen index, counts are kept by that index
+        self._length_first_seen = {}
+        self._length_counts = []
+        self._mode_length = None
+        self._mode_count = 0
+
+    def _update_mode(self, packet_length):
+        first_seen = self._length_first_seen.get(packet_length)
+        if first_seen is None:
+            first_seen = len(self._length_counts)
+            self._length_first_seen[packet_length] = first_seen
+            self._length_counts.append(0)
+        count = self._length_counts[first_seen] + 1
+        self._length_counts[first_seen] = count
+
+        if count > self._mode_count or (
+            count == self._mode_count
+            and first_seen < self._length_first_seen[self._mode_length]
+        ):
+            self._mode_length = packet_length
+            self._mode_count = count
+
+    def extract_values(self, packet_time, packet_length):
+        self.packet_lengths.append(packet_length)
+        self._packet_number += 1
+
+        if packet_length < self._min_length:
+            self._min_length = packet_length
+        if packet_length > self._max_length:
+            self._max_length = packet_length
+        self._sum_length += packet_length
+        self._update_mode(packet_length)
+
+    def get_feature_names(self):
+        return self.FEATURE_NAMES
+
+    def write_feature(self, out):
+        if self._packet_number < 1:
+            out[:] = np.nan
+            return
+
+        out[0] = self._max_length
+        out[1] = self._min_length
+        out[2] = self._sum_length / self._packet_number
+        out[3] = self._sum_length
+        out[4] = self._mode_length
 
     def get_time_series_feature(self):
-        return pd.DataFrame(self.packet_lengths, columns=['packet_length']) 
+        return pd.DataFrame(self.packet_lengths.values(), columns=['packet_length']) 
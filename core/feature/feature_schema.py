@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+
+class FeatureSchema:
+    """Fixed order of feature columns and the lookups a model needs to select its own columns."""
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        self.feature_index = {name: i for i, name in enumerate(self.feature_names)}
+        self._indices_cache = {}
+
+    def __len__(self):
+        return len(self.feature_names)
+
+    def indices_for(self, feature_names):
+        """Column indices of `feature_names` in this schema, computed once per column list."""
+        key = tuple(feature_names)
+        indices = self._indices_cache.get(key)
+        if indices is None:
+            missing = [name for name in key if name not in self.feature_index]
+            if missing:
+                raise KeyError(f"Features {missing} are not in the feature schema")
+            indices = np.array([self.feature_index[name] for name in key], dtype=np.intp)
+            self._indices_cache[key] = indices
+        return indices
+
+    def empty(self, rows=None):
+        if rows is None:
+            return np.empty(len(self), dtype=np.float64)
+        return np.empty((rows, len(self)), dtype=np.float64)
+
+    def to_frame(self, X):
+        return pd.DataFrame(np.atleast_2d(X), columns=self.feature_names)
@@ -1,7 +1,10 @@
 import pandas as pd
 
 from .feature import InterpacketIntervalFeature, PacketLengthFeature
+from .feature_schema import FeatureSchema
+from .packet_windows import PacketHistory, PacketWindows
 from .interval_feature import (
+    WindowFeature,
     InterpacketIntervalFunctionPerTimeFeature,
     PacketLengthFunctionPerTimeFeature,
     PacketNumberPerTimeFeature,
@@ -10,34 +13,94 @@ from .interval_feature import (
 )
 
 class FeatureStorage:
-    def __init__(self):
-        self.features = [
-            InterpacketIntervalFeature(),
-            PacketLengthFeature(),
-            InterpacketIntervalFunctionPerTimeFeature(func=MeanFunction()),
-            InterpacketIntervalFunctionPerTimeFeature(func=SumFunction()),
-            InterpacketIntervalFunctionPerTimeFeature(func=MeanFunction(), max_interpacket_interval_time=0.05),
-            InterpacketIntervalFunctionPerTimeFeature(func=SumFunction(), max_interpacket_interval_time=0.05),
-            PacketLengthFunctionPerTimeFeature(func=MeanFunction()),
-            PacketLengthFunctionPerTimeFeature(func=SumFunction()),
-            PacketLengthFunctionPerTimeFeature(func=MeanFunction(), max_interpacket_interval_time=0.05),
-            PacketLengthFunctionPerTimeFeature(func=SumFunction(), max_interpacket_interval_time=0.05),
-            PacketNumberPerTimeFeature(),
-        ]
+    # Shared by every instance, built on first use
+    schema = None
+    _feature_slices = None
+
+    # Feature types and their parameters, in schema order.
+    # Window features are given the shared PacketWindows of their window size
+    FEATURE_SPECS = [
+        (InterpacketIntervalFeature, {}),
+        (PacketLengthFeature, {}),
+        (InterpacketIntervalFunctionPerTimeFeature, {'func': MeanFunction(), 'max_interpacket_interval_time': 0.2}),
+        (InterpacketIntervalFunctionPerTimeFeature, {'func': SumFunction(), 'max_interpacket_interval_time': 0.2}),
+        (InterpacketIntervalFunctionPerTimeFeature, {'func': MeanFunction(), 'max_interpacket_interval_time': 0.05}),
+        (InterpacketIntervalFunctionPerTimeFeature, {'func': SumFunction(), 'max_interpacket_interval_time': 0.05}),
+        (PacketLengthFunctionPerTimeFeature, {'func': MeanFunction(), 'max_interpacket_interval_time': 0.2}),
+        (PacketLengthFunctionPerTimeFeature, {'func': SumFunction(), 'max_interpacket_interval_time': 0.2}),
+        (PacketLengthFunctionPerTimeFeature, {'func': MeanFunction(), 'max_interpacket_interval_time': 0.05}),
+        (PacketLengthFunctionPerTimeFeature, {'func': SumFunction(), 'max_interpacket_interval_time': 0.05}),
+        (PacketNumberPerTimeFeature, {'max_interpacket_interval_time': 0.2}),
+    ]
+
+    __slots__ = ('features', '_extractors')
+
+    def __init__(self, capacity=None):
+        """
+        Parameters:
+        - capacity (int): Packets kept in the per-packet buffers of every feature, None for unbounded.
+          Older packets are overwritten; the detector removes a flow after end_threshold packets,
+          so capacity end_threshold + 1 never loses one.
+        """
+        history = PacketHistory(capacity)
+        windows = {}
+        self.features = []
+        # Everything that sees each packet: flow-wide features, the history, one engine per window size
+        extractors = []
+        for feature_type, params in self.FEATURE_SPECS:
+            if not issubclass(feature_type, WindowFeature):
+                feature = feature_type(capacity=capacity, **params)
+                extractors.append(feature)
+            else:
+                window_size = params['max_interpacket_interval_time']
+                if window_size not in windows:
+                    windows[window_size] = PacketWindows(window_size, history)
+                feature = feature_type(**params, windows=windows[window_size])
+            self.features.append(feature)
+        self._extractors = tuple(extractors) + (history,) + tuple(windows.values())
+
+        if FeatureStorage.schema is None:
+            FeatureStorage._build_schema(self.features)
+
+    @classmethod
+    def _build_schema(cls, features):
+        feature_names = []
+        feature_slices = []
+        for feature in features:
+            names = feature.get_feature_names()
+            feature_slices.append(slice(len(feature_names), len(feature_names) + len(names)))
+            feature_names.extend(names)
+
+        cls._feature_slices = feature_slices
+        cls.schema = FeatureSchema(feature_names)
+
+    @classmethod
+    def get_schema(cls):
+        if cls.schema is None:
+            cls()
+        return cls.schema
 
     def extract_features(self, packet):
-        for feature in self.features:
-            feature.extract_feature(packet)
+        packet_time = float(packet.time)
+        packet_length = len(packet)
+        for extractor in self._extractors:
+            extractor.extract_values(packet_time, packet_length)
 
-    def _concatenate_features_dfs(self, get_feature_fn):
-        feature_dfs = []
-        for feature in self.features:
-            feature_dfs.append(get_feature_fn(feature))
+    def get_feature_vector(self, out=None):
+        """Writes all features into `out` (a preallocated float64 row) in schema order."""
+        if out is None:
+            out = self.schema.empty()
 
-        return pd.concat(feature_dfs, axis=1)
+        for feature, feature_slice in zip(self.features, self._feature_slices):
+            feature.write_feature(out[feature_slice])
+        return out
 
     def get_features(self):
-        return self._concatenate_features_dfs(get_feature_fn=lambda feature: feature.get_feature())
+        return self.schema.to_frame(self.get_feature_vector())
 
     def get_time_series_features(self):
-        return self._concatenate_features_dfs(get_feature_fn=lambda feature: feature.get_time_series_feature())
+        feature_dfs = []
+        for feature in self.features:
+            feature_dfs.append(feature.get_time_series_feature())
+
+        return pd.concat(feature_dfs, axis=1)
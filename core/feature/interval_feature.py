@@ -1,13 +1,16 @@
 import abc
+import functools
 import numpy as np
 import pandas as pd
 from scapy.all import *
 
 from .feature import FeatureInterface
-from ..utils.filter_outliners import filter_outliners
+from .packet_windows import PacketHistory, PacketWindows
 
 
 class FunctionInterface(abc.ABC):
+    __slots__ = ()
+
     @abc.abstractmethod
     def name(self):
         pass
@@ -16,191 +19,150 @@ class FunctionInterface(abc.ABC):
     def __call__(self, array):
         pass
 
+    def reduce_rows(self, matrix):
+        """The function of every row of a 2D array, equal to calling it on each row."""
+        return np.array([self(row) for row in matrix])
+
 class MeanFunction(FunctionInterface):
+    __slots__ = ()
+
     def name(self):
         return "mean_func"
 
     def __call__(self, array):
         return np.mean(array)
 
+    def reduce_rows(self, matrix):
+        return np.mean(matrix, axis=1)
+
 class SumFunction(FunctionInterface):
+    __slots__ = ()
+
     def name(self):
         return "sum_func"
 
     def __call__(self, array):
         return np.sum(array)
 
+    def reduce_rows(self, matrix):
+        return np.sum(matrix, axis=1)
 
-class InterpacketIntervalFunctionPerTimeFeature(FeatureInterface):
-    def __init__(self, func, max_interpacket_interval_time=0.2):
-        self.current_interval_time = None
-        self.interpacket_intervals = {}
-        self.max_interpacket_interval_time = max_interpacket_interval_time
-        self.func = func
 
-        self.MAX_FEATURE = f"max_feature_{func.name()}_interpacket_interval_per_{max_interpacket_interval_time}"
-        self.MIN_FEATURE = f"min_feature_{func.name()}_interpacket_interval_per_{max_interpacket_interval_time}"
-        self.STD_FEATURE = f"std_feature_{func.name()}_interpacket_interval_per_{max_interpacket_interval_time}"
-        self.MEAN_FEATURE = f"mean_feature_{func.name()}_interpacket_interval_per_{max_interpacket_interval_time}"
-        self.TIME_SERIES_FEATURE_NAME = f"{func.name()}_interpacket_interval_per_{max_interpacket_interval_time}"
-
-    def extract_feature(self, packet):
-        new_packet_time = float(packet.time)
-
-        if not self.current_interval_time:
-            self.current_interval_time = new_packet_time
-            self.interpacket_intervals[new_packet_time] = []
-            return
-
-        new_interpacket_interval = new_packet_time - self.current_interval_time
-        if new_interpacket_interval < self.max_interpacket_interval_time:
-            self.interpacket_intervals[self.current_interval_time].append(new_interpacket_interval)
-        else:
-            self.current_interval_time = new_packet_time
-            self.interpacket_intervals[new_packet_time] = []
-
-    def _data_filtering(self):
-        for interpacket_interval in self.interpacket_intervals.values():
-            if len(interpacket_interval) > 1:
-                interpacket_interval = list(filter_outliners(interpacket_interval))
-                yield interpacket_interval
-        
+def write_aggregated_feature(result_feature_array, out):
+    if not len(result_feature_array):
+        out[:] = np.nan
+        return
+
+    out[0] = np.max(result_feature_array)
+    out[1] = np.min(result_feature_array)
+    out[2] = np.std(result_feature_array)
+    out[3] = np.mean(result_feature_array)
+
+
+@functools.lru_cache(maxsize=None)
+def window_feature_names(value_name, max_interpacket_interval_time):
+    """Feature names and the time series name of a windowed feature, built once and shared by every flow."""
+    feature_names = [
+        f"{statistic}_feature_{value_name}_per_{max_interpacket_interval_time}"
+        for statistic in ('max', 'min', 'std', 'mean')
+    ]
+    return feature_names, f"{value_name}_per_{max_interpacket_interval_time}"
+
+
+class WindowFeature(FeatureInterface):
+    """
+    Statistics over the windows of a PacketWindows engine.
+
+    Inside FeatureStorage the features with the same window size share one engine, which
+    FeatureStorage feeds itself. A feature created without `windows` owns its engine and
+    is fed through extract_feature.
+    """
+    __slots__ = ('windows',)
+
+    def __init__(self, max_interpacket_interval_time=0.2, capacity=None, windows=None):
+        if windows is None:
+            windows = PacketWindows(max_interpacket_interval_time, PacketHistory(capacity))
+        self.windows = windows
+
+    @property
+    def max_interpacket_interval_time(self):
+        return self.windows.max_interpacket_interval_time
+
+    @abc.abstractmethod
+    def _value_name(self):
+        pass
+
+    @abc.abstractmethod
     def _create_result_feature_array(self):
-        data_array = []
-        for data in self._data_filtering():
-            if data:
-                data_array.append(self.func(data))
-
-        return data_array
-
-    def get_feature(self):
-        result_feature_array = self._create_result_feature_array()
-
-        data = {}
-        if result_feature_array:
-            data[self.MAX_FEATURE]  = [np.max(result_feature_array)]
-            data[self.MIN_FEATURE]  = [np.min(result_feature_array)]
-            data[self.STD_FEATURE]  = [np.std(result_feature_array)]
-            data[self.MEAN_FEATURE] = [np.mean(result_feature_array)]
-        else:
-            data[self.MAX_FEATURE] = [np.nan]
-            data[self.MIN_FEATURE] = [np.nan]
-            data[self.STD_FEATURE] = [np.nan]
-            data[self.MEAN_FEATURE] = [np.nan]
-
-        return pd.DataFrame(data)
+        pass
+
+    @property
+    def MAX_FEATURE(self):
+        return self.get_feature_names()[0]
+
+    @property
+    def MIN_FEATURE(self):
+        return self.get_feature_names()[1]
+
+    @property
+    def STD_FEATURE(self):
+        return self.get_feature_names()[2]
+
+    @property
+    def MEAN_FEATURE(self):
+        return self.get_feature_names()[3]
+
+    @property
+    def TIME_SERIES_FEATURE_NAME(self):
+        return window_feature_names(self._value_name(), self.max_interpacket_interval_time)[1]
+
+    def get_feature_names(self):
+        return window_feature_names(self._value_name(), self.max_interpacket_interval_time)[0]
+
+    def extract_values(self, packet_time, packet_length):
+        self.windows.history.extract_values(packet_time, packet_length)
+        self.windows.extract_values(packet_time, packet_length)
+
+    def write_feature(self, out):
+        write_aggregated_feature(self._create_result_feature_array(), out)
 
     def get_time_series_feature(self):
-        return pd.DataFrame(self._create_result_feature_array(), columns=[self.TIME_SERIES_FEATURE_NAME]) 
+        return pd.DataFrame(self._create_result_feature_array(), columns=[self.TIME_SERIES_FEATURE_NAME])
+
 
-class PacketLengthFunctionPerTimeFeature(FeatureInterface):
-    def __init__(self, func, max_interpacket_interval_time=0.2):
-        self.current_interval_time = None
-        self.packet_length_flows = {}
-        self.max_interpacket_interval_time = max_interpacket_interval_time
+class InterpacketIntervalFunctionPerTimeFeature(WindowFeature):
+    __slots__ = ('func',)
+
+    def __init__(self, func, max_interpacket_interval_time=0.2, capacity=None, windows=None):
+        WindowFeature.__init__(self, max_interpacket_interval_time, capacity, windows)
         self.func = func
 
-        self.MAX_FEATURE = f"max_feature_{func.name()}_packet_length_per_{max_interpacket_interval_time}"
-        self.MIN_FEATURE = f"min_feature_{func.name()}_packet_length_per_{max_interpacket_interval_time}"
-        self.STD_FEATURE = f"std_feature_{func.name()}_packet_length_per_{max_interpacket_interval_time}"
-        self.MEAN_FEATURE = f"mean_feature_{func.name()}_packet_length_per_{max_interpacket_interval_time}"
-        self.TIME_SERIES_FEATURE_NAME = f"{func.name()}_packet_length_per_{max_interpacket_interval_time}"
-
-    def extract_feature(self, packet):
-        new_packet_time = float(packet.time)
-
-        if not self.current_interval_time:
-            self.current_interval_time = new_packet_time
-            self.packet_length_flows[new_packet_time] = [len(packet)]
-            return
-
-        new_interpacket_interval = new_packet_time - self.current_interval_time
-        if new_interpacket_interval < self.max_interpacket_interval_time:
-            self.packet_length_flows[self.current_interval_time].append(len(packet))
-        else:
-            self.current_interval_time = new_packet_time
-            self.packet_length_flows[new_packet_time] = [len(packet)]
-
-    def _data_filtering(self):
-        for packet_length_flow in self.packet_length_flows.values():
-            if len(packet_length_flow) > 2:
-                packet_length_flow = list(filter_outliners(packet_length_flow))
-                yield packet_length_flow
-        
+    def _value_name(self):
+        return f"{self.func.name()}_interpacket_interval"
+
     def _create_result_feature_array(self):
-        data_array = []
-        for data in self._data_filtering():
-            if data:
-                data_array.append(self.func(data))
-
-        return data_array
-
-    def get_feature(self):
-        result_feature_array = self._create_result_feature_array()
-
-        data = {}
-        if result_feature_array:
-            data[self.MAX_FEATURE]  = [np.max(result_feature_array)]
-            data[self.MIN_FEATURE]  = [np.min(result_feature_array)]
-            data[self.STD_FEATURE]  = [np.std(result_feature_array)]
-            data[self.MEAN_FEATURE] = [np.mean(result_feature_array)]
-        else:
-            data[self.MAX_FEATURE] = [np.nan]
-            data[self.MIN_FEATURE] = [np.nan]
-            data[self.STD_FEATURE] = [np.nan]
-            data[self.MEAN_FEATURE] = [np.nan]
-
-        return pd.DataFrame(data)
+        return [self.func(data) for data in self.windows.filtered_intervals() if len(data)]
 
-    def get_time_series_feature(self):
-        return pd.DataFrame(self._create_result_feature_array(), columns=[self.TIME_SERIES_FEATURE_NAME])
 
-class PacketNumberPerTimeFeature(FeatureInterface):
-    def __init__(self, max_interpacket_interval_time=0.2):
-        self.current_interval_time = None
-        self.packet_number_per_time = {}
-        self.max_interpacket_interval_time = max_interpacket_interval_time
-
-        self.MAX_FEATURE = f"max_feature_packet_number_per_{max_interpacket_interval_time}"
-        self.MIN_FEATURE = f"min_feature_packet_number_per_{max_interpacket_interval_time}"
-        self.STD_FEATURE = f"std_feature_packet_number_per_{max_interpacket_interval_time}"
-        self.MEAN_FEATURE = f"mean_feature_packet_number_per_{max_interpacket_interval_time}"
-        self.TIME_SERIES_FEATURE_NAME = f"packet_number_per_{max_interpacket_interval_time}"
-
-    def extract_feature(self, packet):
-        new_packet_time = float(packet.time)
-
-        if not self.current_interval_time:
-            self.current_interval_time = new_packet_time
-            self.packet_number_per_time[new_packet_time] = 1
-            return
-
-        new_interpacket_interval = new_packet_time - self.current_interval_time
-        if new_interpacket_interval < self.max_interpacket_interval_time:
-            self.packet_number_per_time[self.current_interval_time] += 1
-        else:
-            self.current_interval_time = new_packet_time
-            self.packet_number_per_time[new_packet_time] = 1
+class PacketLengthFunctionPerTimeFeature(WindowFeature):
+    __slots__ = ('func',)
+
+    def __init__(self, func, max_interpacket_interval_time=0.2, capacity=None, windows=None):
+        WindowFeature.__init__(self, max_interpacket_interval_time, capacity, windows)
+        self.func = func
+
+    def _value_name(self):
+        return f"{self.func.name()}_packet_length"
 
     def _create_result_feature_array(self):
-        return list(self.packet_number_per_time.values())
+        return [self.func(data) for data in self.windows.filtered_lengths() if len(data)]
 
-    def get_feature(self):
-        result_feature_array = self._create_result_feature_array()
 
-        data = {}
-        if result_feature_array:
-            data[self.MAX_FEATURE]  = [np.max(result_feature_array)]
-            data[self.MIN_FEATURE]  = [np.min(result_feature_array)]
-            data[self.STD_FEATURE]  = [np.std(result_feature_array)]
-            data[self.MEAN_FEATURE] = [np.mean(result_feature_array)]
-        else:
-            data[self.MAX_FEATURE] = [np.nan]
-            data[self.MIN_FEATURE] = [np.nan]
-            data[self.STD_FEATURE] = [np.nan]
-            data[self.MEAN_FEATURE] = [np.nan]
+class PacketNumberPerTimeFeature(WindowFeature):
+    __slots__ = ()
 
-        return pd.DataFrame(data)
+    def _value_name(self):
+        return "packet_number"
 
-    def get_time_series_feature(self):
-        return pd.DataFrame(self._create_result_feature_array(), columns=[self.TIME_SERIES_FEATURE_NAME]) 
+    def _create_result_feature_array(self):
+        return self.windows.packet_numbers()
@@ -0,0 +1,121 @@
+import numpy as np
+
+from ..utils.ring_buffer import RingBuffer
+from ..utils.filter_outliners import filter_outliners_segments
+
+
+class PacketHistory:
+    __slots__ = ('times', 'lengths', 'packet_number')
+
+    def __init__(self, capacity=None):
+        """Arrival time and length of every packet of a flow, in arrival order."""
+        self.times = RingBuffer(capacity)
+        self.lengths = RingBuffer(capacity, dtype=np.int32)
+        # Packets ever added; tells cached results apart
+        self.packet_number = 0
+
+    def extract_values(self, packet_time, packet_length):
+        self.times.append(packet_time)
+        self.lengths.append(packet_length)
+        self.packet_number += 1
+
+
+class PacketWindows:
+    # Windows with at most this many values are skipped
+    MIN_INTERVAL_WINDOW_SIZE = 1
+    MIN_LENGTH_WINDOW_SIZE = 2
+
+    __slots__ = ('max_interpacket_interval_time', 'history', 'current_interval_time', 'window_starts', '_cache_version', '_cache')
+
+    def __init__(self, max_interpacket_interval_time, history):
+        """
+        Splits the packets of a PacketHistory into windows of one size.
+
+        A window starts with a packet and takes every next packet that comes less than
+        max_interpacket_interval_time after that first one. Every packet is bucketed once,
+        when it arrives; the per-window values (intervals from the window start, packet
+        lengths, packet numbers) are derived from the shared history on demand and cached
+        until the next packet, so all features over the same window size share them.
+
+        Parameters:
+        - max_interpacket_interval_time (float): Window size in seconds.
+        - history (PacketHistory): Packets of the flow; the caller adds every packet to it.
+        """
+        self.max_interpacket_interval_time = max_interpacket_interval_time
+        self.history = history
+        self.current_interval_time = None
+        self.window_starts = RingBuffer(history.times.capacity, dtype=np.bool_)
+        self._cache_version = None
+        self._cache = {}
+
+    def extract_values(self, packet_time, packet_length):
+        if not self.current_interval_time or packet_time - self.current_interval_time >= self.max_interpacket_interval_time:
+            self.current_interval_time = packet_time
+            self.window_starts.append(True)
+        else:
+            self.window_starts.append(False)
+
+    def _cached(self, name, compute):
+        if self._cache_version != self.history.packet_number:
+            self._cache_version = self.history.packet_number
+            self._cache = {}
+        value = self._cache.get(name)
+        if value is None:
+            value = compute()
+            self._cache[name] = value
+        return value
+
+    def _start_positions(self):
+        starts = self.window_starts.values()
+        if not len(starts):
+            return np.empty(0, dtype=np.intp)
+        start_positions = np.flatnonzero(starts)
+        if not starts[0]:
+            # The start of the oldest window was overwritten in a bounded history
+            start_positions = np.concatenate(([0], start_positions))
+        return start_positions
+
+    def _window_sizes(self):
+        return np.diff(np.append(self._start_positions(), len(self.window_starts)))
+
+    def _interval_windows(self):
+        times = self.history.times.values()
+        start_positions = self._start_positions()
+        window_sizes = self._window_sizes()
+        intervals = times - np.repeat(times[start_positions], window_sizes)
+        # The first packet of a window has no interval
+        not_first = np.ones(len(intervals), dtype=bool)
+        not_first[start_positions] = False
+        return intervals[not_first], window_sizes - 1
+
+    def _length_windows(self):
+        return self.history.lengths.values(), self._window_sizes()
+
+    @staticmethod
+    def _filter_windows(windows, min_window_size):
+        # Every window is filtered in one vectorized pass instead of a np.percentile call per window
+        values, window_sizes = windows
+        kept_windows = window_sizes > min_window_size
+        values = values[np.repeat(kept_windows, window_sizes)]
+        return filter_outliners_segments(values, window_sizes[kept_windows])
+
+    def filtered_intervals(self):
+        """Interpacket intervals from the window start, outliers removed, per window with enough of them."""
+        return self._cached(
+            'intervals',
+            lambda: self._filter_windows(self._interval_windows(), self.MIN_INTERVAL_WINDOW_SIZE)
+        )
+
+    def filtered_lengths(self):
+        """Packet lengths, outliers removed, per window with enough packets."""
+        return self._cached(
+            'lengths',
+            lambda: self._filter_windows(self._length_windows(), self.MIN_LENGTH_WINDOW_SIZE)
+        )
+
+    def packet_numbers(self):
+        """Number of packets in every window."""
+        return self._cached(
+            'packet_numbers',
+            self._window_sizes
+        )
@@ -2,17 +2,23 @@ import time
 from ..feature.feature_storage import FeatureStorage
 
 class Flow:
-    def __init__(self, filter_lambda=lambda pkt: True):
+    __slots__ = ('compiled_filter', 'feature_extractor', 'packet_number', 'total_length', 'create_timestamp', 'last_timestamp', 'time_spent')
+
+    def __init__(self, filter_lambda=lambda pkt: True, capacity=None):
         self.compiled_filter = filter_lambda
-        self.feature_extractor = FeatureStorage()
+        self.feature_extractor = FeatureStorage(capacity)
         self.packet_number = 0
         self.total_length = 0
         self.create_timestamp = None
+        self.last_timestamp = None
         self.time_spent = 0
 
     def get_create_timestamp(self):
         return self.create_timestamp
 
+    def get_last_timestamp(self):
+        return self.last_timestamp
+
     def get_total_length(self):
         return self.total_length
 
@@ -22,6 +28,7 @@ class Flow:
     def _update_flow_info(self, packet):
         if not self.create_timestamp:
             self.create_timestamp = packet.time
+        self.last_timestamp = packet.time
         self.total_length += len(packet)
         self.packet_number += 1
 
@@ -38,6 +45,10 @@ class Flow:
         self.feature_extractor.extract_features(packet)
         self._update_flow_info(packet)
 
+    @time_count_decorator
+    def get_feature_vector(self, out=None):
+        return self.feature_extractor.get_feature_vector(out)
+
     @time_count_decorator
     def get_features(self):
         df = self.feature_extractor.get_features()
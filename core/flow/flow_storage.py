@@ -1,31 +1,27 @@
 import pandas as pd
 from scapy.all import *
 
-from ..utils.fsbst import FixSizeBST
+from ..utils.fslru import FixSizeLRU
+from .flow_key import FlowKey, PacketRecord
 
 class FlowStorage:
-    def __init__(self, fix_size=10000):
-        self._storage = FixSizeBST(fix_size)
+    def __init__(self, fix_size=10000, storage_cls=FixSizeLRU):
+        self._storage = storage_cls(fix_size)
 
     def extract_flow_key_for_packet(self, pkt):
-        src_ip = pkt['IP'].src
-        dst_ip = pkt['IP'].dst
-
-        if pkt.haslayer('TCP'):
-            src_port = pkt['TCP'].sport
-            dst_port = pkt['TCP'].dport
-        elif pkt.haslayer('UDP'):
-            src_port = pkt['UDP'].sport
-            dst_port = pkt['UDP'].dport
-
-        # Create one flow_key for src -> dst and dst -> src
-        if int(pkt['IP'].src.split(".")[0]) > int(pkt['IP'].dst.split(".")[0]):
-            return f"{src_ip}:{src_port}<-->{dst_ip}:{dst_port}"
-        else:
-            return f"{dst_ip}:{dst_port}<-->{src_ip}:{src_port}"
+        # Decoded records already carry their key
+        if pkt.__class__ is PacketRecord:
+            return pkt.flow_key
+
+        # One key for src -> dst and dst -> src
+        return FlowKey.from_packet(pkt)
 
     def filter(self, packet):
-        if (not packet.haslayer("IP")) or ((not packet.haslayer('TCP') and (not packet.haslayer('UDP')))):
+        # decode_packet() applies the same filter before creating a record
+        if packet.__class__ is PacketRecord:
+            return False
+
+        if (not packet.haslayer("IP") and not packet.haslayer("IPv6")) or ((not packet.haslayer('TCP') and (not packet.haslayer('UDP')))):
             return True
 
         if packet.haslayer('TCP'):
@@ -42,16 +38,20 @@ class FlowStorage:
         return False
 
     def get_flows_for_packet(self, pkt):
-        flow_key = self.extract_flow_key_for_packet(pkt)
+        return self.get_flows(self.extract_flow_key_for_packet(pkt))
+
+    def get_flows(self, flow_key):
         return self._storage.get_value(flow_key)
 
     def add_new_flow(self, flow, pkt):
         flow_key = self.extract_flow_key_for_packet(pkt)
 
-        if not self._storage.get_value(flow_key):
-            self._storage.add_new_node(flow_key, [])
+        flows = self._storage.get_value(flow_key)
+        if not flows:
+            flows = []
+            self._storage.add_new_node(flow_key, flows)
 
-        self._storage.get_value(flow_key).append(flow)
+        flows.append(flow)
 
     def _remove_from_flows(self, flow_key, flow):
         flows = self._storage.get_value(flow_key)
@@ -61,17 +61,35 @@ class FlowStorage:
         flows.remove(flow)
 
     def _clear_flow_key(self, flow_key):
-        if self._storage.get_value(flow_key) is not None and not self._storage.get_value(flow_key):
+        flows = self._storage.get_value(flow_key)
+        if flows is not None and not flows:
             self._storage.delete(flow_key)
 
 
     def remove_flow_for_packet(self, flow, pkt):
-        flow_key = self.extract_flow_key_for_packet(pkt)
+        self.remove_flow(flow, self.extract_flow_key_for_packet(pkt))
+
+    def discard_flow_for_packet(self, flow, pkt):
+        self.discard_flow(flow, self.extract_flow_key_for_packet(pkt))
+
+    def remove_flow(self, flow, flow_key):
         self._remove_from_flows(flow_key, flow)
         self._clear_flow_key(flow_key)
 
+    def discard_flow(self, flow, flow_key):
+        """Like remove_flow, but silently skips flows that were already removed or evicted."""
+        flows = self._storage.get_value(flow_key)
+        if flows and flow in flows:
+            flows.remove(flow)
+            self._clear_flow_key(flow_key)
+
+    def contains_flow(self, flow, flow_key):
+        """Whether the flow is still stored; does not count as a use for eviction."""
+        flows = self._storage.peek_value(flow_key)
+        return bool(flows) and flow in flows
+
     def get_total_size(self):
-        return len(self._storage.items())
+        return len(self._storage)
 
     def items(self):
         return self._storage.items()
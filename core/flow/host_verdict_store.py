@@ -0,0 +1,153 @@
+from collections import OrderedDict, deque
+
+
+class HostVerdicts:
+    __slots__ = ('vpn_number', 'non_vpn_number', 'vpn_times', 'last_timestamp')
+
+    def __init__(self, window_capacity):
+        self.vpn_number = 0
+        self.non_vpn_number = 0
+        # Times of the VPN verdicts inside the detection window, oldest first
+        self.vpn_times = deque(maxlen=window_capacity)
+        self.last_timestamp = None
+
+    def get_window_number(self):
+        return len(self.vpn_times)
+
+
+class HostVerdictStore:
+    def __init__(self, max_hosts=10000, ttl=600, window=10, window_capacity=64, decay_half_life=None):
+        """
+        Per-host VPN/non-VPN verdict counters with bounded memory.
+
+        Hosts are kept in the order of their last verdict: the least recently seen host
+        is evicted when `max_hosts` is reached, and hosts without a verdict for `ttl`
+        seconds are dropped from the front on every update. Time is the verdict (packet)
+        time, so replayed captures behave like live traffic.
+
+        Parameters:
+        - max_hosts (int): Maximum number of hosts kept.
+        - ttl (float): Seconds without a verdict after which a host is forgotten, None to keep hosts until evicted.
+        - window (float): Width in seconds of the sliding window of VPN verdicts.
+        - window_capacity (int): Maximum number of VPN verdict times kept per host; the window count saturates there.
+        - decay_half_life (float): Counters halve every this many seconds, None for plain counts.
+        """
+        self.max_hosts = max_hosts
+        self.ttl = ttl
+        self.window = window
+        self.window_capacity = window_capacity
+        self.decay_half_life = decay_half_life
+        self.expired_number = 0
+        self.evicted_number = 0
+        self._hosts = OrderedDict()
+
+    def __len__(self):
+        return len(self._hosts)
+
+    def __contains__(self, host_key):
+        return host_key in self._hosts
+
+    def get(self, host_key):
+        """Counters of a host or None; the eviction order is left untouched."""
+        return self._hosts.get(host_key)
+
+    def _decay(self, verdicts, timestamp):
+        elapsed = timestamp - verdicts.last_timestamp
+        if elapsed > 0:
+            factor = 0.5 ** (elapsed / self.decay_half_life)
+            verdicts.vpn_number *= factor
+            verdicts.non_vpn_number *= factor
+
+    def _slide_window(self, verdicts):
+        times = verdicts.vpn_times
+        while times and verdicts.last_timestamp - times[0] > self.window:
+            times.popleft()
+
+    def _touch(self, host_key, timestamp):
+        verdicts = self._hosts.get(host_key)
+        if verdicts is None:
+            if len(self._hosts) >= self.max_hosts:
+                self._hosts.popitem(last=False)
+                self.evicted_number += 1
+            verdicts = HostVerdicts(self.window_capacity)
+            verdicts.last_timestamp = timestamp
+            self._hosts[host_key] = verdicts
+            return verdicts
+
+        self._hosts.move_to_end(host_key)
+        if self.decay_half_life is not None:
+            self._decay(verdicts, timestamp)
+        # Verdicts of a batch may come slightly out of packet time order
+        verdicts.last_timestamp = max(verdicts.last_timestamp, timestamp)
+        return verdicts
+
+    def add_verdict(self, host_key, timestamp, is_vpn):
+        """
+        Counts a verdict of a flow between the hosts of `host_key`.
+
+        Returns:
+        - HostVerdicts: Updated counters of the host.
+        """
+        timestamp = float(timestamp)
+        self.expire(timestamp)
+        verdicts = self._touch(host_key, timestamp)
+        if is_vpn:
+            verdicts.vpn_number += 1
+            verdicts.vpn_times.append(timestamp)
+        else:
+            verdicts.non_vpn_number += 1
+        self._slide_window(verdicts)
+        return verdicts
+
+    def expire(self, now):
+        """Drops the hosts without a verdict for more than `ttl` seconds before `now`."""
+        if self.ttl is None:
+            return
+        hosts = self._hosts
+        while hosts:
+            verdicts = hosts[next(iter(hosts))]
+            if now - verdicts.last_timestamp <= self.ttl:
+                break
+            hosts.popitem(last=False)
+            self.expired_number += 1
+
+    def get_statistic(self):
+        return {
+            'hosts': len(self._hosts),
+            'expired': self.expired_number,
+            'evicted': self.evicted_number,
+        }
+
+
+class HostDetectionRule:
+    # Least number of VPN verdict times a store keeps per host for the rule
+    WINDOW_CAPACITY = 64
+
+    def __init__(self, total_detected_flow_threshold=3, flow_number_for_detect=1, vpn_to_novpn_ratio=0.0):
+        """
+        Decides from its counters whether a host pair is detected as a VPN node.
+
+        Parameters:
+        - total_detected_flow_threshold (float): Minimum number of VPN verdicts of the host.
+        - flow_number_for_detect (int): Minimum number of VPN verdicts inside the detection window.
+        - vpn_to_novpn_ratio (float): Minimum ratio of VPN to non-VPN verdicts.
+        """
+        self.total_detected_flow_threshold = total_detected_flow_threshold
+        self.flow_number_for_detect = flow_number_for_detect
+        self.vpn_to_novpn_ratio = vpn_to_novpn_ratio
+
+    def get_window_capacity(self):
+        """window_capacity of a HostVerdictStore that does not saturate before flow_number_for_detect."""
+        return max(self.flow_number_for_detect, self.WINDOW_CAPACITY)
+
+    def __call__(self, verdicts):
+        if verdicts.vpn_number < self.total_detected_flow_threshold:
+            return False
+
+        if verdicts.get_window_number() < self.flow_number_for_detect:
+            return False
+
+        if (not verdicts.non_vpn_number) or (verdicts.vpn_number / verdicts.non_vpn_number < self.vpn_to_novpn_ratio):
+            return False
+
+        return True
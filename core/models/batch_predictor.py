@@ -0,0 +1,82 @@
+import time
+import numpy as np
+
+
+class BatchPredictor:
+    def __init__(self, model_pipeline, schema, callback, max_batch_size=64, max_latency=0.05, clock=time.monotonic):
+        """
+        Collects feature rows of several flows and runs filter + predict on them as one matrix.
+
+        Parameters:
+        - model_pipeline (ModelPipeline): Pipeline used for filter_array/predict_array.
+        - schema (FeatureSchema): Column layout of the feature rows.
+        - callback (callable): Called as callback(context, prediction) for every submitted row.
+          prediction is None when the model filter rejected the row.
+        - max_batch_size (int): Flush as soon as this many rows are pending.
+        - max_latency (float): Flush once the oldest pending row waited this many seconds.
+        - clock (callable): Time source for the latency deadline.
+        """
+        self.model_pipeline = model_pipeline
+        self.schema = schema
+        self.callback = callback
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_latency = max_latency
+        self.clock = clock
+
+        self._rows = schema.empty(rows=self.max_batch_size)
+        self._contexts = []
+        self._deadline = None
+
+        self.batch_number = 0
+        self.predicted_number = 0
+        self.filtered_number = 0
+
+    def __len__(self):
+        return len(self._contexts)
+
+    def submit(self, flow, context):
+        """
+        Writes the flow features into the next free row.
+
+        Returns False (and keeps nothing) if the features contain NaN.
+        """
+        row = self._rows[len(self._contexts)]
+        flow.get_feature_vector(out=row)
+        if np.isnan(row).any():
+            return False
+
+        if not self._contexts:
+            self._deadline = self.clock() + self.max_latency
+        self._contexts.append(context)
+
+        if len(self._contexts) >= self.max_batch_size:
+            self.flush()
+        return True
+
+    def poll(self):
+        """Flushes pending rows whose latency deadline has passed."""
+        if self._contexts and self.clock() >= self._deadline:
+            self.flush()
+
+    def flush(self):
+        if not self._contexts:
+            return
+
+        # Reset first: callbacks may submit new rows
+        contexts, self._contexts = self._contexts, []
+        self._deadline = None
+        X = self._rows[:len(contexts)].copy()
+
+        predictions = [None] * len(contexts)
+        keep = ~np.asarray(self.model_pipeline.filter_array(X, self.schema), dtype=bool)
+        if keep.any():
+            kept_indices = np.flatnonzero(keep)
+            for index, prediction in zip(kept_indices, self.model_pipeline.predict_array(X[kept_indices], self.schema)):
+                predictions[index] = prediction
+
+        self.batch_number += 1
+        self.predicted_number += int(keep.sum())
+        self.filtered_number += len(contexts) - int(keep.sum())
+
+        for context, prediction in zip(contexts, predictions):
+            self.callback(context, prediction)
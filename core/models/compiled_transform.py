@@ -0,0 +1,166 @@
+import numpy as np
+from sklearn.preprocessing import StandardScaler, PowerTransformer
+from sklearn.decomposition import FastICA
+
+
+class YeoJohnsonKernel:
+    KIND = 'yeo_johnson'
+    # np.power rounds differently for these scalar exponents than for an exponent array
+    SCALAR_POWER_EXPONENTS = (2.0, 0.5, -1.0)
+
+    def __init__(self, lambdas):
+        self.lambdas = np.asarray(lambdas, dtype=np.float64)
+        # Columns where sklearn switches to log1p instead of the power formula
+        self.log_positive = np.flatnonzero(np.abs(self.lambdas) < np.spacing(1.0))
+        self.log_negative = np.flatnonzero(np.abs(self.lambdas - 2) <= np.spacing(1.0))
+        self.positive_lambdas = self.lambdas.copy()
+        self.positive_lambdas[self.log_positive] = 1.0
+        self.negative_lambdas = 2 - self.lambdas
+        self.negative_lambdas[self.log_negative] = 1.0
+        self.scalar_positive = np.flatnonzero(np.isin(self.positive_lambdas, self.SCALAR_POWER_EXPONENTS))
+        self.scalar_negative = np.flatnonzero(np.isin(self.negative_lambdas, self.SCALAR_POWER_EXPONENTS))
+
+    @staticmethod
+    def _power(base, exponents, scalar_columns):
+        out = np.power(base, exponents)
+        for column in scalar_columns:
+            out[:, column] = np.power(base[:, column], exponents[column])
+        return out
+
+    def __call__(self, X):
+        with np.errstate(all='ignore'):
+            positive = (self._power(X + 1, self.positive_lambdas, self.scalar_positive) - 1) / self.positive_lambdas
+            negative = -(self._power(1 - X, self.negative_lambdas, self.scalar_negative) - 1) / self.negative_lambdas
+            if len(self.log_positive):
+                positive[:, self.log_positive] = np.log1p(X[:, self.log_positive])
+            if len(self.log_negative):
+                negative[:, self.log_negative] = -np.log1p(-X[:, self.log_negative])
+        return np.where(X >= 0, positive, negative)
+
+    def get_state(self):
+        return {'lambdas': self.lambdas}
+
+
+class AffineKernel:
+    KIND = 'affine'
+
+    def __init__(self, mean=None, scale=None):
+        self.mean = mean
+        self.scale = scale
+
+    def __call__(self, X):
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+    def get_state(self):
+        return {name: value for name, value in (('mean', self.mean), ('scale', self.scale)) if value is not None}
+
+
+class LinearKernel:
+    KIND = 'linear'
+
+    def __init__(self, components, mean=None):
+        self.mean = mean
+        # The same transposed view sklearn multiplies by, so BLAS sums in the same order
+        self.components_t = components.T
+
+    def __call__(self, X):
+        if self.mean is not None:
+            X -= self.mean
+        return np.dot(X, self.components_t)
+
+    def get_state(self):
+        state = {'components': self.components_t.T}
+        if self.mean is not None:
+            state['mean'] = self.mean
+        return state
+
+
+KERNEL_TYPES = {kernel_type.KIND: kernel_type for kernel_type in (YeoJohnsonKernel, AffineKernel, LinearKernel)}
+
+
+def _scaler_kernel(scaler):
+    return AffineKernel(
+        scaler.mean_ if scaler.with_mean else None,
+        scaler.scale_ if scaler.with_std else None
+    )
+
+
+def compile_step(step):
+    """Kernels reproducing step.transform(), or None if the step type is not supported."""
+    if isinstance(step, CompiledTransform):
+        return step.kernels
+
+    if type(step) is PowerTransformer and step.method == 'yeo-johnson':
+        kernels = [YeoJohnsonKernel(step.lambdas_)]
+        if step.standardize:
+            kernels.append(_scaler_kernel(step._scaler))
+        return kernels
+
+    if type(step) is StandardScaler:
+        return [_scaler_kernel(step)]
+
+    if type(step) is FastICA:
+        return [LinearKernel(step.components_, step.mean_ if step.whiten else None)]
+
+    return None
+
+
+class CompiledTransform:
+    def __init__(self, kernels, feature_number, feature_names=None):
+        """
+        Transform chain of a pipeline as a list of precomputed NumPy kernels.
+
+        Can itself be used as a pipeline step (transform, n_features_in_, feature_names_in_).
+
+        Parameters:
+        - kernels (list): Callables applied in order, each taking and returning a float64 matrix.
+        - feature_number (int): Number of input columns the chain was fitted on.
+        - feature_names (list): Names of the input columns, if the chain was fitted on a DataFrame.
+        """
+        self.kernels = kernels
+        self.feature_number = feature_number
+        self.n_features_in_ = feature_number
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+
+    @staticmethod
+    def compile(steps):
+        """
+        Compiles the `transform` steps of a list of (name, step) tuples.
+
+        Supports PowerTransformer (Yeo-Johnson), StandardScaler and FastICA.
+        Returns None if any other step has a transform, so the caller keeps using sklearn.
+        """
+        kernels = []
+        feature_number = None
+        feature_names = None
+        for name, step in steps:
+            if not hasattr(step, 'transform'):
+                continue
+            step_kernels = compile_step(step)
+            if step_kernels is None:
+                return None
+            if feature_number is None:
+                feature_number = step.n_features_in_
+                feature_names = getattr(step, 'feature_names_in_', None)
+            kernels.extend(step_kernels)
+
+        if not kernels:
+            return None
+        return CompiledTransform(kernels, feature_number, feature_names)
+
+    def __call__(self, X):
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        if X.shape[1] != self.feature_number:
+            raise ValueError(f"X has {X.shape[1]} features, but the transform expects {self.feature_number}")
+
+        for kernel in self.kernels:
+            X = kernel(X)
+        return X
+
+    def transform(self, X):
+        return self(X)
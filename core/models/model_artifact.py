@@ -0,0 +1,307 @@
+import os
+import json
+import mmap
+import pickle
+import struct
+import hashlib
+import tempfile
+import warnings
+import threading
+from pathlib import Path
+
+import numpy as np
+import sklearn
+
+from .compiled_transform import CompiledTransform, KERNEL_TYPES, compile_step
+from .tree_ensemble import FlatTreeEnsemble
+
+ARTIFACT_SUFFIX = '.vpnm'
+ARTIFACT_MAGIC = b'VPNMODEL'
+ARTIFACT_VERSION = 1
+# magic, format version, manifest length
+ARTIFACT_HEADER = struct.Struct('<8sIQ')
+ARRAY_ALIGNMENT = 64
+
+# Methods a lazily unpickled step is asked about before it is really used
+LAZY_METHOD_NAMES = ('fit', 'transform', 'predict', 'predict_proba', 'predict_array')
+
+# Resolved path -> ((mtime_ns, size), ModelArtifact): one entry per path, the newest file version
+_artifact_cache = {}
+_artifact_cache_lock = threading.Lock()
+
+
+def _align(offset):
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+
+class LazyPickleStep:
+    def __init__(self, data, methods, type_name, sklearn_version=None, flat_tree_ensemble=None):
+        """
+        Step stored as a pickle inside the artifact, unpickled on first use.
+
+        Lets configs with Keras or other heavy models start without importing their framework
+        until a prediction really needs the step.
+
+        Parameters:
+        - data (bytes-like): Pickled step.
+        - methods (list): Which of LAZY_METHOD_NAMES the step has; asking for another one
+          raises AttributeError without unpickling.
+        - type_name (str): Qualified name of the pickled type, for messages.
+        - sklearn_version (str): sklearn version the step was pickled with; unpickling it with
+          another one emits a warning.
+        - flat_tree_ensemble (FlatTreeEnsemble): The step flattened at export, used by the
+          'flat_trees' engine without unpickling the step.
+        """
+        self._data = data
+        self._methods = set(methods)
+        self._step = None
+        self._lock = threading.Lock()
+        self.type_name = type_name
+        self.sklearn_version = sklearn_version
+        self.flat_tree_ensemble = flat_tree_ensemble
+
+    @staticmethod
+    def from_step(step):
+        if isinstance(step, LazyPickleStep):
+            return step
+        return LazyPickleStep(
+            pickle.dumps(step),
+            [name for name in LAZY_METHOD_NAMES if hasattr(step, name)],
+            f"{type(step).__module__}.{type(step).__qualname__}"
+        )
+
+    def is_loaded(self):
+        return self._step is not None
+
+    def load(self):
+        if self._step is None:
+            with self._lock:
+                if self._step is None:
+                    if self.sklearn_version is not None and self.sklearn_version != sklearn.__version__:
+                        warnings.warn(
+                            f"{self.type_name} was pickled with sklearn {self.sklearn_version}, "
+                            f"unpickling it with {sklearn.__version__}"
+                        )
+                    self._step = pickle.loads(self._data)
+        return self._step
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in LAZY_METHOD_NAMES and name not in self._methods:
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return f"LazyPickleStep({self.type_name}, loaded={self.is_loaded()})"
+
+
+class _ArtifactWriter:
+    def __init__(self):
+        self.blobs = []
+        self.size = 0
+
+    def add_array(self, array):
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError("Object arrays can not be stored in a model artifact")
+        offset = _align(self.size)
+        self.blobs.append((offset, array.tobytes()))
+        self.size = offset + array.nbytes
+        return {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+    def add_arrays(self, arrays):
+        return {name: self.add_array(array) for name, array in arrays.items()}
+
+    def data(self):
+        data = bytearray(self.size)
+        for offset, blob in self.blobs:
+            data[offset:offset + len(blob)] = blob
+        return bytes(data)
+
+
+def _encode_step(name, step, writer, flatten=False):
+    kernels = compile_step(step) if hasattr(step, 'transform') else None
+    if kernels is not None:
+        feature_names = getattr(step, 'feature_names_in_', None)
+        return {
+            'name': name,
+            'kind': 'transform',
+            'n_features_in': int(step.n_features_in_),
+            'feature_names': None if feature_names is None else [str(name) for name in feature_names],
+            'kernels': [{'kind': kernel.KIND, 'arrays': writer.add_arrays(kernel.get_state())} for kernel in kernels],
+        }
+
+    if isinstance(step, FlatTreeEnsemble):
+        return dict(_encode_flat_tree_ensemble(step, writer), name=name)
+
+    lazy_step = LazyPickleStep.from_step(step)
+    entry = {
+        'name': name,
+        'kind': 'pickle',
+        'type': lazy_step.type_name,
+        'methods': sorted(lazy_step._methods),
+        'arrays': writer.add_arrays({'pickle': np.frombuffer(lazy_step._data, dtype=np.uint8)}),
+    }
+    if flatten:
+        ensemble = lazy_step.flat_tree_ensemble
+        if ensemble is None:
+            ensemble = FlatTreeEnsemble.compile(lazy_step.load() if isinstance(step, LazyPickleStep) else step)
+        if ensemble is not None:
+            entry['flat_tree_ensemble'] = _encode_flat_tree_ensemble(ensemble, writer)
+    return entry
+
+
+def _encode_flat_tree_ensemble(ensemble, writer):
+    params, arrays = ensemble.get_state()
+    classes = params.pop('classes')
+    params['classes'] = classes.tolist()
+    params['classes_dtype'] = classes.dtype.str
+    return {'kind': 'flat_tree_ensemble', 'params': params, 'arrays': writer.add_arrays(arrays)}
+
+
+def save_artifact(model_pipeline, path):
+    """
+    Writes a ModelPipeline into a single artifact file.
+
+    Layout: header (magic, format version, manifest length), JSON manifest, then the data
+    section with every parameter array aligned to ARRAY_ALIGNMENT bytes so it can be
+    memory-mapped. Transform steps are stored as NumPy arrays of their compiled kernels;
+    any other step (and the model filter) is stored as a pickle and unpickled only when
+    first used. For the 'flat_trees' engine the classifier is also stored flattened
+    (FlatTreeEnsemble arrays), so that engine never unpickles it; the pickle stays for
+    the 'sklearn' engine.
+
+    Returns:
+    - Path of the written artifact.
+    """
+    writer = _ArtifactWriter()
+    flatten = model_pipeline.inference_engine == model_pipeline.FLAT_TREES_ENGINE
+    manifest = {
+        'format_version': ARTIFACT_VERSION,
+        'created_with': {'numpy': np.__version__, 'sklearn': sklearn.__version__},
+        'inference_engine': model_pipeline.inference_engine,
+        'steps': [
+            _encode_step(name, step, writer, flatten=(name == 'classifier' and flatten))
+            for name, step in model_pipeline.pipeline.steps
+        ],
+        'model_filter': None,
+    }
+    if model_pipeline.model_filter is not None:
+        manifest['model_filter'] = _encode_step('model_filter', LazyPickleStep.from_step(model_pipeline.model_filter), writer)
+
+    data = writer.data()
+    manifest['content_sha256'] = hashlib.sha256(data).hexdigest()
+    manifest_bytes = json.dumps(manifest).encode('utf-8')
+    header = ARTIFACT_HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, len(manifest_bytes))
+
+    path = Path(path)
+    # Loaded artifacts are memory maps of their file: a new version goes to a temporary file
+    # that replaces the old one atomically, running pipelines keep the old inode
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(manifest_bytes)
+            f.write(b'\0' * (_align(len(header) + len(manifest_bytes)) - len(header) - len(manifest_bytes)))
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+class ModelArtifact:
+    def __init__(self, path, verify=True):
+        """
+        Opens an artifact written by save_artifact and decodes its steps over a read-only memory map.
+
+        Parameters:
+        - path (str or Path): Artifact file.
+        - verify (bool): Check the content hash of the data section.
+        """
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            magic, version, manifest_length = ARTIFACT_HEADER.unpack(f.read(ARTIFACT_HEADER.size))
+            if magic != ARTIFACT_MAGIC:
+                raise ValueError(f"{self.path} is not a model artifact")
+            if version != ARTIFACT_VERSION:
+                raise ValueError(f"{self.path} has artifact format version {version}, expected {ARTIFACT_VERSION}")
+            self.manifest = json.loads(f.read(manifest_length))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._data_offset = _align(ARTIFACT_HEADER.size + manifest_length)
+        if verify:
+            digest = hashlib.sha256(memoryview(self._mmap)[self._data_offset:]).hexdigest()
+            if digest != self.manifest['content_sha256']:
+                raise ValueError(f"{self.path} is corrupted: content hash mismatch")
+
+        self.inference_engine = self.manifest['inference_engine']
+        self.steps = [(entry['name'], self._decode_step(entry)) for entry in self.manifest['steps']]
+        self.model_filter = None
+        if self.manifest['model_filter'] is not None:
+            self.model_filter = self._decode_step(self.manifest['model_filter'])
+
+    def _array(self, entry):
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._data_offset + entry['offset'])
+        return array.reshape(entry['shape'])
+
+    def _arrays(self, entries):
+        return {name: self._array(entry) for name, entry in entries.items()}
+
+    def _decode_step(self, entry):
+        if entry['kind'] == 'transform':
+            kernels = [KERNEL_TYPES[kernel['kind']](**self._arrays(kernel['arrays'])) for kernel in entry['kernels']]
+            return CompiledTransform(kernels, entry['n_features_in'], entry['feature_names'])
+
+        if entry['kind'] == 'flat_tree_ensemble':
+            params = dict(entry['params'])
+            params['classes'] = np.array(params['classes'], dtype=params.pop('classes_dtype'))
+            return FlatTreeEnsemble(**params, **self._arrays(entry['arrays']))
+
+        if entry['kind'] == 'pickle':
+            flat_tree_ensemble = None
+            if 'flat_tree_ensemble' in entry:
+                flat_tree_ensemble = self._decode_step(entry['flat_tree_ensemble'])
+            return LazyPickleStep(
+                memoryview(self._array(entry['arrays']['pickle'])),
+                entry['methods'],
+                entry['type'],
+                self.manifest['created_with']['sklearn'],
+                flat_tree_ensemble
+            )
+
+        raise ValueError(f"{self.path}: unknown step kind {entry['kind']}")
+
+
+def load_artifact(path, verify=True):
+    """
+    Returns the ModelArtifact for `path`, opening each file once per process.
+
+    Workers and threads asking for the same unchanged file share the decoded steps;
+    separate processes share its pages through the memory map. Only the newest version
+    of a file is cached: an older one lives as long as a pipeline still uses it.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _artifact_cache_lock:
+        cached_version, artifact = _artifact_cache.get(str(path), (None, None))
+        if cached_version != version:
+            artifact = ModelArtifact(path, verify)
+            _artifact_cache[str(path)] = (version, artifact)
+    return artifact
+
+
+def is_artifact(path):
+    path = Path(path)
+    if path.suffix == ARTIFACT_SUFFIX:
+        return True
+    with open(path, 'rb') as f:
+        return f.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
@@ -1,12 +1,17 @@
+import time
+import numpy as np
 import pandas as pd
 from sklearn.cluster import DBSCAN
 from sklearn.neighbors import LocalOutlierFactor
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 from .outliners import OutlierDetector, DBSCANWrapper
+from ..feature.feature_schema import FeatureSchema
 
 class OutlierPipeline:
-    def __init__(self, zscore_model=None, lof_pipeline=None, dbscan_pipeline=None):
+    STAGES = ('zscore', 'lof', 'dbscan')
+
+    def __init__(self, zscore_model=None, lof_pipeline=None, dbscan_pipeline=None, stage_order=STAGES):
         """
         Инициализация пайплайна для последовательного предсказания выбросов.
 
@@ -14,46 +19,130 @@ class OutlierPipeline:
         - zscore_model: Модель Z-Score для определения выбросов.
         - lof_pipeline: Модель Local Outlier Factor (LOF).
         - dbscan_pipeline: DBSCAN пайплайн (обучение и предсказание).
+        - stage_order (tuple): Порядок запуска стадий. Каждая следующая стадия получает
+          только строки, которые предыдущие стадии не отметили как выбросы,
+          поэтому на результат порядок не влияет, только на время.
         """
         self.zscore_model = zscore_model
         self.lof_pipeline = lof_pipeline
         self.dbscan_pipeline = dbscan_pipeline
+        self.set_stage_order(stage_order)
+        self.reset_statistic()
 
-    def predict(self, dataframe):
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Пайплайны, сохраненные до появления порядка стадий и статистики
+        if 'stage_order' not in state:
+            self.stage_order = self.STAGES
+        if 'stage_statistic' not in state:
+            self.reset_statistic()
+
+    def set_stage_order(self, stage_order):
+        unknown = [name for name in stage_order if name not in self.STAGES]
+        if unknown:
+            raise ValueError(f"Unknown stages {unknown}, expected some of {self.STAGES}")
+        self.stage_order = tuple(stage_order)
+
+    def reset_statistic(self):
+        self.stage_statistic = {
+            name: {'calls': 0, 'rows': 0, 'rejected': 0, 'time_spent': 0.0}
+            for name in self.STAGES
+        }
+
+    def get_statistic(self):
         """
-        Предсказать выбросы с использованием всех моделей по очереди.
+        Статистика стадий с момента последнего reset_statistic().
+
+        Returns:
+        - dict: Для каждой стадии: число вызовов, число проверенных и отброшенных строк,
+          суммарное и среднее (на вызов) время, доля отброшенных строк.
+        """
+        statistic = {}
+        for name in self.stage_order:
+            stage = self.stage_statistic[name]
+            statistic[name] = dict(
+                stage,
+                avg_time_spent=stage['time_spent'] / max(stage['calls'], 1),
+                rejection_rate=stage['rejected'] / max(stage['rows'], 1),
+            )
+        return statistic
+
+    def _stage_model(self, name):
+        return {
+            'zscore': self.zscore_model,
+            'lof': self.lof_pipeline,
+            'dbscan': self.dbscan_pipeline,
+        }[name]
+
+    def _predict_stage(self, name, X, schema):
+        """Маска выбросов одной стадии для строк X."""
+        if name == 'zscore':
+            return np.asarray(self.zscore_model.predict_array(X, schema), dtype=bool)
+
+        model = self._stage_model(name)
+        # Пайплайны обучены на DataFrame: с именами колонок sklearn не предупреждает на каждом вызове
+        X = pd.DataFrame(X[:, schema.indices_for(model.feature_names_in_)], columns=model.feature_names_in_, copy=False)
+        return model.predict(X) == -1
+
+    def _input_columns(self):
+        """Колонки, которые читают активные стадии, в порядке первого использования."""
+        columns = {}
+        for name in self.stage_order:
+            model = self._stage_model(name)
+            if model is None:
+                continue
+            if name == 'zscore':
+                columns.update(dict.fromkeys([model.group_column, *model.feature_columns]))
+            else:
+                columns.update(dict.fromkeys(model.feature_names_in_))
+        return list(columns)
+
+    def predict_array(self, X, schema):
+        """
+        Предсказать выбросы для матрицы фичей, разложенной по FeatureSchema.
 
         Parameters:
-        - dataframe (pd.DataFrame): Входной DataFrame.
+        - X (np.ndarray): Матрица фичей в порядке колонок schema.
+        - schema (FeatureSchema): Раскладка колонок X.
 
         Returns:
-        - pd.Series: Булевый массив (True - выброс, False - нормальная строка).
+        - np.ndarray: Булевый массив (True - выброс, False - нормальная строка).
         """
-        # Инициализация результата
-        outliers = pd.Series(False, index=dataframe.index)
+        X = np.atleast_2d(X)
+        outliers = np.zeros(len(X), dtype=bool)
+        # Индексы строк, которые пока никто не отметил как выброс
+        remaining = np.arange(len(X))
 
-        # 1. Прогноз Z-Score модели
-        if self.zscore_model:
-            zscore_outliers = self.zscore_model.predict(dataframe)
-            outliers |= zscore_outliers
+        for name in self.stage_order:
+            if not len(remaining):
+                break
+            if self._stage_model(name) is None:
+                continue
 
-        # Оставшиеся данные после Z-Score
-        remaining_data = dataframe[~outliers]
+            start_time = time.perf_counter()
+            stage_outliers = self._predict_stage(name, X[remaining], schema)
+            stage = self.stage_statistic[name]
+            stage['time_spent'] += time.perf_counter() - start_time
+            stage['calls'] += 1
+            stage['rows'] += len(remaining)
+            stage['rejected'] += int(stage_outliers.sum())
 
-        # 2. Прогноз LOF модели
-        if self.lof_pipeline and not remaining_data.empty:
-            remaining_data = remaining_data[self.lof_pipeline.feature_names_in_]
-            lof_outliers = pd.Series(self.lof_pipeline.predict(remaining_data) == -1, index=remaining_data.index)
-            outliers |= lof_outliers
+            outliers[remaining[stage_outliers]] = True
+            remaining = remaining[~stage_outliers]
 
-        # Оставшиеся данные после LOF
-        remaining_data = dataframe[~outliers]
+        return outliers
 
-        # 3. Прогноз DBSCAN пайплайна
-        if self.dbscan_pipeline and not remaining_data.empty:
-            remaining_data = remaining_data[self.dbscan_pipeline.feature_names_in_]
-            dbscan_labels = self.dbscan_pipeline.predict(remaining_data)
-            dbscan_outliers = pd.Series(dbscan_labels == -1, index=remaining_data.index)
-            outliers |= dbscan_outliers
+    def predict(self, dataframe):
+        """
+        Предсказать выбросы с использованием всех моделей по очереди.
 
-        return outliers
\ No newline at end of file
+        Parameters:
+        - dataframe (pd.DataFrame): Входной DataFrame.
+
+        Returns:
+        - pd.Series: Булевый массив (True - выброс, False - нормальная строка).
+        """
+        # Остальные колонки (Flow, Description, label) могут быть нечисловыми
+        columns = self._input_columns()
+        outliers = self.predict_array(dataframe[columns].to_numpy(dtype=np.float64), FeatureSchema(columns))
+        return pd.Series(outliers, index=dataframe.index)
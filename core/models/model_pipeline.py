@@ -1,4 +1,5 @@
 import pickle
+import numpy as np
 import json
 import time
 from pathlib import Path
@@ -6,19 +7,30 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler, PowerTransformer
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.decomposition import FastICA, KernelPCA
-from .cluster_clf_model import ClusterClf
-from .nn_model import NNModel
 from .model_filter import OutlierPipeline
+from .compiled_transform import CompiledTransform
+from .tree_ensemble import FlatTreeEnsemble
+from .model_artifact import LazyPickleStep, load_artifact, save_artifact, is_artifact
 
 # TODO: Add discarding of unnecessary features inside this class
 class ModelPipeline:
-    def __init__(self, steps=None, model_filter=None):
+    SKLEARN_ENGINE = 'sklearn'
+    FLAT_TREES_ENGINE = 'flat_trees'
+    INFERENCE_ENGINES = (SKLEARN_ENGINE, FLAT_TREES_ENGINE)
+
+    def __init__(self, steps=None, model_filter=None, inference_engine=SKLEARN_ENGINE):
         """
         Initializes the model pipeline.
 
         Parameters:
         - steps (list): List of (name, transformer/model) tuples representing the pipeline stages.
+        - model_filter: Outlier filter applied before the classifier, or None.
+        - inference_engine (str): 'sklearn' calls classifier.predict; 'flat_trees' evaluates
+          RandomForest/GradientBoosting classifiers as flattened NumPy node arrays and falls
+          back to sklearn for other classifiers.
         """
+        if inference_engine not in self.INFERENCE_ENGINES:
+            raise ValueError(f"Unknown inference engine {inference_engine}, expected one of {self.INFERENCE_ENGINES}")
         if steps is None:
             steps = [
                 ('scaler', PowerTransformer()),
@@ -30,6 +42,8 @@ class ModelPipeline:
         self.predict_counter = 0
         self.frozen_steps = set()  # To track frozen steps
         self.model_filter= model_filter
+        self.inference_engine = inference_engine
+        self.compile()
 
     @staticmethod
     def from_config(config_path_str):
@@ -37,17 +51,25 @@ class ModelPipeline:
         Loads the pipeline from a configuration file.
 
         Parameters:
-        - config_path_str (str): Path to the JSON configuration file.
+        - config_path_str (str): Path to the JSON configuration file or to a model artifact.
+          A JSON configuration may reference an artifact instead of step pickles:
+          {"artifact": "model.vpnm"}.
 
         Returns:
         - ModelPipeline instance.
         """
+        if is_artifact(config_path_str):
+            return ModelPipeline.from_artifact(config_path_str)
+
         with open(config_path_str, 'r') as json_file:
             config = json.load(json_file)
 
         config_path = Path(config_path_str)
         config_dir = config_path.parent.absolute()
 
+        if 'artifact' in config:
+            return ModelPipeline.from_artifact(config_dir.joinpath(config['artifact']), config.get('inference_engine'))
+
         steps = []
         for name, path in config['steps'].items():
             with open(config_dir.joinpath(path), 'rb') as f:
@@ -59,7 +81,35 @@ class ModelPipeline:
             with open(config_dir.joinpath(config['model_filter']), 'rb') as f:
                 model_filter = pickle.load(f)
 
-        return ModelPipeline(steps, model_filter)
+        return ModelPipeline(steps, model_filter, config.get('inference_engine', ModelPipeline.SKLEARN_ENGINE))
+
+    @staticmethod
+    def from_artifact(artifact_path, inference_engine=None):
+        """
+        Builds the pipeline from a model artifact (see save_artifact).
+
+        Parameter arrays are memory-mapped and shared by every pipeline of the process loaded
+        from the same file; pickled steps are unpickled on first use.
+
+        Parameters:
+        - artifact_path (str or Path): Artifact file.
+        - inference_engine (str): Overrides the engine recorded in the artifact.
+        """
+        artifact = load_artifact(artifact_path)
+        return ModelPipeline(
+            list(artifact.steps),
+            artifact.model_filter,
+            inference_engine or artifact.inference_engine
+        )
+
+    def save_artifact(self, artifact_path):
+        """
+        Saves the fitted pipeline (steps, model filter, inference engine) into one artifact file.
+
+        Returns:
+        - Path to the written artifact.
+        """
+        return save_artifact(self, artifact_path)
 
     def save_to_config(self, base_path_str):
         """
@@ -82,6 +132,8 @@ class ModelPipeline:
             pipeline_structure[name] = step_path_str
 
         config_js = {'steps': pipeline_structure}
+        if self.inference_engine != self.SKLEARN_ENGINE:
+            config_js['inference_engine'] = self.inference_engine
         if self.model_filter is not None:
             model_filter_path_str = "model_filter.pkl"
             model_filter_path = base_path.joinpath(model_filter_path_str)
@@ -112,6 +164,33 @@ class ModelPipeline:
                         step.fit(X)
             if hasattr(step, 'transform'):
                 X = step.transform(X)
+        self.compile()
+
+    def compile(self):
+        """
+        Precomputes the transform steps into NumPy kernels used instead of sklearn's transform().
+
+        Falls back to the sklearn steps (compiled_transform is None) if a step is not supported
+        or not fitted yet. With the 'flat_trees' engine the classifier is flattened the same way
+        (compiled_classifier).
+        """
+        try:
+            self.compiled_transform = CompiledTransform.compile(self.pipeline.steps)
+        except AttributeError:
+            self.compiled_transform = None
+
+        self.compiled_classifier = None
+        if self.inference_engine == self.FLAT_TREES_ENGINE and 'classifier' in self.pipeline.named_steps:
+            classifier = self.pipeline.named_steps['classifier']
+            if isinstance(classifier, LazyPickleStep):
+                # Artifacts exported for flat_trees carry the flattened classifier next to its pickle
+                classifier = classifier.load() if classifier.flat_tree_ensemble is None else classifier.flat_tree_ensemble
+            try:
+                self.compiled_classifier = FlatTreeEnsemble.compile(classifier)
+            except AttributeError:
+                pass
+            if self.compiled_classifier is None:
+                print(f"{self.inference_engine} engine does not support {type(classifier).__name__}, using sklearn")
 
     def freeze_step(self, step_name):
         """
@@ -163,14 +242,62 @@ class ModelPipeline:
         - Predictions from the pipeline's final stage.
         """
         X = X[self.pipeline.feature_names_in_]
+        return self._classify(self._transform(X))
+
+    def get_feature_names(self):
+        """Feature columns the pipeline was fitted on, or None if they were not recorded."""
+        return getattr(self.pipeline, 'feature_names_in_', None)
+
+    def _classify(self, X):
+        if self.compiled_classifier is not None:
+            return self.compiled_classifier.predict(X)
+        return self.pipeline.named_steps['classifier'].predict(X)
+
+    def _transform(self, X):
+        if self.compiled_transform is not None:
+            return self.compiled_transform(X)
         for name, step in self.pipeline.named_steps.items():
             if hasattr(step, 'transform'):
                 X = step.transform(X)
-        return self.pipeline.named_steps['classifier'].predict(X)
+        return X
+
+    @time_count_decorator
+    def predict_array(self, X, schema):
+        """
+        Predicts on a NumPy feature matrix laid out by a FeatureSchema.
+
+        Parameters:
+        - X (np.ndarray): One feature row or a matrix of rows in `schema` column order.
+        - schema (FeatureSchema): Column layout of X.
+
+        Returns:
+        - Predictions from the pipeline's final stage.
+        """
+        X = np.atleast_2d(X)
+        feature_names = self.get_feature_names()
+        if feature_names is not None:
+            X = X[:, schema.indices_for(feature_names)]
+        return self._classify(self._transform(X))
 
     def filter(self, X):
+        if self.model_filter is None:
+            return np.zeros(len(X), dtype=bool)
         return self.model_filter.predict(X)
 
+    def filter_array(self, X, schema):
+        X = np.atleast_2d(X)
+        if self.model_filter is None:
+            return np.zeros(len(X), dtype=bool)
+        if hasattr(self.model_filter, 'predict_array'):
+            return np.asarray(self.model_filter.predict_array(X, schema))
+        return np.asarray(self.model_filter.predict(schema.to_frame(X)))
+
+    def get_filter_statistic(self):
+        """Per-stage statistic of the model filter, empty if the filter does not record one."""
+        if self.model_filter is None or not hasattr(self.model_filter, 'get_statistic'):
+            return {}
+        return self.model_filter.get_statistic()
+
 
 if __name__ == "__main__":
     # Example config for saving/loading pipeline
@@ -0,0 +1,138 @@
+import json
+import hashlib
+import threading
+import traceback
+from pathlib import Path
+
+import numpy as np
+
+from .model_pipeline import ModelPipeline
+from .model_artifact import is_artifact
+
+
+def model_files(config_path):
+    """The config file and every model file it references."""
+    config_path = Path(config_path)
+    if is_artifact(config_path):
+        return [config_path]
+
+    with open(config_path, 'r') as json_file:
+        config = json.load(json_file)
+    config_dir = config_path.parent.absolute()
+    paths = [config_dir.joinpath(path) for path in config.get('steps', {}).values()]
+    for key in ('model_filter', 'artifact'):
+        if key in config:
+            paths.append(config_dir.joinpath(config[key]))
+    return [config_path] + paths
+
+
+def model_version(config_path):
+    """
+    Version label of the model a config points to.
+
+    The "version" field of a JSON config if it has one, otherwise the first 12 hex digits
+    of a sha256 over the config and all model files it references.
+    """
+    config_path = Path(config_path)
+    if not is_artifact(config_path):
+        with open(config_path, 'r') as json_file:
+            version = json.load(json_file).get('version')
+        if version is not None:
+            return str(version)
+
+    digest = hashlib.sha256()
+    for path in model_files(config_path):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class ModelWatcher(threading.Thread):
+    def __init__(self, config_path, schema=None, poll_interval=2.0, warmup_rows=8):
+        """
+        Watches a pipeline config (and the model files it references) and loads changed models
+        in the background.
+
+        A new ModelPipeline is loaded and warmed up on this thread, then published; the consumer
+        picks it up with take_update() between batches, so no packet waits for the load.
+        A model that fails to load or warm up is reported and never published.
+
+        Parameters:
+        - config_path (str or Path): pipeline_config.json or model artifact passed to ModelPipeline.from_config.
+        - schema (FeatureSchema): Feature layout used for the warm-up prediction; no warm-up if None.
+        - poll_interval (float): Seconds between file checks.
+        - warmup_rows (int): Rows in the warm-up batch.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.config_path = Path(config_path)
+        self.schema = schema
+        self.poll_interval = poll_interval
+        self.warmup_rows = warmup_rows
+
+        self._signature = self._read_signature()
+        self.model_version = model_version(self.config_path)
+        self._update = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self.reload_number = 0
+        self.failed_reload_number = 0
+
+    def _read_signature(self):
+        try:
+            return tuple(
+                (str(path), path.stat().st_mtime_ns, path.stat().st_size)
+                for path in map(Path, model_files(self.config_path))
+            )
+        except (OSError, ValueError):
+            # Missing or half-written config: compare again on the next poll
+            return None
+
+    def _warmup(self, model_pipeline):
+        if self.schema is None:
+            return
+        X = np.zeros((self.warmup_rows, len(self.schema)))
+        keep = ~np.asarray(model_pipeline.filter_array(X, self.schema), dtype=bool)
+        model_pipeline.predict_array(X[keep] if keep.any() else X, self.schema)
+
+    def check(self):
+        """Loads and publishes the model if the watched files changed; returns True if it did."""
+        signature = self._read_signature()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+
+        try:
+            version = model_version(self.config_path)
+            model_pipeline = ModelPipeline.from_config(self.config_path)
+            self._warmup(model_pipeline)
+        except Exception:
+            self.failed_reload_number += 1
+            print(f"Model reload from {self.config_path} failed, keeping model {self.model_version}")
+            traceback.print_exc()
+            return False
+
+        with self._lock:
+            self._update = (version, model_pipeline)
+        self.reload_number += 1
+        print(f"Model {version} loaded from {self.config_path}")
+        return True
+
+    def take_update(self):
+        """Returns (model_version, model_pipeline) published since the last call, or None."""
+        if self._update is None:
+            return None
+        with self._lock:
+            update, self._update = self._update, None
+        if update is not None:
+            self.model_version = update[0]
+        return update
+
+    def run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.check()
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,16 +1,57 @@
 import pandas as pd
 import numpy as np
-import scipy as sp
 from sklearn.cluster import DBSCAN
 
 class DBSCANWrapper(DBSCAN):
+    # Верхняя граница размера блока расстояний (сэмплы x core-точки), считаемого за раз
+    PREDICT_BLOCK_SIZE = 1 << 22
+
+    def fit(self, X, y=None, sample_weight=None):
+        super().fit(X, y, sample_weight)
+        self._prepare_core_points()
+        return self
+
+    def _prepare_core_points(self):
+        """
+        Кэширует то, что нужно predict() от core-точек: квадраты их норм и метки.
+        У моделей, сохраненных до появления кэша, он строится при первом predict().
+        """
+        components = np.asarray(self.components_, dtype=np.float64)
+        self._core_squared_norms = np.einsum('ij,ij->i', components, components)
+        self._core_labels = np.asarray(self.labels_)[self.core_sample_indices_]
+
     def predict(self, X_new):
-        y_new = np.ones(shape=len(X_new), dtype=int)*-1 
-        for j, x_new in enumerate(X_new):
-            for i, x_core in enumerate(self.components_): 
-                if sp.spatial.distance.cosine(x_new, x_core) < self.eps:
-                    y_new[j] = self.labels_[self.core_sample_indices_[i]]
-                    break
+        """
+        Присваивает каждому сэмплу метку первой (в порядке components_) core-точки,
+        косинусное расстояние до которой меньше eps, иначе -1.
+
+        То же правило, что и цикл по scipy.spatial.distance.cosine, но посчитанное
+        одним матричным произведением на блок сэмплов.
+        """
+        if getattr(self, '_core_squared_norms', None) is None:
+            self._prepare_core_points()
+
+        X_new = np.asarray(X_new, dtype=np.float64)
+        components = np.asarray(self.components_, dtype=np.float64)
+        y_new = np.full(len(X_new), -1, dtype=int)
+        if not len(X_new) or not len(components):
+            return y_new
+
+        block_size = max(self.PREDICT_BLOCK_SIZE // len(components), 1)
+        for start in range(0, len(X_new), block_size):
+            X_block = X_new[start:start + block_size]
+            squared_norms = np.einsum('ij,ij->i', X_block, X_block)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distances = 1.0 - (X_block @ components.T) / np.sqrt(squared_norms[:, None] * self._core_squared_norms[None, :])
+            np.clip(distances, 0.0, 2.0, out=distances)
+
+            # NaN (нулевые векторы) не меньше eps, как и в scipy
+            within_eps = distances < self.eps
+            has_core_point = within_eps.any(axis=1)
+            first_core_point = within_eps.argmax(axis=1)
+            y_new[start:start + block_size][has_core_point] = self._core_labels[first_core_point[has_core_point]]
+
         return y_new
 
 class OutlierDetector:
@@ -26,6 +67,36 @@ class OutlierDetector:
         self.feature_columns = feature_columns
         self.z_score_threshold = z_score_threshold
         self.stats_ = {}  # Хранение mean и std для каждой группы
+        self._compile_stats()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Модели, сохраненные до появления компиляции, содержат только stats_
+        self._compile_stats()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_group_index', '_means', '_stds'):
+            state.pop(name, None)
+        return state
+
+    def _compile_stats(self):
+        """
+        Собирает stats_ в плотные массивы mean/std формы (число групп + 1, число фичей).
+        Последняя строка заполнена NaN: туда попадают группы, которых не было при обучении.
+        """
+        groups = {}
+        for feature in self.feature_columns:
+            groups.update(dict.fromkeys(self.stats_.get(feature, {})))
+
+        self._group_index = pd.Index(list(groups))
+        self._means = np.full((len(groups) + 1, len(self.feature_columns)), np.nan)
+        self._stds = np.full((len(groups) + 1, len(self.feature_columns)), np.nan)
+        for feature_index, feature in enumerate(self.feature_columns):
+            for group, stats in self.stats_.get(feature, {}).items():
+                group_code = self._group_index.get_loc(group)
+                self._means[group_code, feature_index] = stats['mean']
+                self._stds[group_code, feature_index] = stats['std']
 
     def fit(self, dataframe):
         """
@@ -38,39 +109,59 @@ class OutlierDetector:
             feature: dataframe.groupby(self.group_column)[feature].agg(['mean', 'std']).to_dict('index')
             for feature in self.feature_columns
         }
+        self._compile_stats()
 
-    def predict(self, dataframe):
+    def predict_values(self, groups, values):
         """
-        Предсказывает, является ли каждая строка выбросом.
+        Предсказывает выбросы по массивам NumPy.
 
         Parameters:
-        - dataframe (pd.DataFrame): Входной DataFrame.
+        - groups (array-like): Значения колонки группировки, форма (n,).
+        - values (array-like): Значения фичей в порядке feature_columns, форма (n, число фичей).
 
         Returns:
-        - pd.Series: Булевый массив, где True - выброс, False - нормальная строка.
+        - np.ndarray: Булевый массив, где True - выброс, False - нормальная строка.
         """
-        is_outlier = pd.Series(False, index=dataframe.index)
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.feature_columns))
+        # -1 (неизвестная группа) указывает на последнюю строку из NaN
+        group_codes = self._group_index.get_indexer(np.asarray(groups))
 
-        # Обходим все фичи и вычисляем выбросы
-        for feature in self.feature_columns:
-            group_stats = self.stats_.get(feature, {})
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = (values - self._means[group_codes]) / self._stds[group_codes]
 
-            # Преобразуем статистики в DataFrame
-            stats_df = pd.DataFrame(group_stats).T.rename_axis(self.group_column)
+        # NaN (группы без данных) не больше порога, то есть трактуется как False
+        return (np.abs(z_scores) > self.z_score_threshold).any(axis=1)
 
-            # Соединяем исходный DataFrame с рассчитанными статистиками
-            merged = dataframe.merge(stats_df, on=self.group_column, how='left', suffixes=('', '_stats'))
+    def predict_array(self, X, schema):
+        """
+        Предсказывает выбросы для матрицы фичей, разложенной по FeatureSchema.
 
-            # Вычисляем z-скор
-            z_scores = (merged[feature] - merged['mean']) / merged['std']
+        Parameters:
+        - X (np.ndarray): Матрица фичей в порядке колонок schema.
+        - schema (FeatureSchema): Раскладка колонок X.
 
-            # Выбросы: проверка по порогу
-            feature_outliers = z_scores.abs() > self.z_score_threshold
+        Returns:
+        - np.ndarray: Булевый массив, где True - выброс, False - нормальная строка.
+        """
+        X = np.atleast_2d(X)
+        group_index = schema.indices_for([self.group_column])[0]
+        return self.predict_values(X[:, group_index], X[:, schema.indices_for(self.feature_columns)])
 
-            # Обновляем итоговый результат
-            is_outlier |= feature_outliers.fillna(False)  # NaN (группы без данных) трактуем как False
+    def predict(self, dataframe):
+        """
+        Предсказывает, является ли каждая строка выбросом.
+
+        Parameters:
+        - dataframe (pd.DataFrame): Входной DataFrame.
 
-        return is_outlier
+        Returns:
+        - pd.Series: Булевый массив, где True - выброс, False - нормальная строка.
+        """
+        is_outlier = self.predict_values(
+            dataframe[self.group_column].to_numpy(),
+            dataframe[self.feature_columns].to_numpy(dtype=np.float64)
+        )
+        return pd.Series(is_outlier, index=dataframe.index)
 
     def fit_predict(self, dataframe):
         """
@@ -0,0 +1,197 @@
+import numpy as np
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier
+
+
+class FlatTreeEnsemble:
+    RANDOM_FOREST = 'random_forest'
+    GRADIENT_BOOSTING = 'gradient_boosting'
+
+    # Node arrays that fully describe a flattened ensemble (see get_state)
+    ARRAY_FIELDS = ('roots', 'features', 'thresholds', 'children', 'missing_go_to_left', 'leaf_values', 'tree_outputs', 'init_raw_prediction')
+
+    def __init__(
+            self,
+            kind,
+            classes,
+            roots,
+            features,
+            thresholds,
+            children,
+            missing_go_to_left,
+            leaf_values,
+            max_depth,
+            tree_outputs=None,
+            init_raw_prediction=None,
+            learning_rate=None
+    ):
+        """
+        Tree ensemble flattened into NumPy node arrays, evaluated level by level for a whole batch.
+
+        Nodes of all trees are concatenated; leaves point to themselves, so extra levels leave
+        finished trees in place. Use compile() to build one from a fitted sklearn estimator.
+
+        Parameters:
+        - kind (str): RANDOM_FOREST (averaged leaf probabilities) or GRADIENT_BOOSTING (summed leaf values).
+        - classes (np.ndarray): Class labels returned by predict().
+        - roots (np.ndarray): Flat index of every tree root.
+        - features, thresholds (np.ndarray): Split of every node.
+        - children (np.ndarray): children[2 * node + go_left], right child at even and left child at odd positions.
+        - missing_go_to_left (np.ndarray): Where NaN features go at every node.
+        - leaf_values (np.ndarray): (node_number, n_classes) class probabilities for a forest,
+          (node_number,) raw values for boosting.
+        - max_depth (int): Depth of the deepest tree.
+        - tree_outputs (np.ndarray): For boosting, the raw prediction column each tree adds to.
+        - init_raw_prediction (np.ndarray): For boosting, raw prediction of the init estimator.
+        - learning_rate (float): For boosting, scale of every tree value.
+        """
+        self.kind = kind
+        self.classes = classes
+        self.roots = roots
+        self.tree_number = len(roots)
+        self.features = features
+        self.thresholds = thresholds
+        self.children = children
+        self.missing_go_to_left = missing_go_to_left
+        self.has_missing_go_to_left = bool(missing_go_to_left.any())
+        self.leaf_values = leaf_values
+        self.max_depth = int(max_depth)
+        self.tree_outputs = tree_outputs
+        self.init_raw_prediction = init_raw_prediction
+        self.learning_rate = learning_rate
+
+    @staticmethod
+    def _from_trees(kind, trees, classes, leaf_values, tree_outputs=None, init_raw_prediction=None, learning_rate=None):
+        node_counts = [tree.node_count for tree in trees]
+        roots = np.concatenate([[0], np.cumsum(node_counts)[:-1]]).astype(np.intp)
+
+        features, thresholds, left_children, right_children, missing_go_to_left = [], [], [], [], []
+        for root, tree in zip(roots, trees):
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            left_children.append(root + np.where(is_leaf, nodes, tree.children_left))
+            right_children.append(root + np.where(is_leaf, nodes, tree.children_right))
+            missing_go_to_left.append(
+                tree.missing_go_to_left.astype(bool) if hasattr(tree, 'missing_go_to_left')
+                else np.zeros(tree.node_count, dtype=bool)
+            )
+
+        return FlatTreeEnsemble(
+            kind,
+            classes,
+            roots,
+            np.concatenate(features).astype(np.intp),
+            np.concatenate(thresholds),
+            np.column_stack([np.concatenate(right_children), np.concatenate(left_children)]).ravel().astype(np.intp),
+            np.concatenate(missing_go_to_left),
+            np.concatenate(leaf_values),
+            max(tree.max_depth for tree in trees),
+            tree_outputs=None if tree_outputs is None else np.asarray(tree_outputs, dtype=np.intp),
+            init_raw_prediction=init_raw_prediction,
+            learning_rate=learning_rate
+        )
+
+    def get_state(self):
+        """Scalar parameters and node arrays from which FlatTreeEnsemble(**params, **arrays) rebuilds the ensemble."""
+        params = {
+            'kind': self.kind,
+            'classes': self.classes,
+            'max_depth': self.max_depth,
+            'learning_rate': self.learning_rate,
+        }
+        arrays = {name: getattr(self, name) for name in self.ARRAY_FIELDS if getattr(self, name) is not None}
+        return params, arrays
+
+    @staticmethod
+    def compile(estimator):
+        """
+        Flattens a fitted RandomForest/ExtraTrees/GradientBoosting classifier.
+
+        Returns None for any other estimator (or a configuration predict() cannot reproduce
+        exactly), so the caller keeps using estimator.predict. An already flattened ensemble
+        is returned as is.
+        """
+        if isinstance(estimator, FlatTreeEnsemble):
+            return estimator
+
+        if type(estimator) in (RandomForestClassifier, ExtraTreesClassifier):
+            if estimator.n_outputs_ != 1:
+                return None
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            leaf_values = []
+            for tree in trees:
+                # The normalization DecisionTreeClassifier.predict_proba applies
+                proba = tree.value[:, 0, :estimator.n_classes_].copy()
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+                leaf_values.append(proba)
+            return FlatTreeEnsemble._from_trees(FlatTreeEnsemble.RANDOM_FOREST, trees, estimator.classes_, leaf_values)
+
+        if type(estimator) is GradientBoostingClassifier:
+            if not (isinstance(estimator.init_, DummyClassifier) or estimator.init_ == 'zero'):
+                return None
+            # The prior of a dummy init estimator does not depend on X
+            init_raw_prediction = estimator._raw_predict_init(
+                np.zeros((1, estimator.n_features_in_), dtype=np.float32)
+            )[0]
+            trees, tree_outputs, leaf_values = [], [], []
+            for stage in estimator.estimators_:
+                for output, tree in enumerate(stage):
+                    trees.append(tree.tree_)
+                    tree_outputs.append(output)
+                    leaf_values.append(tree.tree_.value[:, 0, 0])
+            return FlatTreeEnsemble._from_trees(
+                FlatTreeEnsemble.GRADIENT_BOOSTING,
+                trees,
+                estimator.classes_,
+                leaf_values,
+                tree_outputs=tree_outputs,
+                init_raw_prediction=init_raw_prediction,
+                learning_rate=estimator.learning_rate
+            )
+
+        return None
+
+    def apply(self, X):
+        """Flat leaf index reached in every tree, shape (n_samples, tree_number)."""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        nodes = np.broadcast_to(self.roots, (len(X), self.tree_number))
+        for _ in range(self.max_depth):
+            values = np.take_along_axis(X, self.features[nodes], axis=1)
+            go_left = values <= self.thresholds[nodes]
+            if self.has_missing_go_to_left:
+                go_left |= np.isnan(values) & self.missing_go_to_left[nodes]
+            nodes = self.children[2 * nodes + go_left]
+        return nodes
+
+    def predict_proba(self, X):
+        """Forest class probabilities, summed over trees in ensemble order like sklearn does."""
+        leaf_proba = self.leaf_values[self.apply(X)]
+        return np.add.accumulate(leaf_proba, axis=1)[:, -1] / self.tree_number
+
+    def decision_function(self, X):
+        """Boosting raw predictions, shape (n_samples, n_outputs), accumulated stage by stage."""
+        leaves = self.apply(X)
+        raw_predictions = np.empty((len(leaves), len(self.init_raw_prediction)))
+        for output, init_value in enumerate(self.init_raw_prediction):
+            columns = np.flatnonzero(self.tree_outputs == output)
+            terms = np.empty((len(leaves), len(columns) + 1))
+            terms[:, 0] = init_value
+            terms[:, 1:] = self.learning_rate * self.leaf_values[leaves[:, columns]]
+            # accumulate adds strictly left to right, the order of sklearn's predict_stages
+            raw_predictions[:, output] = np.add.accumulate(terms, axis=1)[:, -1]
+        return raw_predictions
+
+    def predict(self, X):
+        X = np.atleast_2d(X)
+        if self.kind == self.RANDOM_FOREST:
+            return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+        raw_predictions = self.decision_function(X)
+        if raw_predictions.shape[1] == 1:
+            return self.classes[(raw_predictions[:, 0] >= 0).astype(int)]
+        return self.classes[np.argmax(raw_predictions, axis=1)]
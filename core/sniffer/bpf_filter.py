@@ -0,0 +1,247 @@
+import ctypes
+import socket
+import struct
+
+from ..flow.flow_key import IPPROTO_TCP, IPPROTO_UDP
+from .packet_decoder import (
+    DLT_EN10MB,
+    DLT_RAW,
+    DLT_LINUX_SLL,
+    RAW_IP_LINKTYPES,
+    ETH_P_IP,
+    ETH_P_IPV6,
+    VLAN_ETHERTYPES,
+    IPV6_FRAGMENT,
+    IPV6_EXTENSION_HEADERS,
+    TLS_PORTS
+)
+
+# Classic BPF opcodes, linux/filter.h
+BPF_LD = 0x00
+BPF_LDX = 0x01
+BPF_ALU = 0x04
+BPF_JMP = 0x05
+BPF_RET = 0x06
+
+BPF_W = 0x00
+BPF_H = 0x08
+BPF_B = 0x10
+
+BPF_IMM = 0x00
+BPF_ABS = 0x20
+BPF_IND = 0x40
+BPF_MSH = 0xa0
+
+BPF_AND = 0x50
+
+BPF_JA = 0x00
+BPF_JEQ = 0x10
+BPF_JSET = 0x40
+
+BPF_K = 0x00
+
+SO_ATTACH_FILTER = 26
+
+# Bytes of an accepted packet passed to userspace
+MAX_SNAPLEN = 0x40000
+
+# ARPHRD_* types of Linux interfaces and the link types their AF_PACKET frames have
+ARPHRD_LINKTYPES = {
+    1: DLT_EN10MB,      # ARPHRD_ETHER
+    772: DLT_EN10MB,    # ARPHRD_LOOPBACK, zero MAC addresses
+    65534: DLT_RAW,     # ARPHRD_NONE, e.g. tun: raw IP
+}
+
+_INSTRUCTION = struct.Struct('HBBI')
+
+
+class _Assembler:
+    """Collects instructions; jump targets are labels resolved by assemble()."""
+
+    def __init__(self):
+        self._instructions = []
+        self._labels = {}
+
+    def label(self, name):
+        self._labels[name] = len(self._instructions)
+
+    def emit(self, code, k=0, jt=None, jf=None):
+        self._instructions.append((code, jt, jf, k))
+
+    def assemble(self):
+        program = []
+        for index, (code, jt, jf, k) in enumerate(self._instructions):
+            # Jumps are relative to the next instruction; None falls through
+            jt = 0 if jt is None else self._labels[jt] - index - 1
+            jf = 0 if jf is None else self._labels[jf] - index - 1
+            if code & 0x07 == BPF_JMP and (code & 0xf0) == BPF_JA:
+                k, jt, jf = jt, 0, 0
+            program.append((code, jt, jf, k))
+        return program
+
+
+def _emit_ports(assembler, port_offset, ports, indexed):
+    mode = BPF_IND if indexed else BPF_ABS
+    for offset in (port_offset, port_offset + 2):
+        assembler.emit(BPF_LD | BPF_H | mode, offset)
+        for port in sorted(ports):
+            assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, port, jt='accept')
+    assembler.emit(BPF_JMP | BPF_JA, jt='drop')
+
+
+def _emit_ip(assembler, network_offset, ports):
+    assembler.label('ipv4')
+    assembler.emit(BPF_LD | BPF_B | BPF_ABS, network_offset + 9)
+    assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, IPPROTO_TCP, jt='ipv4_l4')
+    assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, IPPROTO_UDP, jt='ipv4_l4', jf='drop')
+    assembler.label('ipv4_l4')
+    # Non-first fragments carry no L4 header
+    assembler.emit(BPF_LD | BPF_H | BPF_ABS, network_offset + 6)
+    assembler.emit(BPF_JMP | BPF_JSET | BPF_K, 0x1fff, jt='drop')
+    # X = IPv4 header length
+    assembler.emit(BPF_LDX | BPF_B | BPF_MSH, network_offset)
+    _emit_ports(assembler, network_offset, ports, indexed=True)
+
+    assembler.label('ipv6')
+    assembler.emit(BPF_LD | BPF_B | BPF_ABS, network_offset + 6)
+    assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, IPPROTO_TCP, jt='ipv6_l4')
+    assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, IPPROTO_UDP, jt='ipv6_l4')
+    # Extension header chains are left to the decoder
+    for next_header in IPV6_EXTENSION_HEADERS + (IPV6_FRAGMENT,):
+        assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, next_header, jt='accept')
+    assembler.emit(BPF_JMP | BPF_JA, jt='drop')
+    assembler.label('ipv6_l4')
+    _emit_ports(assembler, network_offset + 40, ports, indexed=False)
+
+
+def compile_tls_filter(linktype=DLT_EN10MB, ports=TLS_PORTS, snaplen=MAX_SNAPLEN):
+    """
+    Hand-assembled classic BPF program that keeps the packets decode_packet() can accept.
+
+    IPv4/IPv6 TCP or UDP packets with a source or destination port in `ports` are accepted,
+    non-first IPv4 fragments and everything else are dropped in the kernel. Frames the program
+    cannot judge cheaply (VLAN tags, IPv6 extension headers) are accepted and left to the decoder,
+    so the filter never drops a packet the decoder would keep.
+
+    Parameters:
+    - linktype (int): Link type of the frames (DLT_EN10MB, DLT_LINUX_SLL or a raw IP type).
+    - ports (iterable): Ports to keep.
+    - snaplen (int): Bytes of an accepted packet passed to userspace.
+
+    Returns:
+    - BpfProgram
+    """
+    assembler = _Assembler()
+    if linktype in RAW_IP_LINKTYPES:
+        network_offset = 0
+        assembler.emit(BPF_LD | BPF_B | BPF_ABS, 0)
+        assembler.emit(BPF_ALU | BPF_AND | BPF_K, 0xf0)
+        assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, 0x40, jt='ipv4')
+        assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, 0x60, jt='ipv6', jf='drop')
+    elif linktype in (DLT_EN10MB, DLT_LINUX_SLL):
+        ethertype_offset = 12 if linktype == DLT_EN10MB else 14
+        network_offset = ethertype_offset + 2
+        assembler.emit(BPF_LD | BPF_H | BPF_ABS, ethertype_offset)
+        assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, ETH_P_IP, jt='ipv4')
+        assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, ETH_P_IPV6, jt='ipv6')
+        for ethertype in VLAN_ETHERTYPES:
+            assembler.emit(BPF_JMP | BPF_JEQ | BPF_K, ethertype, jt='accept')
+        assembler.emit(BPF_JMP | BPF_JA, jt='drop')
+    else:
+        raise ValueError(f"Unsupported link type {linktype}")
+
+    _emit_ip(assembler, network_offset, ports)
+    assembler.label('accept')
+    assembler.emit(BPF_RET | BPF_K, snaplen)
+    assembler.label('drop')
+    assembler.emit(BPF_RET | BPF_K, 0)
+    return BpfProgram(assembler.assemble())
+
+
+def interface_linktype(sock):
+    """Link type of the frames a bound AF_PACKET socket receives, None if unknown."""
+    return ARPHRD_LINKTYPES.get(sock.getsockname()[3])
+
+
+class BpfProgram:
+    def __init__(self, instructions):
+        """
+        Classic BPF program: a list of (code, jt, jf, k) instructions.
+
+        run() interprets it the way the kernel does, so a program can be checked
+        against frames of a pcap replay without a live socket.
+        """
+        self.instructions = list(instructions)
+
+    def __len__(self):
+        return len(self.instructions)
+
+    def to_bytes(self):
+        return b''.join(_INSTRUCTION.pack(*instruction) for instruction in self.instructions)
+
+    def attach(self, sock):
+        """Attaches the program to a socket with SO_ATTACH_FILTER; the kernel keeps its own copy."""
+        buffer = ctypes.create_string_buffer(self.to_bytes())
+        # struct sock_fprog {unsigned short len; struct sock_filter *filter;}
+        fprog = struct.pack('HL', len(self), ctypes.addressof(buffer))
+        sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+    @staticmethod
+    def _load(frame, offset, size):
+        if offset < 0 or offset + size > len(frame):
+            raise IndexError(offset)
+        return int.from_bytes(frame[offset:offset + size], 'big')
+
+    def run(self, frame):
+        """Returns the number of bytes the program accepts, 0 for a dropped frame."""
+        sizes = {BPF_W: 4, BPF_H: 2, BPF_B: 1}
+        a = x = 0
+        pc = 0
+        try:
+            while True:
+                code, jt, jf, k = self.instructions[pc]
+                pc += 1
+                instruction_class = code & 0x07
+                if instruction_class == BPF_LD:
+                    mode = code & 0xe0
+                    if mode == BPF_ABS:
+                        a = self._load(frame, k, sizes[code & 0x18])
+                    elif mode == BPF_IND:
+                        a = self._load(frame, x + k, sizes[code & 0x18])
+                    elif mode == BPF_IMM:
+                        a = k
+                    else:
+                        raise ValueError(f"Unsupported instruction {code:#x}")
+                elif instruction_class == BPF_LDX:
+                    if code & 0xe0 == BPF_MSH:
+                        x = (self._load(frame, k, 1) & 0x0f) * 4
+                    elif code & 0xe0 == BPF_IMM:
+                        x = k
+                    else:
+                        raise ValueError(f"Unsupported instruction {code:#x}")
+                elif instruction_class == BPF_ALU:
+                    operation = code & 0xf0
+                    if operation == BPF_AND:
+                        a &= k
+                    else:
+                        raise ValueError(f"Unsupported instruction {code:#x}")
+                elif instruction_class == BPF_JMP:
+                    operation = code & 0xf0
+                    if operation == BPF_JA:
+                        pc += k
+                    elif operation == BPF_JEQ:
+                        pc += jt if a == k else jf
+                    elif operation == BPF_JSET:
+                        pc += jt if a & k else jf
+                    else:
+                        raise ValueError(f"Unsupported instruction {code:#x}")
+                elif instruction_class == BPF_RET:
+                    return k
+                else:
+                    raise ValueError(f"Unsupported instruction {code:#x}")
+        except IndexError:
+            # Loads past the end of the packet drop it
+            return 0
+
+    def matches(self, frame):
+        return self.run(frame) > 0
@@ -1,5 +1,3 @@
-import time
-import sys
 import threading
 from collections import defaultdict
 import warnings
@@ -10,10 +8,19 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 
 from ..utils.concurrent_queue import ConcurrentQueue
+from ..utils.timing_wheel import TimingWheel
 from ..flow.flow import Flow
 from ..flow.flow_storage import FlowStorage
+from ..flow.host_verdict_store import HostVerdictStore, HostDetectionRule
+from ..feature.feature_storage import FeatureStorage
+from ..models.batch_predictor import BatchPredictor
+from .verdict_writer import Verdict
 
 class DetectWorker(threading.Thread):
+    # Flow expiry wheel: 0.1s slots, 6.4s per revolution
+    EXPIRY_TICK = 0.1
+    EXPIRY_SLOT_NUMBER = 64
+
     def __init__(
             self,
             model_pipeline,
@@ -25,54 +32,136 @@ class DetectWorker(threading.Thread):
             detection_time_interval=10,
             vpn_to_novpn_ratio = 0.0,
             total_detected_flow_threshold = 3,
-            input_queue=None
+            input_queue=None,
+            verdict_callback=None,
+            predict_batch_size=64,
+            predict_max_latency=0.05,
+            drain_batch_size=256,
+            model_version=None,
+            model_watcher=None,
+            flow_max_age=3,
+            flow_idle_timeout=None,
+            host_storage_size=10000,
+            host_ttl=600,
+            host_decay_half_life=None,
+            count_host_verdicts=True
     ):
         threading.Thread.__init__(self)
         self.daemon = True        
 
         self.input_queue = input_queue
+        self.drain_batch_size = drain_batch_size
 
         self.flow_storage = FlowStorage(fix_size=flow_storage_size)
         self.model_pipeline = model_pipeline
+        self.feature_schema = FeatureStorage.get_schema()
+        self.batch_predictor = BatchPredictor(
+            model_pipeline,
+            self.feature_schema,
+            self._apply_prediction,
+            max_batch_size=predict_batch_size,
+            max_latency=predict_max_latency
+        )
 
         self.predict_rate = predict_rate
         self.start_threshold_packet_number = start_packet_number_threshold
         self.end_packet_number_threshold = end_packet_number_threshold
 
-        self.possible_vpn_flow = defaultdict(int)
-        self.possible_non_vpn_flow = defaultdict(int)
-        
+        # Flows expire by packet time: `flow_max_age` seconds after their first packet
+        # or `flow_idle_timeout` seconds after their last one
+        self.flow_max_age = flow_max_age
+        self.flow_idle_timeout = flow_idle_timeout
+        self.expiry_wheel = TimingWheel(self.EXPIRY_TICK, self.EXPIRY_SLOT_NUMBER)
+        self.expired_flow_number = 0
+        self.final_predicted_flow_number = 0
+
         # detect threshold
-        self.detection_time_vpn_flows = defaultdict(list)
-        self.flow_number_for_detect = flow_number_for_detect
-        self.detection_time_interval = detection_time_interval
-        self.total_detected_flow_threshold = total_detected_flow_threshold
-        self.vpn_to_novpn_ratio = vpn_to_novpn_ratio
+        self.detection_rule = HostDetectionRule(
+            total_detected_flow_threshold=total_detected_flow_threshold,
+            flow_number_for_detect=flow_number_for_detect,
+            vpn_to_novpn_ratio=vpn_to_novpn_ratio
+        )
+        # Without count_host_verdicts (ShardedDetector shards) the caller counts the verdicts per host
+        self.host_verdicts = None
+        if count_host_verdicts:
+            self.host_verdicts = HostVerdictStore(
+                max_hosts=host_storage_size,
+                ttl=host_ttl,
+                window=detection_time_interval,
+                window_capacity=self.detection_rule.get_window_capacity(),
+                decay_half_life=host_decay_half_life
+            )
 
         self.extract_time = []
         self.model_pipeline_time = []
+        self.created_flow_number = 0
 
-        # print stats:
-        self.flow_lines = defaultdict(int)
-        self.total_lines = 60
+        # Verdicts go out through the callback, e.g. a VerdictStream with the dashboard as one of its sinks
+        self.verdict_callback = verdict_callback
+
+        # Hot reload: the watcher loads new models, this thread swaps them in between batches
+        self.model_watcher = model_watcher
+        if model_version is None and model_watcher is not None:
+            model_version = model_watcher.model_version
+        self.model_version = model_version
+        self.verdict_number_by_model = defaultdict(int)
 
     def run(self):
         while True:
-            if not self.input_queue.empty():
-                packet = self.input_queue.pop()
+            # Wake up on new packets or when the pending batch is due
+            packets = self.input_queue.pop_batch(self.drain_batch_size, timeout=self.batch_predictor.max_latency)
+            for packet in packets:
                 self._packet_processing(packet)
-            else:
-                time.sleep(0.1)
+            if not packets:
+                self.batch_predictor.flush()
+            self.poll()
 
     def set_input(self, input_queue):
         self.input_queue = input_queue
 
-    # def _extract_flow_key(self, packet):
-    #     return ''.join(sorted(f"{packet['IP'].src} -- {packet['IP'].dst}"))
-    def _extract_flow_key(self, packet):
-        flow_key = self.flow_storage.extract_flow_key_for_packet(packet)
-        node_1, node_2 = flow_key.split('<-->')
-        return f"{node_1.split(':')[0]}<-->{node_2.split(':')[0]}"
+    def process_packet(self, packet):
+        self._packet_processing(packet)
+
+    def flush(self, expire_flows=False):
+        """
+        Runs prediction for every flow still waiting in the current batch.
+
+        With expire_flows (end of a capture) every stored flow is expired first,
+        so flows with enough packets get their final prediction.
+        """
+        if expire_flows:
+            self.expire_all_flows()
+        self.batch_predictor.flush()
+
+    def poll(self):
+        """Predicts the pending batch if it is due and swaps in a reloaded model if one is ready."""
+        self.batch_predictor.poll()
+        if self.model_watcher is not None:
+            update = self.model_watcher.take_update()
+            if update is not None:
+                self.swap_model(*update)
+
+    def swap_model(self, model_version, model_pipeline):
+        """
+        Replaces the model between batches.
+
+        Flows already waiting in the batch are predicted by the old model first;
+        flow storage and per-host counters are kept.
+        """
+        self.batch_predictor.flush()
+        self.model_pipeline = model_pipeline
+        self.batch_predictor.model_pipeline = model_pipeline
+        self.model_version = model_version
+
+    def get_model_statistic(self):
+        """Current model version and the number of verdicts each model version produced."""
+        return {
+            'model_version': self.model_version,
+            'verdicts': dict(self.verdict_number_by_model),
+        }
+
+    def get_created_flow_number(self):
+        return self.created_flow_number
 
     def _show_time_relate(self, flow):
         self.extract_time.append(flow.get_time_spent())
@@ -86,102 +175,142 @@ class DetectWorker(threading.Thread):
             plt.title("Distribution of model pipeline predict operation time")
             plt.show()
 
-    def is_vpn_flow(self, flow_key):
-        if self.possible_vpn_flow[flow_key] < self.total_detected_flow_threshold:
-            return False
-
-        while self.detection_time_vpn_flows[flow_key][0] - self.detection_time_vpn_flows[flow_key][-1] > self.detection_time_interval:
-            self.detection_time_vpn_flows[flow_key].pop(0)
-
-        if len(self.detection_time_vpn_flows[flow_key]) < self.flow_number_for_detect:
-            return False
-
-        if (not self.possible_non_vpn_flow[flow_key]) or (self.possible_vpn_flow[flow_key] / self.possible_non_vpn_flow[flow_key] < self.vpn_to_novpn_ratio):
+    def is_vpn_flow(self, host_key):
+        if self.host_verdicts is None:
             return False
+        verdicts = self.host_verdicts.get(host_key)
+        return verdicts is not None and self.detection_rule(verdicts)
+
+    def get_host_statistic(self):
+        if self.host_verdicts is None:
+            return None
+        return self.host_verdicts.get_statistic()
+
+    def _send_verdict(self, flow, flow_key, timestamp, is_vpn, packet_number, total_length):
+        verdicts = None
+        if self.host_verdicts is not None:
+            # Packet time keeps the detection window meaningful for offline captures
+            verdicts = self.host_verdicts.add_verdict(flow_key.host_key, timestamp, is_vpn)
+        self.verdict_number_by_model[self.model_version] += 1
+        if self.verdict_callback is None:
+            return
 
-        return True
-
-    def _clear_console(self):
-        sys.stdout.write("\033[2J\033[H")
-        sys.stdout.flush()
-
-    def _print_statistic(self, flow, packet):
-        if self.total_lines > 40:
-            self._clear_console()
-            self.total_lines = 0
-            self.flow_lines = {}
-
-        flow_group = self._extract_flow_key(packet)
-        if flow_group not in self.flow_lines:
-            self.flow_lines[flow_group] = self.total_lines
-            self.total_lines += 8
-
-        stats = (
-            f"Flow Group: {flow_group}\n"
-            f"  Elapsed time: {packet.time - flow.get_create_timestamp():.2f}s\n"
-            f"  Feature extraction time: {flow.get_time_spent():.2f}s\n"
-            f"  Avg model predict time: {self.model_pipeline.get_average_time_spent():.2f}s\n"
-            f"  VPN flows to node: {self.possible_vpn_flow[self._extract_flow_key(packet)]}\n"
-            f"  Non-VPN flows to node: {self.possible_non_vpn_flow[self._extract_flow_key(packet)]}\n"
-            f"  Total flow length: {flow.get_total_length()}\n"
+        verdict = Verdict(
+            timestamp,
+            flow_key,
+            'vpn' if is_vpn else 'normal',
+            packet_number,
+            total_length,
+            self.model_version,
+            flow_duration=timestamp - flow.get_create_timestamp(),
+            extract_time=flow.get_time_spent(),
+            predict_time=self.model_pipeline.get_average_time_spent()
         )
-
-        line_number = self.flow_lines[flow_group]
-        sys.stdout.write(f"\033[{line_number + 1}H\033[2K")
-        sys.stdout.write(stats)
-        sys.stdout.flush()
-
-
-        sys.stdout.write(f"\033[{self.total_lines + 1}H")
-        sys.stdout.flush()
-
-    def _update_possible_vpn_flow(self, flow, packet):
-        flow_key = self._extract_flow_key(packet)
-        self.detection_time_vpn_flows[flow_key].append(time.time())
-        if self.is_vpn_flow(flow_key):
-            self._print_statistic(flow, packet)
-
-    def _flow_detect(self, flow, packet):
+        if verdicts is not None:
+            verdict.host_vpn_number = verdicts.vpn_number
+            verdict.host_non_vpn_number = verdicts.non_vpn_number
+            verdict.host_detected = self.detection_rule(verdicts)
+        self.verdict_callback(verdict)
+
+    def _flow_deadline(self, flow):
+        deadline = float(flow.get_create_timestamp()) + self.flow_max_age
+        if self.flow_idle_timeout is not None:
+            deadline = min(deadline, float(flow.get_last_timestamp()) + self.flow_idle_timeout)
+        return deadline
+
+    def _expire_flow(self, flow, flow_key):
+        self.flow_storage.remove_flow(flow, flow_key)
+        self.expired_flow_number += 1
+
+        # Final prediction for flows with enough packets whose last state was not predicted yet
+        flow_packet_number = flow.get_packet_number()
+        if flow_packet_number < self.start_threshold_packet_number or flow_packet_number % self.predict_rate == 0:
+            return
+        context = (flow, flow_key, flow.get_last_timestamp(), flow_packet_number, flow.get_total_length())
+        if self.batch_predictor.submit(flow, context):
+            self.final_predicted_flow_number += 1
+
+    def _expire_flows(self, now):
+        for flow, flow_key in self.expiry_wheel.advance(now):
+            # Already removed after a prediction or evicted from the storage
+            if not self.flow_storage.contains_flow(flow, flow_key):
+                continue
+
+            # Packets since the flow was scheduled may have moved its idle deadline
+            deadline = self._flow_deadline(flow)
+            if now > deadline:
+                self._expire_flow(flow, flow_key)
+            else:
+                self.expiry_wheel.add(deadline, (flow, flow_key))
+
+    def expire_all_flows(self):
+        """Expires every stored flow regardless of its age, e.g. at the end of a capture."""
+        for flow, flow_key in self.expiry_wheel.pop_all():
+            if self.flow_storage.contains_flow(flow, flow_key):
+                self._expire_flow(flow, flow_key)
+
+    def get_expiry_statistic(self):
+        return {
+            'expired_flows': self.expired_flow_number,
+            'final_predictions': self.final_predicted_flow_number,
+            'scheduled_flows': len(self.expiry_wheel),
+        }
+
+    def _flow_detect(self, flow, packet, flow_key):
         flow_packet_number = flow.get_packet_number()
         
-        if flow_packet_number > self.end_packet_number_threshold or (packet.time - flow.get_create_timestamp()) > 3:
-            self.flow_storage.remove_flow_for_packet(flow, packet)
+        if flow_packet_number > self.end_packet_number_threshold:
+            self.flow_storage.remove_flow(flow, flow_key)
             return
 
         if (flow_packet_number < self.start_threshold_packet_number) or (flow_packet_number % self.predict_rate != 0):
             return
 
-        feature = flow.get_features()
-        if feature.isnull().any().any():
-            self.flow_storage.remove_flow_for_packet(flow, packet)
-            return
+        # Flow counters are captured now: the flow keeps growing while it waits for its batch
+        context = (flow, flow_key, packet.time, flow_packet_number, flow.get_total_length())
+        if not self.batch_predictor.submit(flow, context):
+            self.flow_storage.remove_flow(flow, flow_key)
+
+    @staticmethod
+    def _is_vpn_prediction(prediction):
+        return bool(np.all(prediction == 'vpn')) or bool(np.all(prediction == 1))
 
-        if self.model_pipeline.filter(feature).any():
-            self.flow_storage.remove_flow_for_packet(flow, packet)
+    def _apply_prediction(self, context, prediction):
+        flow, flow_key, timestamp, packet_number, total_length = context
+        if prediction is None:
+            # Rejected by the model filter; the flow may already be gone from the storage
+            self.flow_storage.discard_flow(flow, flow_key)
             return
 
-        # print((self.model_pipeline.predict(feature) == np.array([1])).all(), self.model_pipeline.predict(feature))
-        if self.model_pipeline.predict(feature) == 'vpn' or (self.model_pipeline.predict(feature) == np.array([1])).all():
-            self.possible_vpn_flow[self._extract_flow_key(packet)] += 1
-            self._update_possible_vpn_flow(flow, packet)
-        else:
-            self.possible_non_vpn_flow[self._extract_flow_key(packet)] += 1
+        self._send_verdict(flow, flow_key, timestamp, self._is_vpn_prediction(prediction), packet_number, total_length)
 
-    def _add_new_flow(self, packet):
-        flow = Flow()
+    def _add_new_flow(self, packet, flow_key):
+        # A flow is removed once it has more than end_threshold packets
+        flow = Flow(capacity=self.end_packet_number_threshold + 1)
         self.flow_storage.add_new_flow(flow, packet)
         flow.add_new_packet(packet)
+        self.created_flow_number += 1
+        self.expiry_wheel.add(self._flow_deadline(flow), (flow, flow_key))
 
     def _packet_processing(self, packet):
         if self.flow_storage.filter(packet):
             return
 
-        flows = self.flow_storage.get_flows_for_packet(packet)
+        now = float(packet.time)
+        self._expire_flows(now)
+
+        flow_key = self.flow_storage.extract_flow_key_for_packet(packet)
+        flows = self.flow_storage.get_flows(flow_key)
+        if flows:
+            # The wheel is one tick coarse: flows past their deadline within it expire here
+            for flow in [flow for flow in flows if now > self._flow_deadline(flow)]:
+                self._expire_flow(flow, flow_key)
+
         if not flows:
-            self._add_new_flow(packet)
+            self._add_new_flow(packet, flow_key)
             return
 
         for flow in flows:
             flow.add_new_packet(packet)
-            self._flow_detect(flow, packet)
+            self._flow_detect(flow, packet, flow_key)
 
@@ -0,0 +1,131 @@
+import struct
+
+from ..flow.flow_key import FlowKey, PacketRecord, IPPROTO_TCP, IPPROTO_UDP
+
+DLT_EN10MB = 1
+DLT_RAW = 101
+DLT_LINUX_SLL = 113
+DLT_IPV4 = 228
+DLT_IPV6 = 229
+RAW_IP_LINKTYPES = (12, 14, DLT_RAW, DLT_IPV4, DLT_IPV6)
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86dd
+VLAN_ETHERTYPES = (0x8100, 0x88a8, 0x9100)
+
+IPV6_FRAGMENT = 44
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+
+TLS_PORTS = frozenset((443,))
+
+_PORTS = struct.Struct('!HH')
+_IPV4_ADDRESSES = struct.Struct('!II')
+_IPV6_ADDRESSES = struct.Struct('!QQQQ')
+
+
+def _decode_l4(frame, offset, version, src_ip, dst_ip, proto, timestamp, wirelen, ports):
+    if proto != IPPROTO_TCP and proto != IPPROTO_UDP:
+        return None
+    if len(frame) < offset + 4:
+        return None
+
+    src_port, dst_port = _PORTS.unpack_from(frame, offset)
+    # Work only with TLS
+    if src_port not in ports and dst_port not in ports:
+        return None
+
+    flow_key = FlowKey.from_addresses(version, src_ip, src_port, dst_ip, dst_port, proto)
+    return PacketRecord(timestamp, wirelen, flow_key)
+
+
+def _decode_ipv4(frame, offset, timestamp, wirelen, ports):
+    if len(frame) < offset + 20:
+        return None
+
+    header_length = (frame[offset] & 0x0f) * 4
+    # A header shorter than its fixed part would put the ports inside the IP header
+    if header_length < 20:
+        return None
+    # Non-first fragments carry no L4 header
+    if (frame[offset + 6] & 0x1f) or frame[offset + 7]:
+        return None
+
+    proto = frame[offset + 9]
+    src_ip, dst_ip = _IPV4_ADDRESSES.unpack_from(frame, offset + 12)
+    return _decode_l4(frame, offset + header_length, 4, src_ip, dst_ip, proto, timestamp, wirelen, ports)
+
+
+def _decode_ipv6(frame, offset, timestamp, wirelen, ports):
+    if len(frame) < offset + 40:
+        return None
+
+    proto = frame[offset + 6]
+    src_high, src_low, dst_high, dst_low = _IPV6_ADDRESSES.unpack_from(frame, offset + 8)
+    src_ip = src_high << 64 | src_low
+    dst_ip = dst_high << 64 | dst_low
+    offset += 40
+
+    while proto in IPV6_EXTENSION_HEADERS or proto == IPV6_FRAGMENT:
+        if len(frame) < offset + 8:
+            return None
+        if proto == IPV6_FRAGMENT:
+            if (frame[offset + 2] << 8 | frame[offset + 3]) & 0xfff8:
+                return None
+            header_length = 8
+        else:
+            header_length = (frame[offset + 1] + 1) * 8
+        proto = frame[offset]
+        offset += header_length
+
+    return _decode_l4(frame, offset, 6, src_ip, dst_ip, proto, timestamp, wirelen, ports)
+
+
+def _decode_ethertype(frame, offset, ethertype, timestamp, wirelen, ports):
+    while ethertype in VLAN_ETHERTYPES:
+        if len(frame) < offset + 4:
+            return None
+        ethertype = frame[offset + 2] << 8 | frame[offset + 3]
+        offset += 4
+
+    if ethertype == ETH_P_IP:
+        return _decode_ipv4(frame, offset, timestamp, wirelen, ports)
+    if ethertype == ETH_P_IPV6:
+        return _decode_ipv6(frame, offset, timestamp, wirelen, ports)
+    return None
+
+
+def decode_packet(frame, timestamp, wirelen=None, linktype=DLT_EN10MB, ports=TLS_PORTS):
+    """
+    Parses link/IP/TCP/UDP headers of a raw frame.
+
+    Returns a PacketRecord or None for everything that is not TCP/UDP on one of `ports`,
+    so filtered packets never allocate anything.
+    """
+    if wirelen is None:
+        wirelen = len(frame)
+
+    try:
+        if linktype == DLT_EN10MB:
+            if len(frame) < 14:
+                return None
+            return _decode_ethertype(frame, 14, frame[12] << 8 | frame[13], timestamp, wirelen, ports)
+
+        if linktype in RAW_IP_LINKTYPES:
+            if not frame:
+                return None
+            version = frame[0] >> 4
+            if version == 4:
+                return _decode_ipv4(frame, 0, timestamp, wirelen, ports)
+            if version == 6:
+                return _decode_ipv6(frame, 0, timestamp, wirelen, ports)
+            return None
+
+        if linktype == DLT_LINUX_SLL:
+            if len(frame) < 16:
+                return None
+            return _decode_ethertype(frame, 16, frame[14] << 8 | frame[15], timestamp, wirelen, ports)
+    except (IndexError, struct.error):
+        return None
+
+    return None
+
@@ -0,0 +1,167 @@
+import mmap
+import select
+import socket
+import struct
+
+from .bpf_filter import interface_linktype
+
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+PACKET_MR_PROMISC = 1
+TPACKET_V3 = 2
+ETH_P_ALL = 0x0003
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# struct tpacket_req3
+_RING_REQUEST = struct.Struct('IIIIIII')
+# struct packet_mreq
+_MEMBERSHIP_REQUEST = struct.Struct('iHH8s')
+# struct tpacket_stats_v3: tp_packets, tp_drops, tp_freeze_q_cnt
+_RING_STATISTIC = struct.Struct('III')
+# struct tpacket_block_desc up to hdr.bh1.offset_to_first_pkt
+_BLOCK_STATUS_OFFSET = 8
+_BLOCK_HEADER = struct.Struct('III')
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac
+_PACKET_HEADER = struct.Struct('IIIIIIH')
+_BLOCK_STATUS = struct.Struct('I')
+
+
+class PacketRing:
+    def __init__(
+            self,
+            iface,
+            bpf_filter=None,
+            block_size=1 << 20,
+            block_number=64,
+            frame_size=1 << 11,
+            block_timeout=100,
+            promisc=True
+        ):
+        """
+        TPACKET_V3 receive ring of an AF_PACKET socket.
+
+        The kernel writes packets straight into blocks of a memory-mapped ring and hands a
+        block over when it is full or `block_timeout` ms passed, so a busy interface costs
+        one poll() per block instead of one recv() and one copy per packet.
+
+        Parameters:
+        - iface (str): Interface name.
+        - bpf_filter (callable): linktype -> BpfProgram or None, attached before any packet is received.
+        - block_size (int): Bytes per block, a multiple of the page size.
+        - block_number (int): Blocks in the ring.
+        - frame_size (int): Nominal frame size; with TPACKET_V3 frames are packed with their real size.
+        - block_timeout (int): Milliseconds after which a partly filled block is handed over.
+        - promisc (bool): Put the interface in promiscuous mode.
+        """
+        self.iface = iface
+        self.block_size = block_size
+        self.block_number = block_number
+        self.packet_number = 0
+        self.dropped_number = 0
+        self._block_index = 0
+        self._stopped = False
+        self._closed = False
+
+        # Bound with protocol 0 nothing is received until the filter is in place
+        self._sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self._sock.bind((iface, 0))
+            self.linktype = interface_linktype(self._sock)
+            program = bpf_filter(self.linktype) if bpf_filter is not None and self.linktype is not None else None
+            if program is not None:
+                program.attach(self._sock)
+            if promisc:
+                membership = _MEMBERSHIP_REQUEST.pack(socket.if_nametoindex(iface), PACKET_MR_PROMISC, 0, b'')
+                self._sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, membership)
+
+            self._sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            ring_request = _RING_REQUEST.pack(
+                block_size,
+                block_number,
+                frame_size,
+                block_size // frame_size * block_number,
+                block_timeout,
+                0,
+                0
+            )
+            self._sock.setsockopt(SOL_PACKET, PACKET_RX_RING, ring_request)
+            self._ring = mmap.mmap(self._sock.fileno(), block_size * block_number, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            self._sock.bind((iface, ETH_P_ALL))
+        except BaseException:
+            self._sock.close()
+            raise
+
+        self._poller = select.poll()
+        self._poller.register(self._sock.fileno(), select.POLLIN | select.POLLERR)
+
+    def _block_status(self, block_offset):
+        return _BLOCK_STATUS.unpack_from(self._ring, block_offset + _BLOCK_STATUS_OFFSET)[0]
+
+    def _read_block(self, block_offset):
+        packets = []
+        view = memoryview(self._ring)
+        _, packet_number, packet_offset = _BLOCK_HEADER.unpack_from(self._ring, block_offset + _BLOCK_STATUS_OFFSET)
+        packet_offset += block_offset
+        for _ in range(packet_number):
+            next_offset, sec, nsec, snaplen, wirelen, _, mac_offset = _PACKET_HEADER.unpack_from(self._ring, packet_offset)
+            frame_offset = packet_offset + mac_offset
+            packets.append((view[frame_offset:frame_offset + snaplen], sec + nsec * 1e-9, wirelen))
+            packet_offset += next_offset
+        return packets
+
+    def blocks(self, poll_timeout=0.1):
+        """
+        Yields the packets of every block the kernel hands over: lists of (frame, timestamp, wirelen).
+
+        Frames are memoryviews into the ring and stay valid only until the next block is
+        requested; the block goes back to the kernel then. Returns within `poll_timeout`
+        seconds after stop().
+        """
+        while not self._stopped:
+            block_offset = self._block_index * self.block_size
+            if not self._block_status(block_offset) & TP_STATUS_USER:
+                self._poller.poll(poll_timeout * 1000)
+                continue
+
+            packets = self._read_block(block_offset)
+            self.packet_number += len(packets)
+            try:
+                yield packets
+            finally:
+                packets.clear()
+                if not self._closed:
+                    _BLOCK_STATUS.pack_into(self._ring, block_offset + _BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+                    self._block_index = (self._block_index + 1) % self.block_number
+
+    def get_statistic(self):
+        """Packets read from the ring and packets the kernel dropped because the ring was full."""
+        if not self._closed:
+            _, dropped, _ = _RING_STATISTIC.unpack(self._sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _RING_STATISTIC.size))
+            # The kernel resets its counters on every read
+            self.dropped_number += dropped
+        return {
+            'packets': self.packet_number,
+            'dropped': self.dropped_number,
+        }
+
+    def stop(self):
+        """Makes blocks() return; safe to call from another thread."""
+        self._stopped = True
+
+    def close(self):
+        if self._closed:
+            return
+        self.get_statistic()
+        self._stopped = True
+        self._closed = True
+        try:
+            self._ring.close()
+        except BufferError:
+            # A frame of the last block is still referenced; the mapping goes with it
+            pass
+        self._sock.close()
@@ -0,0 +1,53 @@
+import time
+from scapy.utils import RawPcapReader, RawPcapNgReader
+
+from .packet_decoder import decode_packet
+
+
+class PcapSniffer:
+    """Feeds recorded captures to a DetectWorker as fast as it can process them."""
+
+    def __init__(self, consumer, pcap_paths):
+        self._consumer = consumer
+        self._pcap_paths = pcap_paths
+        self.packet_number = 0
+        self.time_spent = 0
+
+    def _frame_timestamp(self, reader, metadata):
+        if isinstance(reader, RawPcapNgReader):
+            return ((metadata.tshigh << 32) | metadata.tslow) / metadata.tsresol
+        return metadata.sec + metadata.usec / (1e9 if reader.nano else 1e6)
+
+    def read_records(self, pcap_path):
+        reader = RawPcapReader(str(pcap_path))
+        try:
+            for frame, metadata in reader:
+                self.packet_number += 1
+                linktype = metadata.linktype if isinstance(reader, RawPcapNgReader) else reader.linktype
+                record = decode_packet(
+                    frame,
+                    self._frame_timestamp(reader, metadata),
+                    wirelen=metadata.wirelen,
+                    linktype=linktype
+                )
+                if record is not None:
+                    yield record
+        finally:
+            reader.close()
+
+    def run(self):
+        start_time = time.perf_counter()
+        for pcap_path in self._pcap_paths:
+            for record in self.read_records(pcap_path):
+                self._consumer.process_packet(record)
+        # End of the capture: no later packet will expire the remaining flows
+        self._consumer.flush(expire_flows=True)
+        self.time_spent += time.perf_counter() - start_time
+
+    def get_statistic(self):
+        time_spent = max(self.time_spent, 1e-9)
+        flow_number = self._consumer.get_created_flow_number()
+        return (
+            f"Processed {self.packet_number} packets and {flow_number} flows in {self.time_spent:.2f}s: "
+            f"{self.packet_number / time_spent:.0f} packets/s, {flow_number / time_spent:.0f} flows/s"
+        )
@@ -0,0 +1,283 @@
+import time
+import queue
+import threading
+import multiprocessing
+from collections import defaultdict
+
+from ..flow.host_verdict_store import HostVerdictStore, HostDetectionRule
+from ..models.model_pipeline import ModelPipeline
+
+SHARD_FLUSH = 'flush'
+SHARD_EXPIRE = 'expire'
+SHARD_STOP = 'stop'
+# How long the coordinator blocks on a shard queue before it checks that the shards are alive
+SHARD_CHECK_INTERVAL = 1.0
+SHARD_STOP_TIMEOUT = 5.0
+
+
+def _shard_main(shard_index, model_pipeline_config, worker_kwargs, input_queue, result_queue, max_latency, model_reload_interval):
+    # Imported here so every shard process owns its own pipeline copy
+    from ..models.model_watcher import ModelWatcher, model_version
+    from ..feature.feature_storage import FeatureStorage
+    from .detect_worker import DetectWorker
+
+    model_watcher = None
+    if model_reload_interval:
+        model_watcher = ModelWatcher(model_pipeline_config, FeatureStorage.get_schema(), poll_interval=model_reload_interval)
+        model_watcher.start()
+
+    verdicts = []
+    worker = DetectWorker(
+        ModelPipeline.from_config(model_pipeline_config),
+        verdict_callback=verdicts.append,
+        model_version=model_version(model_pipeline_config),
+        model_watcher=model_watcher,
+        **worker_kwargs
+    )
+
+    def send_verdicts():
+        if verdicts:
+            result_queue.put(('verdicts', shard_index, list(verdicts), worker.get_created_flow_number()))
+            verdicts.clear()
+
+    while True:
+        try:
+            message = input_queue.get(timeout=max_latency)
+        except queue.Empty:
+            worker.flush()
+            worker.poll()
+            send_verdicts()
+            continue
+
+        if message == SHARD_STOP:
+            break
+
+        if message == SHARD_EXPIRE:
+            worker.expire_all_flows()
+            continue
+
+        if message == SHARD_FLUSH:
+            worker.flush()
+            send_verdicts()
+            result_queue.put(('flushed', shard_index, [], worker.get_created_flow_number()))
+            continue
+
+        for record in message:
+            worker.process_packet(record)
+        worker.poll()
+        send_verdicts()
+
+
+class ShardedDetector(threading.Thread):
+    def __init__(
+            self,
+            model_pipeline_config,
+            worker_number,
+            chunk_size=256,
+            max_latency=0.05,
+            shard_queue_size=64,
+            input_queue=None,
+            verdict_callback=None,
+            model_reload_interval=None,
+            host_storage_size=10000,
+            host_ttl=600,
+            host_decay_half_life=None,
+            **worker_kwargs
+    ):
+        """
+        Spreads decoded packets over `worker_number` DetectWorker processes.
+
+        Packets are routed by the hash of their direction-normalized FlowKey, so both
+        directions of a flow always land in the same process. Every process loads its
+        own ModelPipeline from `model_pipeline_config` and keeps its own FlowStorage;
+        per-host VPN counters (a HostVerdictStore) are merged here from the verdicts
+        the processes send back.
+        With `model_reload_interval` every process watches the config and swaps in changed
+        models on its own (see ModelWatcher).
+
+        The class exposes the same consumer interface as DetectWorker
+        (set_input/start/process_packet/flush/get_created_flow_number).
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.input_queue = input_queue
+        self.worker_number = worker_number
+        self.chunk_size = chunk_size
+        self.max_latency = max_latency
+        self.verdict_callback = verdict_callback
+
+        self.detection_rule = HostDetectionRule(
+            total_detected_flow_threshold=worker_kwargs.get('total_detected_flow_threshold', 3),
+            flow_number_for_detect=worker_kwargs.get('flow_number_for_detect', 1),
+            vpn_to_novpn_ratio=worker_kwargs.get('vpn_to_novpn_ratio', 0.0)
+        )
+        self.host_verdicts = HostVerdictStore(
+            max_hosts=host_storage_size,
+            ttl=host_ttl,
+            window=worker_kwargs.get('detection_time_interval', 10),
+            window_capacity=self.detection_rule.get_window_capacity(),
+            decay_half_life=host_decay_half_life
+        )
+        self.verdict_number_by_model = defaultdict(int)
+        self._created_flow_numbers = [0] * worker_number
+
+        # A broken config fails here instead of killing every shard
+        ModelPipeline.from_config(model_pipeline_config)
+
+        # Host counters are kept only here, over the verdicts of all shards
+        worker_kwargs = dict(worker_kwargs, count_host_verdicts=False)
+
+        self._chunks = [[] for _ in range(worker_number)]
+        self._chunk_deadline = None
+        self._result_queue = multiprocessing.Queue()
+        self._shard_queues = []
+        self._processes = []
+        for shard_index in range(worker_number):
+            shard_queue = multiprocessing.Queue(maxsize=shard_queue_size)
+            process = multiprocessing.Process(
+                target=_shard_main,
+                args=(
+                    shard_index,
+                    model_pipeline_config,
+                    worker_kwargs,
+                    shard_queue,
+                    self._result_queue,
+                    max_latency,
+                    model_reload_interval
+                ),
+                daemon=True
+            )
+            process.start()
+            self._shard_queues.append(shard_queue)
+            self._processes.append(process)
+
+    def set_input(self, input_queue):
+        self.input_queue = input_queue
+
+    def run(self):
+        while True:
+            records = self.input_queue.pop_batch(self.chunk_size, timeout=self.max_latency)
+            for record in records:
+                self.process_packet(record)
+            if not records:
+                self._send_chunks()
+                self._check_shards()
+            self._poll()
+
+    def _check_shards(self):
+        """Raises RuntimeError if a shard process has exited; the other shards are terminated."""
+        for shard_index, process in enumerate(self._processes):
+            if not process.is_alive():
+                self._terminate()
+                raise RuntimeError(f"Detector shard {shard_index} exited with code {process.exitcode}")
+
+    def _terminate(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        # Nobody reads what is left in the queues, do not wait for it on exit
+        for shard_queue in self._shard_queues:
+            shard_queue.cancel_join_thread()
+
+    def _put(self, shard_index, message):
+        while True:
+            try:
+                self._shard_queues[shard_index].put(message, timeout=SHARD_CHECK_INTERVAL)
+                return
+            except queue.Full:
+                self._check_shards()
+
+    def process_packet(self, record):
+        shard_index = hash(record.flow_key) % self.worker_number
+        chunk = self._chunks[shard_index]
+        chunk.append(record)
+        if self._chunk_deadline is None:
+            self._chunk_deadline = time.monotonic() + self.max_latency
+        if len(chunk) >= self.chunk_size:
+            self._send_chunk(shard_index)
+
+    def _send_chunk(self, shard_index):
+        chunk = self._chunks[shard_index]
+        if chunk:
+            self._put(shard_index, chunk)
+            self._chunks[shard_index] = []
+
+    def _send_chunks(self):
+        for shard_index in range(self.worker_number):
+            self._send_chunk(shard_index)
+        self._chunk_deadline = None
+
+    def _poll(self):
+        if self._chunk_deadline is not None and time.monotonic() >= self._chunk_deadline:
+            self._send_chunks()
+        self._drain_results()
+
+    def _merge_result(self, message):
+        kind, shard_index, verdicts, created_flow_number = message
+        self._created_flow_numbers[shard_index] = created_flow_number
+        for verdict in verdicts:
+            self.verdict_number_by_model[verdict.model_version] += 1
+            # Flows of a host pair are spread over the shards: host state comes from the merged counters
+            host_verdicts = self.host_verdicts.add_verdict(verdict.flow_key.host_key, verdict.timestamp, verdict.label == 'vpn')
+            verdict.host_vpn_number = host_verdicts.vpn_number
+            verdict.host_non_vpn_number = host_verdicts.non_vpn_number
+            verdict.host_detected = self.detection_rule(host_verdicts)
+
+            if self.verdict_callback is not None:
+                self.verdict_callback(verdict)
+        return kind
+
+    def _drain_results(self):
+        while True:
+            try:
+                message = self._result_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._merge_result(message)
+
+    def flush(self, expire_flows=False):
+        """
+        Sends every buffered packet, flushes each shard and waits until all verdicts are merged.
+
+        With expire_flows every shard expires all its flows first (see DetectWorker.flush).
+        """
+        self._send_chunks()
+        for shard_index in range(self.worker_number):
+            if expire_flows:
+                self._put(shard_index, SHARD_EXPIRE)
+            self._put(shard_index, SHARD_FLUSH)
+
+        flushed_shards = 0
+        while flushed_shards < self.worker_number:
+            try:
+                message = self._result_queue.get(timeout=SHARD_CHECK_INTERVAL)
+            except queue.Empty:
+                self._check_shards()
+                continue
+            if self._merge_result(message) == 'flushed':
+                flushed_shards += 1
+
+    def stop(self):
+        """Stops the shard processes; shards that do not stop in time are terminated."""
+        for shard_queue, process in zip(self._shard_queues, self._processes):
+            if process.is_alive():
+                try:
+                    shard_queue.put(SHARD_STOP, timeout=SHARD_CHECK_INTERVAL)
+                except queue.Full:
+                    pass
+        for process in self._processes:
+            process.join(SHARD_STOP_TIMEOUT)
+        self._terminate()
+
+    def get_created_flow_number(self):
+        return sum(self._created_flow_numbers)
+
+    def get_model_statistic(self):
+        """Number of verdicts each model version produced, over all processes."""
+        return {'verdicts': dict(self.verdict_number_by_model)}
+
+    def get_host_statistic(self):
+        """Hosts with merged verdict counters and the number forgotten by TTL or evicted."""
+        return self.host_verdicts.get_statistic()
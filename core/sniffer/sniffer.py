@@ -1,17 +1,162 @@
+import time
+import struct
 from scapy.all import *
 from ..utils.concurrent_queue import ConcurrentQueue
+from .packet_decoder import decode_packet, DLT_EN10MB
+from .bpf_filter import BpfProgram, BPF_RET, BPF_K, MAX_SNAPLEN, ARPHRD_LINKTYPES, compile_tls_filter, interface_linktype
+from .packet_ring import PacketRing, SOL_PACKET
+
+PACKET_AUXDATA = 8
+SO_TIMESTAMPNS = 35
+# struct tpacket_auxdata: tp_status, tp_len, tp_snaplen, tp_mac, tp_net, tp_vlan_tci, tp_vlan_tpid
+_AUXDATA = struct.Struct('IIIHHHH')
+_TIMESPEC = struct.Struct('qq')
+
+
+def receive_truncated_frame(sock, snaplen):
+    """
+    Receives at most `snaplen` bytes of a frame from an AF_PACKET socket with
+    PACKET_AUXDATA and SO_TIMESTAMPNS enabled.
+
+    Returns:
+    - (bytes, float, int, int): Frame, timestamp, wire length and link type (None if unknown).
+    """
+    frame, ancillary, _, address = sock.recvmsg(snaplen, 256)
+    timestamp = None
+    wirelen = len(frame)
+    for level, kind, data in ancillary:
+        if level == SOL_PACKET and kind == PACKET_AUXDATA:
+            # Length before the snaplen of the socket filter cut the packet
+            wirelen = _AUXDATA.unpack_from(data)[1]
+        elif level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+            seconds, nanoseconds = _TIMESPEC.unpack_from(data)
+            timestamp = seconds + nanoseconds * 1e-9
+    return frame, timestamp, wirelen, ARPHRD_LINKTYPES.get(address[3])
+
 
 class Sniffer:
-    def __init__(self, consumer, iface):
-        self._input_queue = ConcurrentQueue()
+    # Enough for Ethernet, two VLAN tags, IPv6 with a few extension headers and the L4 ports
+    HEADER_SNAPLEN = 128
+
+    def __init__(
+            self,
+            consumer,
+            iface,
+            raw_decode=True,
+            queue_size=100000,
+            drop_policy=ConcurrentQueue.DROP_NEWEST,
+            kernel_filter=True,
+            ring=False,
+            ring_block_size=1 << 20,
+            ring_block_number=64,
+            snaplen=None
+        ):
+        # Bounded: when the worker falls behind, packets are dropped (and counted) by drop_policy
+        self._input_queue = ConcurrentQueue(maxsize=queue_size, drop_policy=drop_policy)
         self._consumer = consumer
         self._iface = iface
+        self._raw_decode = raw_decode
+        # Only TCP/UDP port 443 leaves the kernel
+        self._kernel_filter = kernel_filter
+        self._ring = ring
+        self._ring_block_size = ring_block_size
+        self._ring_block_number = ring_block_number
+        self._packet_ring = None
+        # Bytes of every packet copied out of the kernel, None for whole packets.
+        # Features only need the wire length, which is kept separately
+        self._snaplen = snaplen
         self._consumer.set_input(self._input_queue)
 
+    def _compile_filter(self, linktype):
+        snaplen = self._snaplen or MAX_SNAPLEN
+        if self._kernel_filter:
+            return compile_tls_filter(linktype, snaplen=snaplen)
+        if self._snaplen:
+            # Only cut packets, keep all of them
+            return BpfProgram([(BPF_RET | BPF_K, 0, 0, snaplen)])
+        return None
+
+    def _attach_kernel_filter(self, sock):
+        linktype = interface_linktype(sock)
+        program = self._compile_filter(linktype) if linktype is not None else None
+        if program is not None:
+            program.attach(sock)
+
+    def _sniff_raw_packets(self):
+        # Headers are parsed straight from the frame: no scapy dissection,
+        # and frames that are not TLS never reach the queue
+        sock = conf.L2listen(iface=self._iface)
+        try:
+            self._attach_kernel_filter(sock.ins)
+            if self._snaplen:
+                self._receive_headers(sock.ins)
+                return
+
+            while True:
+                layer, frame, timestamp = sock.recv_raw()
+                if frame is None:
+                    continue
+
+                linktype = conf.l2types.layer2num.get(layer, DLT_EN10MB)
+                record = decode_packet(frame, timestamp or time.time(), linktype=linktype)
+                if record is not None:
+                    self._input_queue.append(record)
+        finally:
+            sock.close()
+
+    def _receive_headers(self, sock):
+        # scapy's recv_raw() cannot tell the wire length of a cut packet, the auxiliary data can
+        sock.setsockopt(SOL_PACKET, PACKET_AUXDATA, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        while True:
+            frame, timestamp, wirelen, linktype = receive_truncated_frame(sock, self._snaplen)
+            record = decode_packet(frame, timestamp or time.time(), wirelen=wirelen, linktype=linktype or DLT_EN10MB)
+            if record is not None:
+                self._input_queue.append(record)
+
+    def _sniff_ring(self):
+        # The kernel fills ring blocks; every block is decoded and queued at once
+        self._packet_ring = PacketRing(
+            network_name(self._iface or conf.iface),
+            bpf_filter=self._compile_filter,
+            block_size=self._ring_block_size,
+            block_number=self._ring_block_number
+        )
+        linktype = self._packet_ring.linktype or DLT_EN10MB
+        try:
+            for packets in self._packet_ring.blocks():
+                records = []
+                for frame, timestamp, wirelen in packets:
+                    record = decode_packet(frame, timestamp, wirelen=wirelen, linktype=linktype)
+                    if record is not None:
+                        records.append(record)
+                self._input_queue.extend(records)
+        finally:
+            self._packet_ring.close()
+
+    def _sniff_dissected_packets(self):
+        sock = conf.L2listen(iface=self._iface)
+        self._attach_kernel_filter(sock.ins)
+        sniff(opened_socket=sock, prn=self._input_queue.append, store=False)
+
     def sniff_packets(self):
-        sniff(iface=self._iface, prn=self._input_queue.append)
+        if not self._raw_decode:
+            self._sniff_dissected_packets()
+        elif self._ring:
+            self._sniff_ring()
+        else:
+            self._sniff_raw_packets()
+
+    def get_queue_statistic(self):
+        return self._input_queue.get_statistic()
+
+    def get_ring_statistic(self):
+        """Packets read from the capture ring and dropped by the kernel, None without a ring."""
+        if self._packet_ring is None:
+            return None
+        return self._packet_ring.get_statistic()
 
     def run(self):
         self._consumer.start()
         self.sniff_packets()
-        self._consumer.join()
\ No newline at end of file
+        self._consumer.join()
@@ -0,0 +1,359 @@
+import os
+import sys
+import csv
+import json
+import time
+import socket
+import threading
+import urllib.request
+
+from ..utils.concurrent_queue import ConcurrentQueue
+
+
+class Verdict:
+    __slots__ = (
+        'timestamp',
+        'flow_key',
+        'label',
+        'packet_number',
+        'total_length',
+        'model_version',
+        'flow_duration',
+        'extract_time',
+        'predict_time',
+        'host_vpn_number',
+        'host_non_vpn_number',
+        'host_detected'
+    )
+
+    def __init__(
+            self,
+            timestamp,
+            flow_key,
+            label,
+            packet_number,
+            total_length,
+            model_version=None,
+            flow_duration=None,
+            extract_time=None,
+            predict_time=None,
+            host_vpn_number=None,
+            host_non_vpn_number=None,
+            host_detected=None
+        ):
+        self.timestamp = timestamp
+        self.flow_key = flow_key
+        self.label = label
+        self.packet_number = packet_number
+        self.total_length = total_length
+        self.model_version = model_version
+        # Flow and host state when the verdict was made, for the consumers of the stream
+        self.flow_duration = flow_duration
+        self.extract_time = extract_time
+        self.predict_time = predict_time
+        self.host_vpn_number = host_vpn_number
+        self.host_non_vpn_number = host_non_vpn_number
+        self.host_detected = host_detected
+
+    def to_dict(self):
+        return {
+            'timestamp': float(self.timestamp),
+            'flow': str(self.flow_key),
+            'host_pair': str(self.flow_key.host_key),
+            'label': self.label,
+            'packet_number': self.packet_number,
+            'total_length': self.total_length,
+            'model_version': self.model_version,
+            'flow_duration': None if self.flow_duration is None else float(self.flow_duration),
+            'host_vpn_number': self.host_vpn_number,
+            'host_non_vpn_number': self.host_non_vpn_number,
+            'host_detected': self.host_detected,
+        }
+
+
+def _json_lines(verdicts):
+    return ''.join(json.dumps(verdict.to_dict()) + '\n' for verdict in verdicts).encode()
+
+
+class CsvVerdictWriter:
+    FIELDS = ['timestamp', 'flow', 'host_pair', 'label', 'packet_number', 'total_length', 'model_version']
+
+    def __init__(self, path):
+        self.name = f"csv:{path}"
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.FIELDS, extrasaction='ignore')
+        self._writer.writeheader()
+        self.verdict_number = 0
+
+    def __call__(self, verdict):
+        self._writer.writerow(verdict.to_dict())
+        self.verdict_number += 1
+
+    def write_batch(self, verdicts):
+        self._writer.writerows(verdict.to_dict() for verdict in verdicts)
+        self.verdict_number += len(verdicts)
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesVerdictWriter:
+    def __init__(self, path):
+        """Appends one JSON object per verdict to a file; every batch is flushed to the OS."""
+        self.name = f"jsonl:{path}"
+        self.path = path
+        self._file = open(path, 'ab')
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file.flush()
+
+    def write_batch(self, verdicts):
+        self._write(_json_lines(verdicts))
+
+    def close(self):
+        self._file.close()
+
+
+class RotatingVerdictWriter(JsonLinesVerdictWriter):
+    def __init__(self, path, max_bytes=64 << 20, backup_count=5):
+        """
+        JSON Lines file that is rotated before a batch would grow it past `max_bytes`: `path`
+        is renamed to `path.1`, `path.1` to `path.2` and so on; files beyond `backup_count`
+        are removed.
+        """
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+            self._file = open(self.path, 'ab')
+        else:
+            self._file = open(self.path, 'wb')
+
+    def write_batch(self, verdicts):
+        data = _json_lines(verdicts)
+        size = self._file.tell()
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        self._write(data)
+
+
+class UnixSocketVerdictSink:
+    def __init__(self, path, timeout=1.0):
+        """
+        Streams JSON Lines to a listening Unix stream socket.
+
+        The socket is (re)connected on the first batch after a failure, so a restarted
+        reader picks up the stream again; batches sent while it is gone are lost.
+        """
+        self.name = f"unix:{path}"
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+
+    def write_batch(self, verdicts):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+
+        try:
+            self._sock.sendall(_json_lines(verdicts))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class HttpVerdictSink:
+    def __init__(self, url, timeout=1.0):
+        """POSTs every batch as one application/x-ndjson request."""
+        self.name = f"http:{url}"
+        self.url = url
+        self.timeout = timeout
+
+    def write_batch(self, verdicts):
+        request = urllib.request.Request(
+            self.url,
+            data=_json_lines(verdicts),
+            headers={'Content-Type': 'application/x-ndjson'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def close(self):
+        pass
+
+
+class DashboardVerdictSink:
+    def __init__(self, output=None):
+        """Terminal dashboard: one block per host pair detected as VPN, redrawn in place."""
+        self.name = "dashboard"
+        self._output = output or sys.stdout
+        self.flow_lines = {}
+        self.total_lines = 60
+
+    def _clear_console(self):
+        self._output.write("\033[2J\033[H")
+
+    def _print_verdict(self, verdict):
+        if self.total_lines > 40:
+            self._clear_console()
+            self.total_lines = 0
+            self.flow_lines = {}
+
+        flow_group = verdict.flow_key.host_key
+        if flow_group not in self.flow_lines:
+            self.flow_lines[flow_group] = self.total_lines
+            self.total_lines += 8
+
+        stats = (
+            f"Flow Group: {flow_group}\n"
+            f"  Elapsed time: {verdict.flow_duration:.2f}s\n"
+            f"  Feature extraction time: {verdict.extract_time:.2f}s\n"
+            f"  Avg model predict time: {verdict.predict_time:.2f}s\n"
+            f"  VPN flows to node: {verdict.host_vpn_number:g}\n"
+            f"  Non-VPN flows to node: {verdict.host_non_vpn_number:g}\n"
+            f"  Total flow length: {verdict.total_length}\n"
+        )
+
+        line_number = self.flow_lines[flow_group]
+        self._output.write(f"\033[{line_number + 1}H\033[2K")
+        self._output.write(stats)
+        self._output.write(f"\033[{self.total_lines + 1}H")
+
+    def write_batch(self, verdicts):
+        for verdict in verdicts:
+            if verdict.label == 'vpn' and verdict.host_detected:
+                self._print_verdict(verdict)
+        self._output.flush()
+
+    def close(self):
+        pass
+
+
+class _SinkWriter(threading.Thread):
+    def __init__(self, sink, buffer_size, drop_policy, batch_size, flush_interval):
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.sink = sink
+        self.queue = ConcurrentQueue(maxsize=buffer_size, drop_policy=drop_policy)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._stop_event = threading.Event()
+
+        self.written_number = 0
+        self.failed_number = 0
+        self.batch_number = 0
+        self.last_error = None
+
+    def _write(self, verdicts):
+        self.batch_number += 1
+        try:
+            self.sink.write_batch(verdicts)
+        except Exception as error:
+            # A failing consumer loses its batch, the others keep going
+            self.failed_number += len(verdicts)
+            self.last_error = repr(error)
+        else:
+            self.written_number += len(verdicts)
+
+    def run(self):
+        batch = []
+        deadline = None
+        while True:
+            stopping = self._stop_event.is_set()
+            timeout = self.flush_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            batch.extend(self.queue.pop_batch(self.batch_size - len(batch), timeout=0 if stopping else timeout))
+            if batch and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+
+            # A batch is written when full, `flush_interval` after its first verdict or on stop
+            if batch and (len(batch) >= self.batch_size or stopping or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+            elif stopping and self.queue.empty():
+                return
+
+    def stop(self):
+        self._stop_event.set()
+
+    def get_statistic(self):
+        statistic = self.queue.get_statistic()
+        statistic.update({
+            'written': self.written_number,
+            'failed': self.failed_number,
+            'batches': self.batch_number,
+            'last_error': self.last_error,
+        })
+        return statistic
+
+
+class VerdictStream:
+    def __init__(
+            self,
+            sinks,
+            buffer_size=10000,
+            drop_policy=ConcurrentQueue.DROP_NEWEST,
+            batch_size=256,
+            flush_interval=0.5
+        ):
+        """
+        Fans verdicts out to output sinks without blocking the caller.
+
+        Every sink gets its own bounded queue and writer thread, so a slow or unreachable
+        consumer only fills (and then drops from) its own queue while packet processing
+        and the other sinks go on. Writer threads hand verdicts to their sink in batches of
+        up to `batch_size`, at the latest `flush_interval` seconds after the first one.
+
+        A sink is any object with write_batch(verdicts), close() and a `name`.
+
+        Parameters:
+        - sinks (list): Output sinks.
+        - buffer_size (int): Verdicts queued per sink before drop_policy applies.
+        - drop_policy (str): ConcurrentQueue drop policy; BLOCK never loses verdicts but waits for the slowest sink.
+        - batch_size (int): Maximum verdicts per write_batch call.
+        - flush_interval (float): Maximum seconds a verdict waits for its batch.
+        """
+        self._writers = [
+            _SinkWriter(sink, buffer_size, drop_policy, batch_size, flush_interval)
+            for sink in sinks
+        ]
+        for writer in self._writers:
+            writer.start()
+
+    def __call__(self, verdict):
+        for writer in self._writers:
+            writer.queue.append(verdict)
+
+    def close(self):
+        """Writes every queued verdict, stops the writer threads and closes the sinks."""
+        for writer in self._writers:
+            writer.stop()
+        for writer in self._writers:
+            writer.join()
+            writer.sink.close()
+
+    def get_statistic(self):
+        """Queue and write counters of every sink, keyed by sink name."""
+        return {writer.sink.name: writer.get_statistic() for writer in self._writers}
@@ -1,23 +1,107 @@
-import queue
+import threading
+from collections import deque
 
 class ConcurrentQueue:
-    def __init__(self):
-        self.collection = queue.Queue()
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    BLOCK = 'block'
+    DROP_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+    def __init__(self, maxsize=100000, drop_policy=DROP_NEWEST):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy {drop_policy}, expected one of {self.DROP_POLICIES}")
+
+        self.collection = deque()
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+
+        lock = threading.Lock()
+        self._not_empty = threading.Condition(lock)
+        self._not_full = threading.Condition(lock)
+
+        self.enqueued_number = 0
+        self.dropped_number = 0
+        self.high_watermark = 0
+
+    def _is_full(self):
+        return self.maxsize is not None and len(self.collection) >= self.maxsize
+
+    def _append_locked(self, x):
+        if self._is_full():
+            if self.drop_policy == self.DROP_NEWEST:
+                self.dropped_number += 1
+                return False
+            if self.drop_policy == self.DROP_OLDEST:
+                self.collection.popleft()
+                self.dropped_number += 1
+            else:
+                while self._is_full():
+                    # Let the consumer drain what was already added
+                    self._not_empty.notify()
+                    self._not_full.wait()
+
+        self.collection.append(x)
+        self.enqueued_number += 1
+        if len(self.collection) > self.high_watermark:
+            self.high_watermark = len(self.collection)
+        return True
 
     def append(self, x):
-        self.collection.put(x)
+        with self._not_empty:
+            appended = self._append_locked(x)
+            if appended:
+                self._not_empty.notify()
+            return appended
+
+    def extend(self, items):
+        """Appends a block of items in one lock round trip; returns how many were not dropped."""
+        with self._not_empty:
+            appended_number = 0
+            for x in items:
+                appended_number += self._append_locked(x)
+            if appended_number:
+                self._not_empty.notify()
+            return appended_number
+
+    def pop(self, timeout=None):
+        items = self.pop_batch(1, timeout)
+        return items[0] if items else None
+
+    def pop_batch(self, max_items=256, timeout=None):
+        """
+        Pops up to `max_items` in one lock round trip.
+
+        Blocks until at least one item is available or `timeout` seconds pass;
+        returns an empty list on timeout.
+        """
+        with self._not_empty:
+            if not self.collection:
+                self._not_empty.wait_for(lambda: self.collection, timeout)
+                if not self.collection:
+                    return []
+
+            item_number = min(max_items, len(self.collection))
+            popleft = self.collection.popleft
+            items = [popleft() for _ in range(item_number)]
+            self._not_full.notify(item_number)
+            return items
 
-    def pop(self):
-        return self.collection.get()
-    
     def __len__(self):
-        return self.collection.qsize()
-    
+        return len(self.collection)
+
     def __str__(self):
         return f"{len(self)}"
-    
+
     def print_collection(self):
-        return self.collection.queue
-    
+        return self.collection
+
     def empty(self):
-        return self.collection.empty()
\ No newline at end of file
+        return not self.collection
+
+    def get_statistic(self):
+        return {
+            'size': len(self),
+            'enqueued': self.enqueued_number,
+            'dropped': self.dropped_number,
+            'high_watermark': self.high_watermark,
+        }
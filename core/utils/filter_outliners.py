@@ -6,4 +6,73 @@ def filter_outliners(array):
     iqr = q3 - q1
     lower_bound = q1 - (1.5 * iqr)
     upper_bound = q3 + (1.5 * iqr)
-    return array[(array >= lower_bound) & (array <= upper_bound)]
\ No newline at end of file
+    return array[(array >= lower_bound) & (array <= upper_bound)]
+
+
+def _segment_percentile(sorted_values, segment_offsets, segment_lengths, quantile):
+    # Same arithmetic as the 'linear' method of np.percentile, so the result is bit for bit equal
+    virtual_indexes = (segment_lengths - 1) * quantile
+    previous_indexes = np.floor(virtual_indexes)
+    gamma = virtual_indexes - previous_indexes
+    previous_indexes = previous_indexes.astype(np.intp)
+    next_indexes = previous_indexes + 1
+    # A single value segment takes its only value
+    above_bounds = virtual_indexes >= segment_lengths - 1
+    previous_indexes[above_bounds] = segment_lengths[above_bounds] - 1
+    next_indexes[above_bounds] = segment_lengths[above_bounds] - 1
+
+    previous = sorted_values[segment_offsets + previous_indexes]
+    next = sorted_values[segment_offsets + next_indexes]
+    diff = next - previous
+    return np.where(gamma >= 0.5, next - diff * (1 - gamma), previous + diff * gamma)
+
+
+def segment_outliner_mask(values, segment_lengths):
+    """
+    Outlier mask of many segments at once, equal to calling filter_outliners on every segment.
+
+    Parameters:
+    - values (np.ndarray): Values of all segments, one segment after another.
+    - segment_lengths (np.ndarray): Number of values in every segment; segments must not be empty.
+
+    Returns:
+    - np.ndarray: True for the values filter_outliners keeps.
+    """
+    values = np.asarray(values)
+    segment_lengths = np.asarray(segment_lengths, dtype=np.intp)
+    if not len(segment_lengths):
+        return np.ones(len(values), dtype=bool)
+
+    segment_offsets = np.zeros(len(segment_lengths), dtype=np.intp)
+    np.cumsum(segment_lengths[:-1], out=segment_offsets[1:])
+    segment_ids = np.repeat(np.arange(len(segment_lengths)), segment_lengths)
+    float_values = values.astype(np.float64, copy=False)
+    sorted_values = float_values[np.lexsort((float_values, segment_ids))]
+
+    q1 = _segment_percentile(sorted_values, segment_offsets, segment_lengths, 0.25)
+    q3 = _segment_percentile(sorted_values, segment_offsets, segment_lengths, 0.75)
+    iqr = q3 - q1
+    lower_bound = np.repeat(q1 - (1.5 * iqr), segment_lengths)
+    upper_bound = np.repeat(q3 + (1.5 * iqr), segment_lengths)
+    return (values >= lower_bound) & (values <= upper_bound)
+
+
+def filter_outliners_segments(values, segment_lengths):
+    """
+    filter_outliners of every segment in one vectorized pass.
+
+    Parameters:
+    - values (np.ndarray): Values of all segments, one segment after another.
+    - segment_lengths (np.ndarray): Number of values in every segment; segments must not be empty.
+
+    Returns:
+    - list: Filtered values of every segment, in the dtype of values.
+    """
+    values = np.asarray(values)
+    segment_lengths = np.asarray(segment_lengths, dtype=np.intp)
+    if not len(segment_lengths):
+        return []
+    mask = segment_outliner_mask(values, segment_lengths)
+    kept_numbers = np.zeros(len(segment_lengths), dtype=np.intp)
+    np.add.at(kept_numbers, np.repeat(np.arange(len(segment_lengths)), segment_lengths)[mask], 1)
+    return np.split(values[mask], np.cumsum(kept_numbers)[:-1])
@@ -21,7 +21,7 @@ class FixSizeBST:
         self._splay_tree.remove(oldest_node.key)
 
     def _sha256_hash(self, data):
-        return int(hashlib.sha256(data.encode()).hexdigest(), 16)
+        return int(hashlib.sha256(str(data).encode()).hexdigest(), 16)
 
     def add_new_node(self, key_info, value):
         key = self._sha256_hash(key_info)
@@ -37,10 +37,23 @@ class FixSizeBST:
         	return None
         return save_key_info_node.value.value
 
+    # Plain BST descent without splaying, so the eviction order is left untouched
+    def peek_value(self, key_info):
+        key = self._sha256_hash(key_info)
+        node = self._splay_tree.root
+        while node is not None and node.key != key:
+            node = node.left if key < node.key else node.right
+        if node is None:
+            return None
+        return node.value.value
+
     def delete(self, key_info):
         key = self._sha256_hash(key_info)
         self._splay_tree.remove(key)
 
+    def __len__(self):
+        return self._splay_tree.size()
+
     def keys(self):
         return [node.value.key_info for node in self._splay_tree.levelorder()]
 
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+
+class FixSizeLRU:
+    def __init__(self, fix_size):
+        self._fix_size = fix_size
+        self._storage = OrderedDict()
+
+    def _remove_oldest_element(self):
+        self._storage.popitem(last=False)
+
+    def add_new_node(self, key_info, value):
+        if key_info in self._storage:
+            self._storage.move_to_end(key_info)
+        elif len(self._storage) >= self._fix_size:
+            self._remove_oldest_element()
+
+        self._storage[key_info] = value
+
+    def get_value(self, key_info):
+        value = self._storage.get(key_info)
+        if value is None:
+            return None
+        self._storage.move_to_end(key_info)
+        return value
+
+    # Lookup that leaves the eviction order untouched
+    def peek_value(self, key_info):
+        return self._storage.get(key_info)
+
+    def delete(self, key_info):
+        self._storage.pop(key_info, None)
+
+    def __len__(self):
+        return len(self._storage)
+
+    def __contains__(self, key_info):
+        return key_info in self._storage
+
+    # Most recently used first, the same order FixSizeBST reports
+    def keys(self):
+        return list(reversed(self._storage.keys()))
+
+    def items(self):
+        return list(reversed(self._storage.items()))
@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class RingBuffer:
+    __slots__ = ('_data', '_start', '_size', 'capacity')
+
+    # Allocation of an unbounded buffer; it doubles when full
+    INITIAL_SIZE = 8
+
+    def __init__(self, capacity=None, dtype=np.float64):
+        """
+        Array-backed buffer of the last `capacity` values.
+
+        With a capacity the array is allocated once and the oldest value is overwritten
+        when the buffer is full. Without one the buffer keeps every value and grows.
+
+        Parameters:
+        - capacity (int): Maximum number of values kept, None for unbounded.
+        - dtype: NumPy dtype of the values.
+        """
+        self.capacity = capacity
+        self._data = np.empty(self.INITIAL_SIZE if capacity is None else capacity, dtype=dtype)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        data = np.empty(2 * len(self._data), dtype=self._data.dtype)
+        data[:self._size] = self.values()
+        self._data = data
+        self._start = 0
+
+    def append(self, value):
+        size = self._size
+        if self._start == 0 and size < len(self._data):
+            # Not wrapped around yet, the common case
+            self._data[size] = value
+            self._size = size + 1
+            return
+
+        if self._size == len(self._data):
+            if self.capacity is None:
+                self._grow()
+            else:
+                self._data[self._start] = value
+                self._start = (self._start + 1) % len(self._data)
+                return
+
+        self._data[(self._start + self._size) % len(self._data)] = value
+        self._size += 1
+
+    def add_to_last(self, value):
+        self._data[(self._start + self._size - 1) % len(self._data)] += value
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("RingBuffer index out of range")
+        return self._data[(self._start + index) % len(self._data)]
+
+    def values(self):
+        """Values from the oldest to the newest; a view unless the buffer wraps around."""
+        end = self._start + self._size
+        if end <= len(self._data):
+            return self._data[self._start:end]
+        return np.concatenate((self._data[self._start:], self._data[:end - len(self._data)]))
+
+    def insert(self, index, value):
+        """Inserts before position `index`; a full bounded buffer drops its oldest value."""
+        values = np.insert(self.values(), index, value)
+        if self.capacity is not None and len(values) > self.capacity:
+            values = values[1:]
+        while len(values) > len(self._data):
+            self._data = np.empty(2 * len(self._data), dtype=self._data.dtype)
+        self._data[:len(values)] = values
+        self._start = 0
+        self._size = len(values)
@@ -0,0 +1,64 @@
+import math
+
+
+class TimingWheel:
+    def __init__(self, tick=0.1, slot_number=64):
+        """
+        Hashed timing wheel: items are bucketed by the tick of their deadline.
+
+        Time only moves through advance(), so the wheel works the same on live traffic
+        and on packet timestamps of a replayed capture. Adding an item is O(1); advance()
+        visits only the slots of the ticks that elapsed, so every item is looked at once
+        per wheel revolution. Deadlines further than slot_number ticks ahead stay in their
+        slot until their revolution comes.
+
+        Parameters:
+        - tick (float): Width of a slot in seconds; items expire up to one tick late.
+        - slot_number (int): Number of slots.
+        """
+        self.tick = tick
+        self.slot_number = slot_number
+        self._slots = [[] for _ in range(slot_number)]
+        self._current_tick = None
+        self._size = 0
+
+    def _tick_of(self, timestamp):
+        return math.floor(timestamp / self.tick)
+
+    def add(self, deadline, item):
+        deadline_tick = self._tick_of(deadline)
+        # A deadline already behind the wheel goes to the next slot advance() visits
+        slot_tick = deadline_tick if self._current_tick is None else max(deadline_tick, self._current_tick)
+        self._slots[slot_tick % self.slot_number].append((deadline_tick, item))
+        self._size += 1
+
+    def advance(self, now):
+        """Moves the wheel to `now`; returns the items whose deadline tick has fully elapsed."""
+        now_tick = self._tick_of(now)
+        if self._current_tick is None:
+            self._current_tick = now_tick
+        if now_tick <= self._current_tick:
+            return []
+
+        expired = []
+        for tick in range(self._current_tick, min(now_tick, self._current_tick + self.slot_number)):
+            slot = self._slots[tick % self.slot_number]
+            if not slot:
+                continue
+            kept = [entry for entry in slot if entry[0] >= now_tick]
+            if len(kept) != len(slot):
+                expired.extend(item for deadline_tick, item in slot if deadline_tick < now_tick)
+                self._slots[tick % self.slot_number] = kept
+        self._current_tick = now_tick
+        self._size -= len(expired)
+        return expired
+
+    def pop_all(self):
+        """Removes and returns every item regardless of its deadline."""
+        items = [item for slot in self._slots for deadline_tick, item in slot]
+        self._slots = [[] for _ in range(self.slot_number)]
+        self._size = 0
+        return items
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,42 @@
+import argparse
+from pathlib import Path
+from core.models.model_pipeline import ModelPipeline
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        description="Convert a pickle-based pipeline_config.json into a single-file model artifact",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument(
+        "-c",
+        "--model_pipeline_config",
+        type=Path,
+        required=True,
+        help="pipeline_config.json with the step pickles",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Artifact file (default: model.vpnm next to the config)",
+    )
+    parser.add_argument(
+        "--inference_engine",
+        choices=ModelPipeline.INFERENCE_ENGINES,
+        default=None,
+        help="Inference engine recorded in the artifact (default: the one from the config)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    model_pipeline = ModelPipeline.from_config(args.model_pipeline_config)
+    if args.inference_engine is not None:
+        model_pipeline.inference_engine = args.inference_engine
+
+    output = args.output or args.model_pipeline_config.parent.joinpath("model.vpnm")
+    model_pipeline.save_artifact(output)
+    print(f"Model artifact saved to {output} ({output.stat().st_size} bytes)")
@@ -0,0 +1,98 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.feature.feature_schema import FeatureSchema
+from core.models.batch_predictor import BatchPredictor
+
+
+class FakeFlow:
+    def __init__(self, values):
+        self.values = values
+
+    def get_feature_vector(self, out=None):
+        out[:] = self.values
+        return out
+
+
+class FakeModelPipeline:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def filter_array(self, X, schema):
+        return X[:, schema.indices_for(['b'])[0]] < 0
+
+    def predict_array(self, X, schema):
+        self.batch_sizes.append(len(X))
+        return np.where(X[:, schema.indices_for(['a'])[0]] > 0, 'vpn', 'normal')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBatchPredictor(unittest.TestCase):
+    def setUp(self):
+        self.model_pipeline = FakeModelPipeline()
+        self.clock = FakeClock()
+        self.results = []
+        self.batch_predictor = BatchPredictor(
+            self.model_pipeline,
+            FeatureSchema(['a', 'b']),
+            lambda context, prediction: self.results.append((context, prediction)),
+            max_batch_size=4,
+            max_latency=0.5,
+            clock=self.clock
+        )
+
+    def test_flush_on_size(self):
+        for i in range(3):
+            self.assertTrue(self.batch_predictor.submit(FakeFlow([i - 1, 1]), i))
+        self.assertEqual([], self.results)
+
+        self.batch_predictor.submit(FakeFlow([5, 1]), 3)
+        self.assertEqual([(0, 'normal'), (1, 'normal'), (2, 'vpn'), (3, 'vpn')], self.results)
+        self.assertEqual([4], self.model_pipeline.batch_sizes)
+        self.assertEqual(0, len(self.batch_predictor))
+
+    def test_flush_on_deadline(self):
+        self.batch_predictor.submit(FakeFlow([1, 1]), 'first')
+        self.clock.now = 0.4
+        self.batch_predictor.submit(FakeFlow([1, 1]), 'second')
+        self.batch_predictor.poll()
+        self.assertEqual([], self.results)
+
+        self.clock.now = 0.5
+        self.batch_predictor.poll()
+        self.assertEqual([('first', 'vpn'), ('second', 'vpn')], self.results)
+
+    def test_nan_rows_are_rejected(self):
+        self.assertFalse(self.batch_predictor.submit(FakeFlow([np.nan, 1]), 'nan'))
+        self.assertEqual(0, len(self.batch_predictor))
+
+        self.batch_predictor.submit(FakeFlow([1, 1]), 'valid')
+        self.batch_predictor.flush()
+        self.assertEqual([('valid', 'vpn')], self.results)
+
+    def test_filtered_rows(self):
+        self.batch_predictor.submit(FakeFlow([1, -1]), 'filtered')
+        self.batch_predictor.submit(FakeFlow([1, 1]), 'valid')
+        self.batch_predictor.flush()
+
+        self.assertEqual([('filtered', None), ('valid', 'vpn')], self.results)
+        self.assertEqual([1], self.model_pipeline.batch_sizes)
+        self.assertEqual(1, self.batch_predictor.filtered_number)
+
+    def test_everything_filtered_skips_predict(self):
+        self.batch_predictor.submit(FakeFlow([1, -1]), 'filtered')
+        self.batch_predictor.flush()
+        self.assertEqual([('filtered', None)], self.results)
+        self.assertEqual([], self.model_pipeline.batch_sizes)
@@ -0,0 +1,177 @@
+import sys
+import socket
+import threading
+import select
+import unittest
+from pathlib import Path
+from scapy.all import Ether, CookedLinux, Dot1Q, IP, IPv6, IPv6ExtHdrHopByHop, IPv6ExtHdrFragment, TCP, UDP, ICMP, ARP
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.sniffer.bpf_filter import compile_tls_filter
+from core.sniffer.packet_ring import PacketRing, SOL_PACKET
+from core.sniffer.sniffer import Sniffer, receive_truncated_frame, PACKET_AUXDATA, SO_TIMESTAMPNS
+from core.sniffer.packet_decoder import decode_packet, DLT_EN10MB, DLT_RAW, DLT_LINUX_SLL
+
+
+def ether():
+    # Explicit addresses keep scapy from resolving them on the host
+    return Ether(src='02:00:00:00:00:01', dst='02:00:00:00:00:02')
+
+
+def make_l3_packets():
+    return [
+        IP(src='10.0.0.1', dst='1.2.3.4') / TCP(sport=40000, dport=443) / b'hello',
+        IP(src='1.2.3.4', dst='10.0.0.1') / TCP(sport=443, dport=40000),
+        IP(src='10.0.0.1', dst='1.2.3.4') / UDP(sport=40000, dport=443) / b'quic',
+        IP(src='10.0.0.1', dst='1.2.3.4', options=b'\x01\x01\x01\x00') / TCP(sport=443, dport=40000),
+        IP(src='10.0.0.1', dst='1.2.3.4') / TCP(sport=40000, dport=80),
+        IP(src='10.0.0.1', dst='1.2.3.4') / UDP(sport=40000, dport=53),
+        IP(src='10.0.0.1', dst='1.2.3.4') / ICMP(),
+        IP(src='10.0.0.1', dst='1.2.3.4', flags='MF') / TCP(sport=40000, dport=443),
+        IP(src='10.0.0.1', dst='1.2.3.4', frag=10, proto=6) / (b'\x01\xbb' * 10),
+        IPv6(src='fd00::1', dst='fd00::2') / TCP(sport=40000, dport=443),
+        IPv6(src='fd00::1', dst='fd00::2') / UDP(sport=443, dport=40000),
+        IPv6(src='fd00::1', dst='fd00::2') / TCP(sport=40000, dport=8443),
+        IPv6(src='fd00::1', dst='fd00::2') / IPv6ExtHdrHopByHop() / TCP(sport=40000, dport=443),
+        IPv6(src='fd00::1', dst='fd00::2') / IPv6ExtHdrFragment(offset=0) / UDP(sport=40000, dport=443),
+    ]
+
+
+def make_frames():
+    frames = []
+    for packet in make_l3_packets():
+        frames.append((DLT_EN10MB, bytes(ether() / packet)))
+        frames.append((DLT_EN10MB, bytes(ether() / Dot1Q(vlan=5) / packet)))
+        frames.append((DLT_LINUX_SLL, bytes(CookedLinux(proto=0x0800 if packet.version == 4 else 0x86dd) / packet)))
+        frames.append((DLT_RAW, bytes(packet)))
+    frames.append((DLT_EN10MB, bytes(ether() / ARP())))
+    # Truncated frames
+    frames.append((DLT_EN10MB, bytes(ether() / IP() / TCP(dport=443))[:30]))
+    frames.append((DLT_RAW, b''))
+    return frames
+
+
+class TestTlsFilter(unittest.TestCase):
+    def test_never_drops_what_the_decoder_keeps(self):
+        programs = {linktype: compile_tls_filter(linktype) for linktype in (DLT_EN10MB, DLT_LINUX_SLL, DLT_RAW)}
+        for linktype, frame in make_frames():
+            if decode_packet(frame, 0.0, linktype=linktype) is not None:
+                self.assertTrue(programs[linktype].matches(frame), frame)
+
+    def test_drops_in_kernel(self):
+        program = compile_tls_filter()
+        for packet in make_l3_packets():
+            frame = bytes(ether() / packet)
+            if IPv6ExtHdrHopByHop not in packet and IPv6ExtHdrFragment not in packet:
+                # Everything the filter judges itself agrees with the decoder
+                self.assertEqual(program.matches(frame), decode_packet(frame, 0.0) is not None, packet.summary())
+        self.assertFalse(program.matches(bytes(ether() / ARP())))
+
+    def test_ports_and_snaplen(self):
+        program = compile_tls_filter(ports=(443, 8443), snaplen=96)
+        self.assertEqual(program.run(bytes(ether() / IP() / TCP(dport=8443))), 96)
+        self.assertEqual(program.run(bytes(ether() / IPv6() / UDP(sport=8443))), 96)
+        self.assertEqual(program.run(bytes(ether() / IP() / TCP(dport=80))), 0)
+
+    def test_unsupported_linktype(self):
+        with self.assertRaises(ValueError):
+            compile_tls_filter(linktype=105)
+
+
+def open_loopback_socket():
+    try:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    except (PermissionError, AttributeError, OSError) as e:
+        raise unittest.SkipTest(f"AF_PACKET sockets are not available: {e}")
+    return sock
+
+
+def send_udp(ports, payload=b'x' * 100):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        for port in ports:
+            sender.sendto(payload, ('127.0.0.1', port))
+
+
+class TestKernelFilter(unittest.TestCase):
+    def test_attached_filter(self):
+        sock = open_loopback_socket()
+        self.addCleanup(sock.close)
+        sock.bind(('lo', 0))
+        compile_tls_filter(DLT_EN10MB).attach(sock)
+        sock.bind(('lo', 0x0003))
+        sock.setblocking(False)
+
+        send_udp([80, 443, 53])
+        records = []
+        while select.select([sock], [], [], 0.5)[0]:
+            frame = sock.recv(65535)
+            records.append(decode_packet(frame, 0.0))
+        # Sent and received copies of the port 443 datagram only
+        self.assertTrue(records)
+        for record in records:
+            self.assertIsNotNone(record)
+            self.assertIn(443, [port for _, port in record.flow_key.endpoints()])
+
+
+    def test_header_only(self):
+        sock = open_loopback_socket()
+        self.addCleanup(sock.close)
+        sock.bind(('lo', 0))
+        compile_tls_filter(DLT_EN10MB, snaplen=Sniffer.HEADER_SNAPLEN).attach(sock)
+        sock.setsockopt(SOL_PACKET, PACKET_AUXDATA, 1)
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        sock.bind(('lo', 0x0003))
+        sock.settimeout(1)
+
+        send_udp([443], payload=b'x' * 1400)
+        frame, timestamp, wirelen, linktype = receive_truncated_frame(sock, 65535)
+        self.assertEqual(len(frame), Sniffer.HEADER_SNAPLEN)
+        self.assertEqual(wirelen, 14 + 20 + 8 + 1400)
+        self.assertEqual(linktype, DLT_EN10MB)
+        self.assertGreater(timestamp, 1e9)
+        self.assertEqual(decode_packet(frame, timestamp, wirelen=wirelen).wirelen, wirelen)
+
+
+class TestPacketRing(unittest.TestCase):
+    def test_header_only(self):
+        open_loopback_socket().close()
+        ring = PacketRing('lo', bpf_filter=lambda linktype: compile_tls_filter(linktype, snaplen=64), block_size=1 << 16, block_number=4, block_timeout=10, promisc=False)
+        self.addCleanup(ring.close)
+
+        send_udp([443], payload=b'x' * 1400)
+        timer = threading.Timer(5, ring.stop)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        for packets in ring.blocks(poll_timeout=0.05):
+            frame, _, wirelen = packets[0]
+            self.assertEqual((len(frame), wirelen), (64, 14 + 20 + 8 + 1400))
+            break
+
+    def test_blocks(self):
+        open_loopback_socket().close()
+        ring = PacketRing('lo', bpf_filter=compile_tls_filter, block_size=1 << 16, block_number=4, block_timeout=10, promisc=False)
+        self.addCleanup(ring.close)
+        self.assertEqual(ring.linktype, DLT_EN10MB)
+
+        send_udp([443, 80, 443])
+        records = []
+        # Do not hang if the packets never come
+        timer = threading.Timer(5, ring.stop)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        for packets in ring.blocks(poll_timeout=0.05):
+            for frame, timestamp, wirelen in packets:
+                records.append(decode_packet(frame, timestamp, wirelen=wirelen, linktype=ring.linktype))
+            if len(records) >= 4:
+                ring.stop()
+
+        self.assertEqual(len(records), 4)
+        for record in records:
+            self.assertEqual(record.wirelen, 14 + 20 + 8 + 100)
+            self.assertGreater(record.time, 1e9)
+        self.assertEqual(ring.get_statistic(), {'packets': 4, 'dropped': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import sys
+import random
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+from scapy.all import Ether, IP, TCP, UDP, wrpcap
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.feature.feature_storage import FeatureStorage
+from core.feature.columnar_features import FlowColumns, ColumnarFeatureStorage, extract_pcap_features, reduce_segments
+
+
+class FakePacket:
+    __slots__ = ('time', 'length')
+
+    def __init__(self, time, length):
+        self.time = time
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+def make_flows(flow_number, seed=0):
+    random.seed(seed)
+    flows = []
+    for _ in range(flow_number):
+        current_time = 1000 + random.random()
+        packets = []
+        for _ in range(random.choice([0, 1, 2, 5, 31, 45])):
+            current_time += random.choice([0.0, random.random() * 0.01, random.random() * 0.1, random.random() * 0.5])
+            # Some packets come out of order
+            packet_time = current_time - (random.random() * 0.3 if random.random() < 0.1 else 0)
+            packets.append(FakePacket(packet_time, random.choice([66, 1514, random.randint(40, 1500)])))
+        flows.append(packets)
+    return flows
+
+
+def reference_features(packets):
+    feature_storage = FeatureStorage()
+    for packet in packets:
+        feature_storage.extract_features(packet)
+    return feature_storage.get_feature_vector()
+
+
+def same_features(result, expected):
+    # Bit for bit, NaN where FeatureStorage has NaN
+    return np.array_equal(result, expected, equal_nan=True)
+
+
+class TestColumnarFeatureStorage(unittest.TestCase):
+    def test_same_as_feature_storage(self):
+        flows = make_flows(300)
+        # Packets of all flows interleaved, like in a capture
+        packets = [(flow_id, packet) for flow_id, flow in enumerate(flows) for packet in flow]
+        random.shuffle(packets)
+        packets.sort(key=lambda item: flows[item[0]].index(item[1]))
+
+        columns = FlowColumns(
+            [flow_id for flow_id, _ in packets],
+            [packet.time for _, packet in packets],
+            [packet.length for _, packet in packets],
+            len(flows)
+        )
+        result = ColumnarFeatureStorage(columns).get_feature_matrix()
+
+        self.assertEqual(result.shape, (len(flows), len(FeatureStorage.get_schema())))
+        for flow_id, flow in enumerate(flows):
+            self.assertTrue(same_features(result[flow_id], reference_features(flow)))
+
+    def test_select(self):
+        flows = make_flows(20, seed=1)
+        flow_ids = [flow_id for flow_id, flow in enumerate(flows) for _ in flow]
+        packets = [packet for flow in flows for packet in flow]
+        columns = FlowColumns(flow_ids, [p.time for p in packets], [p.length for p in packets], len(flows))
+
+        result = ColumnarFeatureStorage(columns.select([7, 3])).get_feature_matrix()
+        self.assertTrue(same_features(result[0], reference_features(flows[7])))
+        self.assertTrue(same_features(result[1], reference_features(flows[3])))
+
+    def test_reduce_segments_keeps_summation_order(self):
+        values = np.random.RandomState(0).exponential(size=200)
+        segment_lengths = np.array([1, 7, 8, 9, 17, 33, 125])
+        expected = [np.sum(segment) for segment in np.split(values[:segment_lengths.sum()], np.cumsum(segment_lengths)[:-1])]
+        result = reduce_segments(values, segment_lengths, lambda rows: np.sum(rows, axis=1))
+        np.testing.assert_array_equal(result, expected)
+
+
+class TestExtractPcapFeatures(unittest.TestCase):
+    def test_flows_from_pcap(self):
+        packets = []
+        for i in range(40):
+            for client, port in (('10.0.0.1', 40000), ('10.0.0.2', 40001)):
+                packet = Ether() / IP(src=client, dst='1.2.3.4') / TCP(sport=port, dport=443) / (b'x' * (i % 7 * 100))
+                packet.time = 1000 + i * 0.03 + (port - 40000) * 0.001
+                packets.append(packet)
+        # Too short flow and not TLS
+        for i in range(3):
+            packet = Ether() / IP(src='10.0.0.3', dst='1.2.3.4') / TCP(sport=40002, dport=443)
+            packet.time = 1000 + i
+            packets.append(packet)
+            packet = Ether() / IP(src='10.0.0.4', dst='1.2.3.4') / UDP(sport=40003, dport=53)
+            packet.time = 1000 + i
+            packets.append(packet)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pcap_path = Path(tmp_dir) / 'flows.pcap'
+            wrpcap(str(pcap_path), packets)
+            features = extract_pcap_features(pcap_path, packet_number=31, min_packet_number=27)
+
+        self.assertEqual(list(features['Flow']), ['1.2.3.4:443<-->10.0.0.1:40000', '1.2.3.4:443<-->10.0.0.2:40001'])
+        self.assertEqual(list(features.columns[1:]), FeatureStorage.get_schema().feature_names)
+        flow_packets = [packet for packet in packets if packet['IP'].src == '10.0.0.1'][:31]
+        expected = reference_features([FakePacket(float(packet.time), len(packet)) for packet in flow_packets])
+        self.assertTrue(same_features(features.iloc[0, 1:].to_numpy(dtype=np.float64), expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import pickle
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler, PowerTransformer, MinMaxScaler
+from sklearn.decomposition import FastICA
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.models.compiled_transform import CompiledTransform
+
+
+def sklearn_transform(steps, X):
+    for name, step in steps:
+        X = step.transform(X)
+    return X
+
+
+class TestCompiledTransform(unittest.TestCase):
+    def test_shipped_model_on_vpn_data(self):
+        model_dir = ROOT / 'models' / 'interval-27-30-reality-0_915'
+        steps = []
+        for name, file_name in [('scaler', 'power_transformer.pkl'), ('ica', 'ica.pkl')]:
+            with open(model_dir / file_name, 'rb') as f:
+                steps.append((name, pickle.load(f)))
+
+        feature_names = list(steps[0][1].feature_names_in_)
+        data = pd.concat(
+            [pd.read_csv(path) for path in sorted((ROOT / 'vpn-data').glob('*.csv'))],
+            ignore_index=True
+        )[feature_names].dropna()
+
+        compiled = CompiledTransform.compile(steps)
+        expected = sklearn_transform(steps, data)
+        np.testing.assert_array_equal(compiled(data.to_numpy()), expected)
+        np.testing.assert_array_equal(compiled(data.to_numpy()[:1]), sklearn_transform(steps, data[:1]))
+
+    def test_special_lambdas(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(200, 4)) * 3
+        power_transformer = PowerTransformer().fit(X)
+        power_transformer.lambdas_[:] = [0.0, 2.0, 0.5, 1.5]
+        steps = [
+            ('scaler', power_transformer),
+            ('standard', StandardScaler(with_mean=False).fit(X)),
+            ('ica', FastICA(n_components=3, whiten='unit-variance', random_state=0).fit(X)),
+        ]
+        np.testing.assert_array_equal(CompiledTransform.compile(steps)(X), sklearn_transform(steps, X))
+
+    def test_unsupported_step(self):
+        X = np.arange(12, dtype=float).reshape(4, 3)
+        self.assertIsNone(CompiledTransform.compile([('scaler', MinMaxScaler().fit(X))]))
+        self.assertIsNone(CompiledTransform.compile([('scaler', PowerTransformer(method='box-cox').fit(X + 1))]))
+
+    def test_feature_number_check(self):
+        compiled = CompiledTransform.compile([('scaler', StandardScaler().fit(np.ones((3, 2))))])
+        with self.assertRaises(ValueError):
+            compiled(np.ones((1, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
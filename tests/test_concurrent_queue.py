@@ -0,0 +1,85 @@
+import sys
+import time
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils.concurrent_queue import ConcurrentQueue
+
+
+class TestConcurrentQueue(unittest.TestCase):
+    def test_pop_batch(self):
+        q = ConcurrentQueue(maxsize=100)
+        for i in range(10):
+            q.append(i)
+
+        self.assertEqual([0, 1, 2, 3], q.pop_batch(4))
+        self.assertEqual([4, 5, 6, 7, 8, 9], q.pop_batch(100))
+        self.assertTrue(q.empty())
+
+    def test_extend(self):
+        q = ConcurrentQueue(maxsize=5)
+        self.assertEqual(3, q.extend([0, 1, 2]))
+        self.assertEqual(2, q.extend([3, 4, 5, 6]))
+        self.assertEqual([0, 1, 2, 3, 4], q.pop_batch(10))
+        self.assertEqual(2, q.get_statistic()['dropped'])
+
+        q = ConcurrentQueue(maxsize=2, drop_policy=ConcurrentQueue.DROP_OLDEST)
+        self.assertEqual(3, q.extend([0, 1, 2]))
+        self.assertEqual([1, 2], q.pop_batch(10))
+
+    def test_pop_batch_timeout(self):
+        q = ConcurrentQueue()
+        start_time = time.monotonic()
+        self.assertEqual([], q.pop_batch(10, timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.04)
+        self.assertIsNone(q.pop(timeout=0.01))
+
+    def test_consumer_wakes_up_on_append(self):
+        q = ConcurrentQueue()
+        result = []
+        consumer = threading.Thread(target=lambda: result.extend(q.pop_batch(10, timeout=5)))
+        consumer.start()
+        time.sleep(0.05)
+
+        start_time = time.monotonic()
+        q.append('packet')
+        consumer.join()
+        self.assertEqual(['packet'], result)
+        self.assertLess(time.monotonic() - start_time, 1)
+
+    def test_drop_newest(self):
+        q = ConcurrentQueue(maxsize=3, drop_policy=ConcurrentQueue.DROP_NEWEST)
+        appended = [q.append(i) for i in range(5)]
+
+        self.assertEqual([True, True, True, False, False], appended)
+        self.assertEqual([0, 1, 2], q.pop_batch(10))
+        self.assertEqual({'size': 0, 'enqueued': 3, 'dropped': 2, 'high_watermark': 3}, q.get_statistic())
+
+    def test_drop_oldest(self):
+        q = ConcurrentQueue(maxsize=3, drop_policy=ConcurrentQueue.DROP_OLDEST)
+        for i in range(5):
+            q.append(i)
+
+        self.assertEqual([2, 3, 4], q.pop_batch(10))
+        self.assertEqual(2, q.dropped_number)
+
+    def test_block(self):
+        q = ConcurrentQueue(maxsize=2, drop_policy=ConcurrentQueue.BLOCK)
+        producer = threading.Thread(target=lambda: [q.append(i) for i in range(6)])
+        producer.start()
+
+        result = []
+        while len(result) < 6:
+            result.extend(q.pop_batch(10, timeout=1))
+        producer.join()
+
+        self.assertEqual(list(range(6)), result)
+        self.assertEqual(0, q.dropped_number)
+        self.assertLessEqual(q.high_watermark, 2)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ConcurrentQueue(drop_policy='unknown')
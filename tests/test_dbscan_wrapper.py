@@ -0,0 +1,57 @@
+import sys
+import pickle
+import unittest
+from pathlib import Path
+import numpy as np
+import scipy as sp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.outliners import DBSCANWrapper
+
+
+def loop_predict(model, X_new):
+    y_new = np.ones(shape=len(X_new), dtype=int) * -1
+    for j, x_new in enumerate(X_new):
+        for i, x_core in enumerate(model.components_):
+            if sp.spatial.distance.cosine(x_new, x_core) < model.eps:
+                y_new[j] = model.labels_[model.core_sample_indices_[i]]
+                break
+    return y_new
+
+
+class TestDBSCANWrapper(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        centers = rng.normal(size=(4, 6))
+        X = centers[rng.integers(len(centers), size=300)] + rng.normal(scale=0.2, size=(300, 6))
+        self.model = DBSCANWrapper(eps=0.02, min_samples=3, metric='cosine').fit(X)
+        self.X_new = np.vstack([
+            X[:50],
+            rng.normal(size=(100, 6)),
+            np.zeros((1, 6)),
+        ])
+
+    def test_matches_loop(self):
+        self.assertGreater(len(self.model.components_), 0)
+        np.testing.assert_array_equal(self.model.predict(self.X_new), loop_predict(self.model, self.X_new))
+
+    def test_small_blocks(self):
+        self.model.PREDICT_BLOCK_SIZE = 1
+        np.testing.assert_array_equal(self.model.predict(self.X_new), loop_predict(self.model, self.X_new))
+
+    def test_zero_vector_is_outlier(self):
+        self.assertEqual(self.model.predict(np.zeros((1, 6)))[0], -1)
+
+    def test_pickled_without_cache(self):
+        model = pickle.loads(pickle.dumps(self.model))
+        del model._core_squared_norms
+        del model._core_labels
+        np.testing.assert_array_equal(model.predict(self.X_new), loop_predict(self.model, self.X_new))
+
+    def test_empty_input(self):
+        self.assertEqual(len(self.model.predict(np.empty((0, 6)))), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
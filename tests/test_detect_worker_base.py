@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+import numpy as np
+from scapy.all import Ether, IP, TCP
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.sniffer.packet_decoder import decode_packet
+
+
+class ConstantPipeline:
+    """Model pipeline stub for DetectWorker tests: keeps every row and gives it one label."""
+    def __init__(self, label='normal'):
+        self.label = label
+
+    def filter_array(self, X, schema):
+        return np.zeros(len(np.atleast_2d(X)), dtype=bool)
+
+    def predict_array(self, X, schema):
+        return np.full(len(np.atleast_2d(X)), self.label, dtype=object)
+
+    def get_average_time_spent(self):
+        return 0.0
+
+
+def make_packet(time, src, payload_length=100, sport=40000, dst='1.2.3.4', dport=443):
+    packet = Ether(src='00:00:00:00:00:01', dst='00:00:00:00:00:02') / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport) / (b'x' * payload_length)
+    return decode_packet(bytes(packet), time)
@@ -48,7 +48,7 @@ class TestExtractFeatureFromFlowBase(unittest.TestCase):
                 if flow.get_packet_number() < cls.min_packet_number_on_flow:
                     continue
                 df = cls.get_feature_lambda(flow) # Implement it in Derived class
-                df.insert(0, "Flow", flow_key)
+                df.insert(0, "Flow", str(flow_key))
                 counter += 1
                 result_features_list.append(df)
 
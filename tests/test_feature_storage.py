@@ -0,0 +1,63 @@
+import sys
+import random
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.feature.feature_storage import FeatureStorage
+
+
+class FakePacket:
+    def __init__(self, time, length):
+        self.time = time
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+class TestFeatureStorage(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.feature_storage = FeatureStorage()
+        current_time = 1000.0
+        for _ in range(30):
+            current_time += random.random() * 0.03
+            self.feature_storage.extract_features(FakePacket(current_time, random.randint(40, 1500)))
+
+    def test_schema_matches_features(self):
+        schema = FeatureStorage.get_schema()
+        feature_names = []
+        for feature in self.feature_storage.features:
+            feature_names.extend(feature.get_feature_names())
+
+        self.assertIs(schema, FeatureStorage().schema)
+        self.assertEqual(feature_names, schema.feature_names)
+        self.assertEqual(len(set(feature_names)), len(schema))
+
+    def test_vector_matches_frame(self):
+        vector = self.feature_storage.get_feature_vector()
+        frame = self.feature_storage.get_features()
+
+        self.assertEqual(FeatureStorage.get_schema().feature_names, list(frame.columns))
+        np.testing.assert_array_equal(vector, frame.to_numpy()[0])
+
+    def test_write_into_preallocated_matrix(self):
+        schema = FeatureStorage.get_schema()
+        matrix = schema.empty(rows=3)
+        self.feature_storage.get_feature_vector(out=matrix[1])
+        np.testing.assert_array_equal(self.feature_storage.get_feature_vector(), matrix[1])
+
+    def test_indices_for(self):
+        schema = FeatureStorage.get_schema()
+        columns = ['avg_packet_length', 'max_interpacket_interval']
+        frame = self.feature_storage.get_features()
+        vector = self.feature_storage.get_feature_vector()
+
+        np.testing.assert_array_equal(frame[columns].to_numpy()[0], vector[schema.indices_for(columns)])
+        self.assertIs(schema.indices_for(columns), schema.indices_for(columns))
+        with self.assertRaises(KeyError):
+            schema.indices_for(['unknown_feature'])
@@ -0,0 +1,44 @@
+import sys
+import unittest
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils.filter_outliners import filter_outliners, filter_outliners_segments, segment_outliner_mask
+
+
+class TestFilterOutlinersSegments(unittest.TestCase):
+    def assert_same_as_per_segment(self, values, segment_lengths):
+        expected = [filter_outliners(segment) for segment in np.split(values, np.cumsum(segment_lengths)[:-1])]
+        result = filter_outliners_segments(values, segment_lengths)
+        self.assertEqual(len(result), len(expected))
+        for expected_segment, segment in zip(expected, result):
+            self.assertEqual(segment.dtype, expected_segment.dtype)
+            # Bit for bit, not approximately
+            np.testing.assert_array_equal(segment, expected_segment)
+
+    def test_small_segments(self):
+        # Sizes 1-4 hit every branch of the linear interpolation
+        values = np.array([5.0, 1.0, 100.0, 3.0, 3.0, 3.0, 1.0, 2.0, 3.0, 50.0])
+        self.assert_same_as_per_segment(values, np.array([1, 2, 3, 4]))
+
+    def test_random_segments(self):
+        random_state = np.random.RandomState(0)
+        for _ in range(200):
+            segment_lengths = random_state.randint(1, 40, size=random_state.randint(1, 15))
+            float_values = np.round(random_state.exponential(0.05, size=segment_lengths.sum()), 3)
+            self.assert_same_as_per_segment(float_values, segment_lengths)
+            int_values = random_state.choice([66, 1514, 40, 700], size=segment_lengths.sum()).astype(np.int32)
+            self.assert_same_as_per_segment(int_values, segment_lengths)
+
+    def test_mask(self):
+        values = np.array([1.0, 1.0, 1.0, 1.0, 10.0, 2.0])
+        np.testing.assert_array_equal(segment_outliner_mask(values, [5, 1]), [True, True, True, True, False, True])
+
+    def test_no_segments(self):
+        self.assertEqual(filter_outliners_segments(np.empty(0), np.empty(0, dtype=int)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import unittest
+import random
+import string
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils.fslru import FixSizeLRU
+
+
+def randomword(length=8):
+   letters = string.ascii_lowercase
+   return ''.join(random.choice(letters) for i in range(length))
+
+class TestFixSizeLRU(unittest.TestCase):
+    def setUp(self):
+        self.items_number = np.random.randint(4, 40)
+        self.values = [randomword() for _ in range(self.items_number)]
+        self.keys = [f"key-{i}" for i in range(self.items_number)]
+        self.t = FixSizeLRU(self.items_number)
+        for key, value in zip(self.keys, self.values):
+            self.t.add_new_node(key, value)
+
+    def test_size(self):
+        self.t.add_new_node(randomword(), randomword())
+        self.assertEqual(self.items_number, len(self.t))
+        self.assertEqual(self.items_number, len(self.t.keys()))
+
+    def test_push_object(self):
+        items = [(key, value) for key, value in zip(self.keys, self.values)]
+        np.random.shuffle(items)
+        finding_items, oldest_item = items[:-1], items[-1]
+        for _ in range(100):
+            np.random.shuffle(finding_items)
+            for key, value in finding_items:
+                self.assertEqual(value, self.t.get_value(key))
+                self.assertEqual((key, value), self.t.items()[0])
+
+        self.assertEqual(oldest_item, self.t.items()[-1])
+
+    def test_evict_least_recently_used(self):
+        oldest_key = self.keys[0]
+        for key in self.keys[1:]:
+            self.t.get_value(key)
+
+        self.t.add_new_node("new-key", "new-value")
+        self.assertIsNone(self.t.get_value(oldest_key))
+        self.assertEqual("new-value", self.t.get_value("new-key"))
+        self.assertEqual(self.items_number, len(self.t))
+
+    def test_delete(self):
+        key = random.choice(self.keys)
+        self.t.delete(key)
+        self.t.delete(key)
+        self.assertIsNone(self.t.get_value(key))
+        self.assertNotIn(key, self.t)
+        self.assertEqual(self.items_number - 1, len(self.t))
+
+    def test_peek_keeps_order(self):
+        items = self.t.items()
+        self.assertEqual(self.values[0], self.t.peek_value(self.keys[0]))
+        self.assertIsNone(self.t.peek_value("missing-key"))
+        self.assertEqual(items, self.t.items())
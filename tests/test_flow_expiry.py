@@ -0,0 +1,86 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.sniffer.detect_worker import DetectWorker
+from test_detect_worker_base import ConstantPipeline, make_packet
+
+
+class TestFlowExpiry(unittest.TestCase):
+    def make_worker(self, **kwargs):
+        self.verdicts = []
+        params = dict(
+            start_packet_number_threshold=10,
+            end_packet_number_threshold=30,
+            predict_batch_size=1,
+            verdict_callback=self.verdicts.append
+        )
+        params.update(kwargs)
+        return DetectWorker(ConstantPipeline(), **params)
+
+    def feed(self, worker, src, start_time, packet_number, interval=0.01):
+        for i in range(packet_number):
+            worker.process_packet(make_packet(start_time + i * interval, src, 100 * (i % 5)))
+
+    def test_quiet_flow_expires_on_packet_time(self):
+        worker = self.make_worker()
+        self.feed(worker, '10.0.0.1', 1000.0, 3)
+        self.assertEqual(1, worker.flow_storage.get_total_size())
+
+        self.feed(worker, '10.0.0.2', 1003.5, 1)
+        self.assertEqual(1, worker.flow_storage.get_total_size())
+        self.assertEqual(1, worker.expired_flow_number)
+        self.assertEqual(0, worker.final_predicted_flow_number)
+        self.assertEqual([], self.verdicts)
+
+    def test_final_prediction(self):
+        worker = self.make_worker()
+        self.feed(worker, '10.0.0.1', 1000.0, 12)
+        self.assertEqual([10], [verdict.packet_number for verdict in self.verdicts])
+
+        self.feed(worker, '10.0.0.2', 1004.0, 1)
+        self.assertEqual([10, 12], [verdict.packet_number for verdict in self.verdicts])
+        self.assertAlmostEqual(1000.11, float(self.verdicts[-1].timestamp))
+        self.assertEqual(1, worker.final_predicted_flow_number)
+
+    def test_expired_flow_is_not_reused(self):
+        worker = self.make_worker()
+        self.feed(worker, '10.0.0.1', 1000.0, 3)
+        # Same wheel tick as the deadline: caught by the per-packet check
+        self.feed(worker, '10.0.0.1', 1003.01, 1)
+        self.assertEqual(2, worker.get_created_flow_number())
+        self.assertEqual(1, worker.flow_storage.get_total_size())
+
+    def test_idle_timeout(self):
+        worker = self.make_worker(flow_idle_timeout=0.5)
+        self.feed(worker, '10.0.0.1', 1000.0, 3, interval=0.3)
+        self.assertEqual(1, worker.get_created_flow_number())
+        self.feed(worker, '10.0.0.2', 1002.0, 1)
+        self.assertEqual(1, worker.expired_flow_number)
+        self.feed(worker, '10.0.0.1', 1002.1, 1)
+        self.assertEqual(3, worker.get_created_flow_number())
+
+    def test_flush_expires_all_flows(self):
+        worker = self.make_worker()
+        self.feed(worker, '10.0.0.1', 1000.0, 11)
+        self.feed(worker, '10.0.0.2', 1000.0, 3)
+        worker.flush(expire_flows=True)
+
+        self.assertEqual(0, worker.flow_storage.get_total_size())
+        self.assertEqual(0, len(worker.expiry_wheel))
+        self.assertEqual([10, 11], [verdict.packet_number for verdict in self.verdicts])
+        self.assertEqual({'expired_flows': 2, 'final_predictions': 1, 'scheduled_flows': 0}, worker.get_expiry_statistic())
+
+    def test_evicted_flow_is_skipped(self):
+        worker = self.make_worker(flow_storage_size=1)
+        self.feed(worker, '10.0.0.1', 1000.0, 12)
+        self.feed(worker, '10.0.0.2', 1000.5, 1)
+        self.feed(worker, '10.0.0.3', 1010.0, 1)
+        self.assertEqual(1, worker.expired_flow_number)
+        self.assertEqual([10], [verdict.packet_number for verdict in self.verdicts])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import pickle
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scapy.all import Ether, IP, IPv6, TCP, UDP
+
+from core.flow.flow_key import FlowKey, PacketRecord, IPPROTO_TCP, IPPROTO_UDP
+
+
+class TestFlowKey(unittest.TestCase):
+    def test_direction_normalized(self):
+        forward = Ether() / IP(src="192.168.1.10", dst="10.0.0.1") / TCP(sport=51000, dport=443)
+        backward = Ether() / IP(src="10.0.0.1", dst="192.168.1.10") / TCP(sport=443, dport=51000)
+
+        self.assertEqual(FlowKey.from_packet(forward), FlowKey.from_packet(backward))
+        self.assertEqual(hash(FlowKey.from_packet(forward)), hash(FlowKey.from_packet(backward)))
+        self.assertEqual("10.0.0.1:443<-->192.168.1.10:51000", str(FlowKey.from_packet(forward)))
+
+    def test_full_address_ordering(self):
+        # Same first octet: the old key only compared it and kept packet direction
+        forward = IP(src="10.0.0.2", dst="10.0.0.1") / UDP(sport=443, dport=443)
+        backward = IP(src="10.0.0.1", dst="10.0.0.2") / UDP(sport=443, dport=443)
+
+        self.assertEqual(FlowKey.from_packet(forward), FlowKey.from_packet(backward))
+
+    def test_same_host_ports_ordered(self):
+        key = FlowKey.from_addresses(4, 1, 60000, 1, 443, IPPROTO_TCP)
+        self.assertEqual(((1, 443), (1, 60000)), key.endpoints())
+
+    def test_protocol_and_ports_are_part_of_key(self):
+        tcp_key = FlowKey.from_addresses(4, 1, 443, 2, 5000, IPPROTO_TCP)
+        udp_key = FlowKey.from_addresses(4, 1, 443, 2, 5000, IPPROTO_UDP)
+        other_port_key = FlowKey.from_addresses(4, 1, 443, 2, 5001, IPPROTO_TCP)
+
+        self.assertNotEqual(tcp_key, udp_key)
+        self.assertNotEqual(tcp_key, other_port_key)
+        self.assertEqual(IPPROTO_UDP, udp_key.proto)
+        self.assertEqual(tcp_key.host_key, udp_key.host_key)
+        self.assertEqual(tcp_key.host_key, other_port_key.host_key)
+
+    def test_ipv6(self):
+        forward = IPv6(src="2001:db8::2", dst="2001:db8::1") / TCP(sport=40000, dport=443)
+        backward = IPv6(src="2001:db8::1", dst="2001:db8::2") / TCP(sport=443, dport=40000)
+        key = FlowKey.from_packet(forward)
+
+        self.assertEqual(key, FlowKey.from_packet(backward))
+        self.assertEqual(6, key.version)
+        self.assertEqual("2001:db8::1:443<-->2001:db8::2:40000", str(key))
+        self.assertEqual("2001:db8::1<-->2001:db8::2", str(key.host_key))
+
+    def test_ipv4_and_ipv6_do_not_collide(self):
+        ipv4_key = FlowKey.from_addresses(4, 1, 443, 2, 5000, IPPROTO_TCP)
+        ipv6_key = FlowKey.from_addresses(6, 1, 443, 2, 5000, IPPROTO_TCP)
+        self.assertNotEqual(ipv4_key, ipv6_key)
+        self.assertNotEqual(ipv4_key.host_key, ipv6_key.host_key)
+
+    def test_pickle(self):
+        key = FlowKey.from_addresses(4, 3232235786, 51000, 167772161, 443, IPPROTO_TCP)
+        restored = pickle.loads(pickle.dumps(key))
+        self.assertEqual(key, restored)
+        self.assertEqual(key.host_key, restored.host_key)
+        self.assertEqual(hash(key), hash(restored))
+
+        record = pickle.loads(pickle.dumps(PacketRecord(1000.5, 1514, key)))
+        self.assertEqual((1000.5, 1514, key), (record.time, record.wirelen, record.flow_key))
@@ -0,0 +1,145 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.flow.host_verdict_store import HostVerdictStore, HostDetectionRule
+from core.sniffer.detect_worker import DetectWorker
+from test_detect_worker_base import ConstantPipeline, make_packet
+
+
+class TestHostVerdictStore(unittest.TestCase):
+    def test_counts(self):
+        store = HostVerdictStore()
+        store.add_verdict('a', 100.0, True)
+        store.add_verdict('a', 101.0, False)
+        verdicts = store.add_verdict('a', 102.0, True)
+        self.assertEqual(2, verdicts.vpn_number)
+        self.assertEqual(1, verdicts.non_vpn_number)
+        self.assertIs(verdicts, store.get('a'))
+        self.assertIsNone(store.get('b'))
+
+    def test_sliding_window(self):
+        store = HostVerdictStore(window=10)
+        for timestamp in (100.0, 105.0, 109.0):
+            store.add_verdict('a', timestamp, True)
+        self.assertEqual(3, store.get('a').get_window_number())
+
+        # Verdicts older than the window are dropped, the totals are kept
+        verdicts = store.add_verdict('a', 112.0, True)
+        self.assertEqual([105.0, 109.0, 112.0], list(verdicts.vpn_times))
+        self.assertEqual(4, verdicts.vpn_number)
+
+        # Non-VPN verdicts move the window too
+        verdicts = store.add_verdict('a', 120.0, False)
+        self.assertEqual([112.0], list(verdicts.vpn_times))
+
+    def test_window_capacity(self):
+        store = HostVerdictStore(window=100, window_capacity=4)
+        for i in range(10):
+            verdicts = store.add_verdict('a', 100.0 + i, True)
+        self.assertEqual(4, verdicts.get_window_number())
+        self.assertEqual(10, verdicts.vpn_number)
+
+    def test_lru_eviction(self):
+        store = HostVerdictStore(max_hosts=2, ttl=None)
+        store.add_verdict('a', 100.0, True)
+        store.add_verdict('b', 101.0, True)
+        store.add_verdict('a', 102.0, False)
+        store.add_verdict('c', 103.0, True)
+        self.assertEqual(2, len(store))
+        self.assertIn('a', store)
+        self.assertNotIn('b', store)
+        self.assertEqual({'hosts': 2, 'expired': 0, 'evicted': 1}, store.get_statistic())
+
+    def test_ttl(self):
+        store = HostVerdictStore(ttl=60)
+        store.add_verdict('a', 100.0, True)
+        store.add_verdict('b', 130.0, True)
+        store.add_verdict('c', 161.0, False)
+        self.assertEqual(['b', 'c'], [host for host in ('a', 'b', 'c') if host in store])
+
+        store.expire(1000.0)
+        self.assertEqual(0, len(store))
+        self.assertEqual(3, store.get_statistic()['expired'])
+
+    def test_decay(self):
+        store = HostVerdictStore(decay_half_life=10)
+        store.add_verdict('a', 100.0, True)
+        store.add_verdict('a', 100.0, True)
+        verdicts = store.add_verdict('a', 110.0, False)
+        self.assertAlmostEqual(1.0, verdicts.vpn_number)
+        self.assertAlmostEqual(1.0, verdicts.non_vpn_number)
+
+        verdicts = store.add_verdict('a', 130.0, True)
+        self.assertAlmostEqual(1.25, verdicts.vpn_number)
+        self.assertAlmostEqual(0.25, verdicts.non_vpn_number)
+
+    def test_memory_is_bounded(self):
+        store = HostVerdictStore(max_hosts=100, ttl=5, window=1)
+        for i in range(10000):
+            store.add_verdict(i % 1000, i * 0.01, i % 3 == 0)
+        self.assertLessEqual(len(store), 100)
+        self.assertTrue(all(verdicts.get_window_number() <= 64 for verdicts in store._hosts.values()))
+
+
+class TestDetectWorkerHostVerdicts(unittest.TestCase):
+    def feed_flow(self, worker, sport, start_time):
+        for i in range(10):
+            worker.process_packet(make_packet(start_time + i * 0.01, '10.0.0.1', 100 * (i % 5), sport=sport))
+
+    def test_detection_window(self):
+        worker = DetectWorker(
+            ConstantPipeline('vpn'),
+            start_packet_number_threshold=10,
+            end_packet_number_threshold=30,
+            flow_number_for_detect=2,
+            detection_time_interval=10,
+            total_detected_flow_threshold=1,
+            predict_batch_size=1
+        )
+        # is_vpn_flow also needs one non-VPN verdict of the host
+        worker.model_pipeline.label = 'normal'
+        self.feed_flow(worker, 40000, 1000.0)
+        worker.model_pipeline.label = 'vpn'
+
+        self.feed_flow(worker, 40001, 1001.0)
+        host_key = next(iter(worker.host_verdicts._hosts))
+        self.assertFalse(worker.is_vpn_flow(host_key))
+
+        self.feed_flow(worker, 40002, 1030.0)
+        # The first VPN verdict left the window
+        self.assertFalse(worker.is_vpn_flow(host_key))
+
+        self.feed_flow(worker, 40003, 1035.0)
+        self.assertTrue(worker.is_vpn_flow(host_key))
+        self.assertEqual(2, worker.host_verdicts.get(host_key).get_window_number())
+        self.assertEqual({'hosts': 1, 'expired': 0, 'evicted': 0}, worker.get_host_statistic())
+
+    def test_window_capacity_follows_rule(self):
+        self.assertEqual(64, HostDetectionRule(flow_number_for_detect=2).get_window_capacity())
+        worker = DetectWorker(ConstantPipeline('vpn'), flow_number_for_detect=100)
+        self.assertEqual(100, worker.host_verdicts.window_capacity)
+
+    def test_without_host_counters(self):
+        verdicts = []
+        worker = DetectWorker(
+            ConstantPipeline('vpn'),
+            start_packet_number_threshold=10,
+            end_packet_number_threshold=30,
+            predict_batch_size=1,
+            verdict_callback=verdicts.append,
+            count_host_verdicts=False
+        )
+        self.feed_flow(worker, 40000, 1000.0)
+
+        self.assertIsNone(worker.host_verdicts)
+        self.assertEqual(['vpn'], [verdict.label for verdict in verdicts])
+        self.assertIsNone(verdicts[0].host_vpn_number)
+        self.assertIsNone(verdicts[0].host_detected)
+        self.assertFalse(worker.is_vpn_flow(verdicts[0].flow_key.host_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
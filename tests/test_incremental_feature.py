@@ -0,0 +1,202 @@
+import sys
+import random
+import statistics
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.feature.feature import InterpacketIntervalFeature, PacketLengthFeature
+from core.feature.feature_storage import FeatureStorage
+from core.feature.interval_feature import (
+    WindowFeature,
+    InterpacketIntervalFunctionPerTimeFeature,
+    PacketLengthFunctionPerTimeFeature,
+    PacketNumberPerTimeFeature,
+    MeanFunction,
+    SumFunction
+)
+from core.utils.filter_outliners import filter_outliners
+
+
+class FakePacket:
+    def __init__(self, time, length):
+        self.time = time
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+def generate_packets(packet_number, out_of_order_ratio=0.0):
+    packets = []
+    current_time = 1000 + random.random()
+    for _ in range(packet_number):
+        current_time += random.choice([0.0, random.random() * 0.01, random.random()])
+        packet_time = current_time
+        if random.random() < out_of_order_ratio:
+            packet_time -= random.random()
+        packets.append(FakePacket(packet_time, random.choice([66, 1514, random.randint(40, 1500)])))
+    return packets
+
+
+class TestIncrementalFeature(unittest.TestCase):
+    def setUp(self):
+        random.seed(42)
+
+    def _assert_interpacket_interval_feature(self, packets):
+        feature = InterpacketIntervalFeature()
+        for i, packet in enumerate(packets):
+            feature.extract_feature(packet)
+
+            packet_times = sorted(float(p.time) for p in packets[:i + 1])
+            result = feature.get_feature()
+            if len(packet_times) < 2:
+                self.assertTrue(result.isnull().all().all())
+                continue
+
+            intervals = np.diff(packet_times)
+            self.assertEqual(np.max(intervals), result[feature.MAX_INTERPACKET_INTERVAL][0])
+            self.assertEqual(np.min(intervals), result[feature.MIN_INTERPACKET_INTERVAL][0])
+            self.assertAlmostEqual(np.mean(intervals), result[feature.AVG_INTERPACKET_INTERVAL][0], places=9)
+            self.assertEqual(packet_times[-1] - packet_times[0], result[feature.SUM_INTERPACKET_INTERVAL][0])
+
+    def test_interpacket_interval_in_order(self):
+        for _ in range(20):
+            self._assert_interpacket_interval_feature(generate_packets(random.randint(1, 40)))
+
+    def test_interpacket_interval_out_of_order(self):
+        for _ in range(20):
+            self._assert_interpacket_interval_feature(generate_packets(random.randint(1, 40), out_of_order_ratio=0.3))
+
+    def test_packet_length(self):
+        for _ in range(20):
+            packets = generate_packets(random.randint(1, 40))
+            feature = PacketLengthFeature()
+            for i, packet in enumerate(packets):
+                feature.extract_feature(packet)
+
+                lengths = [len(p) for p in packets[:i + 1]]
+                result = feature.get_feature()
+                self.assertEqual(np.max(lengths), result[feature.MAX_PACKET_LENGTH][0])
+                self.assertEqual(np.min(lengths), result[feature.MIN_PACKET_LENGTH][0])
+                self.assertAlmostEqual(np.mean(lengths), result[feature.AVG_PACKET_LENGTH][0], places=9)
+                self.assertEqual(np.sum(lengths), result[feature.SUM_PACKET_LENGTH][0])
+                self.assertEqual(statistics.mode(lengths), result[feature.MODE_PACKET_LENGTH][0])
+
+    def test_mode_ties_go_to_first_seen(self):
+        feature = PacketLengthFeature()
+        for length in [100, 200, 200, 100, 300]:
+            feature.extract_feature(FakePacket(0.0, length))
+        self.assertEqual(100, feature.get_feature()[feature.MODE_PACKET_LENGTH][0])
+
+        feature = PacketLengthFeature()
+        for length in [200, 100, 100, 200, 300]:
+            feature.extract_feature(FakePacket(0.0, length))
+        self.assertEqual(200, feature.get_feature()[feature.MODE_PACKET_LENGTH][0])
+
+    def test_capacity_keeps_feature_values(self):
+        for _ in range(10):
+            packets = generate_packets(random.randint(1, 40), out_of_order_ratio=0.2)
+            unbounded, bounded = FeatureStorage(), FeatureStorage(capacity=len(packets))
+            for packet in packets:
+                unbounded.extract_features(packet)
+                bounded.extract_features(packet)
+                np.testing.assert_array_equal(unbounded.get_feature_vector(), bounded.get_feature_vector())
+
+
+def window_reference(packets, max_interpacket_interval_time):
+    """Windows as (intervals, lengths) lists, grouped the way the windowed features define them."""
+    windows = []
+    window_start = None
+    for packet in packets:
+        packet_time = float(packet.time)
+        if window_start is not None and packet_time - window_start < max_interpacket_interval_time:
+            windows[-1][0].append(packet_time - window_start)
+            windows[-1][1].append(len(packet))
+        else:
+            window_start = packet_time
+            windows.append(([], [len(packet)]))
+    return windows
+
+
+class TestWindowFeature(unittest.TestCase):
+    def setUp(self):
+        random.seed(7)
+
+    def _assert_aggregated(self, values, result, feature):
+        if not values:
+            self.assertTrue(result.isnull().all().all())
+            return
+        self.assertEqual(np.max(values), result[feature.MAX_FEATURE][0])
+        self.assertEqual(np.min(values), result[feature.MIN_FEATURE][0])
+        self.assertEqual(np.std(values), result[feature.STD_FEATURE][0])
+        self.assertEqual(np.mean(values), result[feature.MEAN_FEATURE][0])
+
+    def _assert_window_features(self, packets, max_interpacket_interval_time):
+        windows = window_reference(packets, max_interpacket_interval_time)
+        for func in [MeanFunction(), SumFunction()]:
+            feature = InterpacketIntervalFunctionPerTimeFeature(func, max_interpacket_interval_time)
+            for packet in packets:
+                feature.extract_feature(packet)
+            expected = [func(filter_outliners(intervals)) for intervals, lengths in windows if len(intervals) > 1]
+            self._assert_aggregated(expected, feature.get_feature(), feature)
+
+            feature = PacketLengthFunctionPerTimeFeature(func, max_interpacket_interval_time)
+            for packet in packets:
+                feature.extract_feature(packet)
+            expected = [func(filter_outliners(lengths)) for intervals, lengths in windows if len(lengths) > 2]
+            self._assert_aggregated(expected, feature.get_feature(), feature)
+
+        feature = PacketNumberPerTimeFeature(max_interpacket_interval_time)
+        for packet in packets:
+            feature.extract_feature(packet)
+        self._assert_aggregated([len(lengths) for intervals, lengths in windows], feature.get_feature(), feature)
+
+    def test_random_flows(self):
+        for _ in range(20):
+            packets = generate_packets(random.randint(1, 60))
+            self._assert_window_features(packets, 0.2)
+            self._assert_window_features(packets, 0.05)
+
+    def test_many_windows(self):
+        # More windows than the wrapping window id can count, most of them without intervals
+        packets = []
+        current_time = 1000.0
+        for i in range(2000):
+            current_time += 0.01 if i % 6 in (1, 2) else 0.5
+            packets.append(FakePacket(current_time, random.randint(40, 1500)))
+        self._assert_window_features(packets, 0.2)
+
+    def test_feature_names_are_shared(self):
+        first = InterpacketIntervalFunctionPerTimeFeature(MeanFunction(), 0.05)
+        second = InterpacketIntervalFunctionPerTimeFeature(MeanFunction(), 0.05)
+        self.assertIs(first.get_feature_names(), second.get_feature_names())
+        self.assertEqual("max_feature_mean_func_interpacket_interval_per_0.05", first.MAX_FEATURE)
+        self.assertEqual("packet_number_per_0.2", PacketNumberPerTimeFeature().TIME_SERIES_FEATURE_NAME)
+
+    def test_window_size_engines_are_shared(self):
+        storage = FeatureStorage()
+        window_features = [feature for feature in storage.features if isinstance(feature, WindowFeature)]
+        self.assertEqual(
+            {0.2, 0.05},
+            {feature.max_interpacket_interval_time for feature in window_features}
+        )
+        self.assertEqual(2, len({id(feature.windows) for feature in window_features}))
+
+        packets = generate_packets(50, out_of_order_ratio=0.1)
+        for packet in packets:
+            storage.extract_features(packet)
+        vector = storage.get_feature_vector()
+        for feature in window_features:
+            standalone = type(feature)(
+                **({'func': feature.func} if hasattr(feature, 'func') else {}),
+                max_interpacket_interval_time=feature.max_interpacket_interval_time
+            )
+            for packet in packets:
+                standalone.extract_feature(packet)
+            indices = storage.schema.indices_for(feature.get_feature_names())
+            np.testing.assert_array_equal(standalone.get_feature().to_numpy()[0], vector[indices])
+
@@ -0,0 +1,173 @@
+import sys
+import pickle
+import warnings
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.models.model_pipeline import ModelPipeline
+from core.models.model_artifact import ARTIFACT_HEADER, LazyPickleStep, load_artifact, _artifact_cache
+from core.models.compiled_transform import CompiledTransform
+from core.models.tree_ensemble import FlatTreeEnsemble
+from core.feature.feature_schema import FeatureSchema
+
+
+def load_shipped_pipeline():
+    model_dir = ROOT / 'models' / 'interval-27-30-reality-0_915'
+    steps = []
+    for name, file_name in [('scaler', 'power_transformer.pkl'), ('ica', 'ica.pkl'), ('classifier', 'clf.pkl')]:
+        with open(model_dir / file_name, 'rb') as f:
+            steps.append((name, pickle.load(f)))
+    return ModelPipeline(steps)
+
+
+class TestModelArtifact(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.artifact_path = Path(self.tmp_dir.name) / 'model.vpnm'
+
+    def test_shipped_model_round_trip(self):
+        model_pipeline = load_shipped_pipeline()
+        model_pipeline.save_artifact(self.artifact_path)
+        loaded = ModelPipeline.from_config(self.artifact_path)
+
+        self.assertEqual([type(step) for name, step in loaded.pipeline.steps], [CompiledTransform, CompiledTransform, LazyPickleStep])
+        self.assertIsInstance(loaded.pipeline.steps[0][1].kernels[0].lambdas.base, np.ndarray)
+        self.assertFalse(loaded.pipeline.steps[0][1].kernels[0].lambdas.flags.writeable)
+        # The sklearn engine keeps no flattened copy of the classifier
+        self.assertIsNone(loaded.pipeline.steps[2][1].flat_tree_ensemble)
+        self.assertIsNone(loaded.compiled_classifier)
+
+        feature_names = list(model_pipeline.get_feature_names())
+        self.assertEqual(list(loaded.get_feature_names()), feature_names)
+        data = pd.read_csv(ROOT / 'vpn-data' / 'xray-order.csv')[feature_names].dropna()
+        schema = FeatureSchema(feature_names)
+        np.testing.assert_array_equal(
+            loaded.predict_array(data.to_numpy(), schema),
+            model_pipeline.predict_array(data.to_numpy(), schema)
+        )
+
+    def test_inference_engine(self):
+        model_pipeline = load_shipped_pipeline()
+        model_pipeline.inference_engine = ModelPipeline.FLAT_TREES_ENGINE
+        model_pipeline.save_artifact(self.artifact_path)
+        feature_names = list(model_pipeline.get_feature_names())
+        data = pd.read_csv(ROOT / 'vpn-data' / 'xray-order.csv')[feature_names].dropna().to_numpy()
+        schema = FeatureSchema(feature_names)
+        expected = model_pipeline.predict_array(data, schema)
+
+        flat = ModelPipeline.from_artifact(self.artifact_path)
+        classifier = flat.pipeline.named_steps['classifier']
+        self.assertEqual(flat.inference_engine, ModelPipeline.FLAT_TREES_ENGINE)
+        self.assertIsInstance(flat.compiled_classifier, FlatTreeEnsemble)
+        self.assertIs(flat.compiled_classifier, classifier.flat_tree_ensemble)
+        np.testing.assert_array_equal(flat.predict_array(data, schema), expected)
+        self.assertFalse(classifier.is_loaded())
+
+        # The original classifier is still there for the sklearn engine
+        sklearn_pipeline = ModelPipeline.from_artifact(self.artifact_path, ModelPipeline.SKLEARN_ENGINE)
+        self.assertIsNone(sklearn_pipeline.compiled_classifier)
+        np.testing.assert_array_equal(sklearn_pipeline.predict_array(data, schema), expected)
+        self.assertTrue(classifier.is_loaded())
+        self.assertIs(type(classifier.load()), type(model_pipeline.pipeline.named_steps['classifier']))
+
+    def test_sklearn_version_warning(self):
+        step = LazyPickleStep(pickle.dumps(StandardScaler()), ['fit', 'transform'], 'StandardScaler', sklearn_version='0.0')
+        with self.assertWarnsRegex(UserWarning, 'pickled with sklearn 0.0'):
+            step.load()
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            step.load()
+            LazyPickleStep.from_step(StandardScaler()).load()
+
+    def test_config_reference_and_cache(self):
+        load_shipped_pipeline().save_artifact(self.artifact_path)
+        config_path = Path(self.tmp_dir.name) / 'pipeline_config.json'
+        config_path.write_text('{"artifact": "model.vpnm", "inference_engine": "flat_trees"}')
+
+        first = ModelPipeline.from_config(config_path)
+        second = ModelPipeline.from_config(self.artifact_path)
+        self.assertEqual(first.inference_engine, 'flat_trees')
+        self.assertIs(first.pipeline.steps[2][1], second.pipeline.steps[2][1])
+        self.assertIs(load_artifact(self.artifact_path), load_artifact(config_path.parent / 'model.vpnm'))
+
+    def test_lazy_pickle_step(self):
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(100, 3))
+        y = (X[:, 0] > 0).astype(int)
+        scaler = StandardScaler().fit(X)
+        model_pipeline = ModelPipeline([('scaler', scaler), ('classifier', LogisticRegression().fit(scaler.transform(X), y))])
+        model_pipeline.save_artifact(self.artifact_path)
+
+        loaded = ModelPipeline.from_artifact(self.artifact_path)
+        classifier = loaded.pipeline.named_steps['classifier']
+        self.assertIsInstance(classifier, LazyPickleStep)
+        self.assertFalse(classifier.is_loaded())
+        self.assertFalse(hasattr(classifier, 'transform'))
+        self.assertFalse(classifier.is_loaded())
+
+        schema = FeatureSchema(['a', 'b', 'c'])
+        np.testing.assert_array_equal(loaded.predict_array(X, schema), model_pipeline.predict_array(X, schema))
+        self.assertTrue(classifier.is_loaded())
+
+    def test_overwrite_while_loaded(self):
+        model_pipeline = load_shipped_pipeline()
+        model_pipeline.save_artifact(self.artifact_path)
+        loaded = ModelPipeline.from_config(self.artifact_path)
+
+        feature_names = list(model_pipeline.get_feature_names())
+        data = pd.read_csv(ROOT / 'vpn-data' / 'xray-order.csv')[feature_names].dropna().to_numpy()
+        schema = FeatureSchema(feature_names)
+        expected = model_pipeline.predict_array(data, schema)
+
+        # A smaller model exported over the file the loaded pipeline maps
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(100, len(feature_names)))
+        ModelPipeline([('classifier', LogisticRegression().fit(X, (X[:, 0] > 0).astype(int)))]).save_artifact(self.artifact_path)
+
+        np.testing.assert_array_equal(loaded.predict_array(data, schema), expected)
+        reloaded = ModelPipeline.from_config(self.artifact_path)
+        self.assertEqual([name for name, step in reloaded.pipeline.steps], ['classifier'])
+        self.assertEqual([path.name for path in Path(self.tmp_dir.name).iterdir()], ['model.vpnm'])
+
+    def test_cache_keeps_newest_version(self):
+        load_shipped_pipeline().save_artifact(self.artifact_path)
+        first = load_artifact(self.artifact_path)
+        X = np.random.default_rng(0).normal(size=(100, 3))
+        ModelPipeline([('scaler', StandardScaler().fit(X))]).save_artifact(self.artifact_path)
+        second = load_artifact(self.artifact_path)
+
+        self.assertIsNot(first, second)
+        self.assertIs(second, load_artifact(self.artifact_path))
+        cached = [artifact for version, artifact in _artifact_cache.values()]
+        self.assertIn(second, cached)
+        self.assertNotIn(first, cached)
+
+    def test_corrupted_artifact(self):
+        load_shipped_pipeline().save_artifact(self.artifact_path)
+        data = bytearray(self.artifact_path.read_bytes())
+        data[-1] ^= 0xff
+        self.artifact_path.write_bytes(bytes(data))
+        with self.assertRaisesRegex(ValueError, 'hash'):
+            ModelPipeline.from_artifact(self.artifact_path)
+
+    def test_format_version(self):
+        load_shipped_pipeline().save_artifact(self.artifact_path)
+        data = bytearray(self.artifact_path.read_bytes())
+        magic, version, manifest_length = ARTIFACT_HEADER.unpack_from(data)
+        ARTIFACT_HEADER.pack_into(data, 0, magic, version + 1, manifest_length)
+        self.artifact_path.write_bytes(bytes(data))
+        with self.assertRaisesRegex(ValueError, 'format version'):
+            ModelPipeline.from_artifact(self.artifact_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
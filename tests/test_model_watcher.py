@@ -0,0 +1,155 @@
+import os
+import io
+import sys
+import json
+import pickle
+import tempfile
+import unittest
+import contextlib
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.model_watcher import ModelWatcher, model_version
+from core.feature.feature_schema import FeatureSchema
+from core.sniffer.detect_worker import DetectWorker
+from test_detect_worker_base import ConstantPipeline, make_packet
+
+
+FEATURE_NAMES = ['avg_packet_length', 'avg_iat']
+
+
+class StubWatcher:
+    def __init__(self, model_version):
+        self.model_version = model_version
+        self.update = None
+
+    def take_update(self):
+        update, self.update = self.update, None
+        return update
+
+
+class TestModelWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.model_dir = Path(self.tmp_dir.name)
+
+        X = pd.DataFrame(np.random.RandomState(0).normal(size=(40, 2)), columns=FEATURE_NAMES)
+        y = np.where(X['avg_packet_length'] > 0, 'vpn', 'normal')
+        self.dump('scaler.pkl', StandardScaler().fit(X))
+        self.dump('clf.pkl', LogisticRegression().fit(X, y))
+        self.config_path = self.model_dir / 'pipeline_config.json'
+        self.write_config({})
+
+    def dump(self, file_name, step):
+        with open(self.model_dir / file_name, 'wb') as f:
+            pickle.dump(step, f)
+
+    def write_config(self, extra):
+        config = dict(extra, steps={'scaler': 'scaler.pkl', 'classifier': 'clf.pkl'})
+        self.config_path.write_text(json.dumps(config))
+        self.touch(self.config_path)
+
+    def touch(self, path):
+        # Make the change visible even on filesystems with coarse timestamps
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def make_watcher(self):
+        return ModelWatcher(self.config_path, schema=FeatureSchema(FEATURE_NAMES), poll_interval=0.01)
+
+    def test_version_label(self):
+        version = model_version(self.config_path)
+        self.assertEqual(len(version), 12)
+        self.assertEqual(model_version(self.config_path), version)
+
+        self.write_config({'version': 'v2'})
+        self.assertEqual(model_version(self.config_path), 'v2')
+
+    def test_reload_on_change(self):
+        watcher = self.make_watcher()
+        self.assertFalse(watcher.check())
+        self.assertIsNone(watcher.take_update())
+
+        self.write_config({'version': 'v2'})
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(watcher.check())
+        self.assertFalse(watcher.check())
+
+        version, model_pipeline = watcher.take_update()
+        self.assertEqual(version, 'v2')
+        self.assertEqual(watcher.model_version, 'v2')
+        self.assertEqual(list(model_pipeline.get_feature_names()), FEATURE_NAMES)
+        self.assertIsNone(watcher.take_update())
+        self.assertEqual(watcher.reload_number, 1)
+
+    def test_broken_model_is_not_published(self):
+        watcher = self.make_watcher()
+        old_version = watcher.model_version
+
+        (self.model_dir / 'clf.pkl').write_bytes(b'not a pickle')
+        self.touch(self.model_dir / 'clf.pkl')
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            self.assertFalse(watcher.check())
+
+        self.assertEqual(watcher.failed_reload_number, 1)
+        self.assertEqual(watcher.reload_number, 0)
+        self.assertIsNone(watcher.take_update())
+        self.assertEqual(watcher.model_version, old_version)
+
+    def test_thread_picks_up_change(self):
+        watcher = self.make_watcher()
+        watcher.start()
+        self.addCleanup(watcher.stop)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.write_config({'version': 'v3'})
+            for _ in range(500):
+                update = watcher.take_update()
+                if update is not None:
+                    break
+                watcher._stop_event.wait(0.01)
+        self.assertEqual(update[0], 'v3')
+
+
+class TestDetectWorkerSwapModel(unittest.TestCase):
+    def make_worker(self, watcher, verdicts):
+        return DetectWorker(
+            ConstantPipeline('normal'),
+            start_packet_number_threshold=10,
+            end_packet_number_threshold=30,
+            total_detected_flow_threshold=1,
+            predict_batch_size=1000,
+            predict_max_latency=1000.0,
+            verdict_callback=verdicts.append,
+            model_watcher=watcher
+        )
+
+    def feed(self, worker, src, start_time):
+        for i in range(12):
+            worker._packet_processing(make_packet(start_time + i * 0.01, src, 100 * (i % 5)))
+
+    def test_pending_batch_uses_old_model(self):
+        verdicts = []
+        watcher = StubWatcher('v1')
+        worker = self.make_worker(watcher, verdicts)
+        self.assertEqual(worker.model_version, 'v1')
+
+        self.feed(worker, '10.0.0.1', 1000.0)
+        watcher.update = ('v2', ConstantPipeline('vpn'))
+        worker.poll()
+        self.feed(worker, '10.0.0.2', 1001.0)
+        worker.flush()
+
+        self.assertEqual(worker.model_version, 'v2')
+        self.assertEqual([(verdict.label, verdict.model_version) for verdict in verdicts], [('normal', 'v1'), ('vpn', 'v2')])
+        self.assertEqual(worker.get_model_statistic(), {'model_version': 'v2', 'verdicts': {'v1': 1, 'v2': 1}})
+
+
+if __name__ == '__main__':
+    unittest.main()
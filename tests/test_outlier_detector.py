@@ -0,0 +1,82 @@
+import sys
+import pickle
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.outliners import OutlierDetector
+from core.feature.feature_schema import FeatureSchema
+
+
+def merge_predict(detector, dataframe):
+    # The per-feature merge OutlierDetector.predict used to run
+    is_outlier = pd.Series(False, index=dataframe.index)
+    for feature in detector.feature_columns:
+        stats_df = pd.DataFrame(detector.stats_.get(feature, {})).T.rename_axis(detector.group_column)
+        merged = dataframe.merge(stats_df, on=detector.group_column, how='left', suffixes=('', '_stats'))
+        z_scores = (merged[feature] - merged['mean']) / merged['std']
+        is_outlier |= (z_scores.abs() > detector.z_score_threshold).fillna(False)
+    return is_outlier
+
+
+def make_frame(rng, row_number, group_number):
+    dataframe = pd.DataFrame({
+        'group': rng.integers(group_number, size=row_number).astype(float),
+        'a': rng.normal(size=row_number),
+        'b': rng.exponential(size=row_number),
+        'c': rng.integers(3, size=row_number).astype(float),
+    })
+    dataframe.loc[rng.random(row_number) < 0.05, 'a'] = np.nan
+    return dataframe
+
+
+class TestOutlierDetector(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        train = make_frame(rng, 400, 6)
+        # Single-row group (std is NaN) and a constant group (std is 0)
+        train.loc[len(train)] = [100.0, 1.0, 1.0, 1.0]
+        train = pd.concat([train, pd.DataFrame({'group': 200.0, 'a': 0.5, 'b': 2.0, 'c': 1.0}, index=[0, 1, 2])], ignore_index=True)
+
+        self.detector = OutlierDetector('group', ['a', 'b', 'c'], z_score_threshold=1.5)
+        self.detector.fit(train)
+
+        test = make_frame(rng, 300, 9)
+        test.loc[0] = [100.0, 5.0, 5.0, 5.0]
+        test.loc[1] = [200.0, 0.5, 2.5, 1.0]
+        test.loc[2] = [200.0, 0.5, 2.0, 1.0]
+        test.loc[3] = [np.nan, 50.0, 50.0, 50.0]
+        self.test = test
+
+    def test_matches_merge(self):
+        expected = merge_predict(self.detector, self.test)
+        self.assertGreater(expected.sum(), 0)
+        pd.testing.assert_series_equal(self.detector.predict(self.test), expected)
+
+    def test_edge_groups(self):
+        is_outlier = self.detector.predict(self.test)
+        self.assertFalse(is_outlier[0])  # std NaN
+        self.assertTrue(is_outlier[1])   # std 0, value differs from mean
+        self.assertFalse(is_outlier[2])  # std 0, value equals mean
+        self.assertFalse(is_outlier[3])  # group not seen in fit
+
+    def test_predict_array(self):
+        schema = FeatureSchema(['c', 'x', 'group', 'b', 'a'])
+        X = np.column_stack([self.test['c'], np.zeros(len(self.test)), self.test['group'], self.test['b'], self.test['a']])
+        np.testing.assert_array_equal(
+            self.detector.predict_array(X, schema),
+            merge_predict(self.detector, self.test).to_numpy()
+        )
+
+    def test_pickle_recompiles(self):
+        state = self.detector.__getstate__()
+        self.assertNotIn('_means', state)
+        detector = pickle.loads(pickle.dumps(self.detector))
+        pd.testing.assert_series_equal(detector.predict(self.test), merge_predict(self.detector, self.test))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import sys
+import warnings
+import pickle
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import LocalOutlierFactor
+from sklearn.preprocessing import StandardScaler
+from sklearn.pipeline import Pipeline
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.model_filter import OutlierPipeline
+from core.models.outliners import OutlierDetector, DBSCANWrapper
+from core.feature.feature_schema import FeatureSchema
+
+
+def sequential_predict(model_filter, dataframe):
+    # The pandas stage chain OutlierPipeline.predict used to run
+    outliers = pd.Series(False, index=dataframe.index)
+    outliers |= model_filter.zscore_model.predict(dataframe)
+    remaining_data = dataframe[~outliers][model_filter.lof_pipeline.feature_names_in_]
+    outliers |= pd.Series(model_filter.lof_pipeline.predict(remaining_data) == -1, index=remaining_data.index)
+    remaining_data = dataframe[~outliers][model_filter.dbscan_pipeline.feature_names_in_]
+    outliers |= pd.Series(model_filter.dbscan_pipeline.predict(remaining_data) == -1, index=remaining_data.index)
+    return outliers
+
+
+def make_frame(rng, row_number):
+    return pd.DataFrame({
+        'group': rng.integers(4, size=row_number).astype(float),
+        'a': rng.normal(size=row_number),
+        'b': rng.normal(size=row_number),
+        'c': rng.exponential(size=row_number),
+    })
+
+
+class TestOutlierPipeline(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        train = make_frame(rng, 400)
+
+        zscore_model = OutlierDetector('group', ['a', 'c'], z_score_threshold=2)
+        zscore_model.fit(train)
+        lof_pipeline = Pipeline([
+            ('scaler', StandardScaler()),
+            ('lof', LocalOutlierFactor(n_neighbors=20, novelty=True)),
+        ]).fit(train[['b', 'c']])
+        dbscan_pipeline = Pipeline([
+            ('scaler', StandardScaler()),
+            ('dbscan', DBSCANWrapper(eps=0.05, min_samples=3, metric='cosine')),
+        ]).fit(train[['a', 'b']])
+
+        self.model_filter = OutlierPipeline(zscore_model, lof_pipeline, dbscan_pipeline)
+        self.test = make_frame(rng, 300) * [1, 1.5, 1.5, 1.5]
+
+    def test_matches_sequential(self):
+        expected = sequential_predict(self.model_filter, self.test)
+        self.assertGreater(expected.sum(), 0)
+        pd.testing.assert_series_equal(self.model_filter.predict(self.test), expected)
+
+    def test_non_numeric_columns(self):
+        test = self.test.assign(Flow='10.0.0.1:40000<-->1.2.3.4:443', label='vpn')
+        pd.testing.assert_series_equal(self.model_filter.predict(test), sequential_predict(self.model_filter, self.test))
+
+    def test_stage_order_does_not_change_result(self):
+        expected = self.model_filter.predict(self.test)
+        self.model_filter.set_stage_order(('dbscan', 'lof', 'zscore'))
+        pd.testing.assert_series_equal(self.model_filter.predict(self.test), expected)
+        with self.assertRaises(ValueError):
+            self.model_filter.set_stage_order(('knn',))
+
+    def test_statistic(self):
+        schema = FeatureSchema(['c', 'b', 'a', 'group'])
+        X = self.test[schema.feature_names].to_numpy()
+        outliers = self.model_filter.predict_array(X, schema)
+
+        statistic = self.model_filter.get_statistic()
+        self.assertEqual(list(statistic), ['zscore', 'lof', 'dbscan'])
+        self.assertEqual(statistic['zscore']['rows'], len(X))
+        self.assertEqual(statistic['lof']['rows'], len(X) - statistic['zscore']['rejected'])
+        self.assertEqual(statistic['dbscan']['rows'], statistic['lof']['rows'] - statistic['lof']['rejected'])
+        self.assertEqual(sum(stage['rejected'] for stage in statistic.values()), outliers.sum())
+
+    def test_no_feature_name_warnings(self):
+        schema = FeatureSchema(['c', 'b', 'a', 'group'])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.model_filter.predict_array(self.test[schema.feature_names].to_numpy(), schema)
+        self.assertEqual([], [str(warning.message) for warning in caught if 'feature names' in str(warning.message)])
+
+    def test_skips_stages_without_rows(self):
+        self.model_filter.zscore_model.z_score_threshold = -1
+        self.assertTrue(self.model_filter.predict(self.test).all())
+        statistic = self.model_filter.get_statistic()
+        self.assertEqual(statistic['lof']['calls'], 0)
+        self.assertEqual(statistic['dbscan']['calls'], 0)
+
+    def test_old_pickle(self):
+        del self.model_filter.stage_order
+        del self.model_filter.stage_statistic
+        model_filter = pickle.loads(pickle.dumps(self.model_filter))
+        pd.testing.assert_series_equal(model_filter.predict(self.test), sequential_predict(model_filter, self.test))
+        self.assertEqual(model_filter.get_statistic()['zscore']['rows'], len(self.test))
+
+
+if __name__ == '__main__':
+    unittest.main()
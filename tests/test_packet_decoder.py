@@ -0,0 +1,73 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scapy.all import Ether, Dot1Q, IP, IPv6, IPv6ExtHdrHopByHop, IPv6ExtHdrFragment, TCP, UDP, ARP, ICMP, CookedLinux
+
+from core.flow.flow_key import FlowKey, PacketRecord
+from core.flow.flow_storage import FlowStorage
+from core.sniffer.packet_decoder import decode_packet, DLT_RAW, DLT_LINUX_SLL
+
+
+class TestPacketDecoder(unittest.TestCase):
+    def setUp(self):
+        self.flow_storage = FlowStorage()
+
+    def _assert_same_as_scapy(self, pkt, linktype=1):
+        record = decode_packet(bytes(pkt), 12.5, linktype=linktype)
+
+        self.assertIsInstance(record, PacketRecord)
+        self.assertFalse(self.flow_storage.filter(pkt))
+        self.assertEqual(FlowKey.from_packet(pkt), record.flow_key)
+        self.assertEqual(len(pkt), len(record))
+        self.assertEqual(12.5, record.time)
+        return record
+
+    def test_ipv4_tcp(self):
+        self._assert_same_as_scapy(Ether() / IP(src="10.0.0.1", dst="1.1.1.1") / TCP(sport=5000, dport=443) / (b"x" * 100))
+
+    def test_ipv4_options(self):
+        self._assert_same_as_scapy(Ether() / IP(src="10.0.0.1", dst="1.1.1.1", options=b"\x01\x01\x01\x00") / UDP(sport=443, dport=5000))
+
+    def test_vlan(self):
+        self._assert_same_as_scapy(Ether() / Dot1Q(vlan=10) / Dot1Q(vlan=20) / IP(src="10.0.0.1", dst="1.1.1.1") / UDP(sport=5000, dport=443))
+
+    def test_ipv6(self):
+        self._assert_same_as_scapy(Ether() / IPv6(src="2001:db8::1", dst="2001:db8::2") / TCP(sport=443, dport=6000))
+
+    def test_ipv6_extension_headers(self):
+        pkt = Ether() / IPv6(src="2001:db8::1", dst="2001:db8::2") / IPv6ExtHdrHopByHop() / IPv6ExtHdrFragment(offset=0) / TCP(sport=443, dport=6000)
+        self._assert_same_as_scapy(pkt)
+
+    def test_raw_ip_and_cooked_linktypes(self):
+        self._assert_same_as_scapy(IP(src="10.0.0.1", dst="1.1.1.1") / TCP(sport=5000, dport=443), linktype=DLT_RAW)
+        self._assert_same_as_scapy(CookedLinux() / IP(src="10.0.0.1", dst="1.1.1.1") / TCP(sport=5000, dport=443), linktype=DLT_LINUX_SLL)
+
+    def test_wirelen(self):
+        pkt = Ether() / IP(src="10.0.0.1", dst="1.1.1.1") / TCP(sport=5000, dport=443) / (b"x" * 1400)
+        record = decode_packet(bytes(pkt)[:96], 0.0, wirelen=len(pkt))
+        self.assertEqual(len(pkt), len(record))
+
+    def test_filtered(self):
+        packets = [
+            Ether() / IP(src="10.0.0.1", dst="1.1.1.1") / TCP(sport=5000, dport=80),
+            Ether() / IP(src="10.0.0.1", dst="1.1.1.1") / ICMP(),
+            Ether() / ARP(),
+            Ether() / IP(src="10.0.0.1", dst="1.1.1.1", frag=10) / TCP(sport=5000, dport=443),
+            Ether() / IPv6(src="2001:db8::1", dst="2001:db8::2") / IPv6ExtHdrFragment(offset=4) / TCP(sport=443, dport=6000),
+        ]
+        for pkt in packets:
+            self.assertIsNone(decode_packet(bytes(pkt), 0.0))
+
+    def test_malformed_header_length(self):
+        for ihl in range(5):
+            # With IHL 1 the IP id would be read as the source port
+            pkt = Ether() / IP(src="10.0.0.1", dst="1.1.1.1", ihl=ihl, id=443) / TCP(sport=5000, dport=80)
+            self.assertIsNone(decode_packet(bytes(pkt), 0.0))
+
+    def test_truncated(self):
+        frame = bytes(Ether() / IP(src="10.0.0.1", dst="1.1.1.1") / TCP(sport=5000, dport=443))
+        for length in range(len(frame) - 20 + 3):
+            self.assertIsNone(decode_packet(frame[:length], 0.0))
@@ -0,0 +1,58 @@
+import sys
+import unittest
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils.ring_buffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_bounded_overwrites_oldest(self):
+        buffer = RingBuffer(4)
+        for value in range(6):
+            buffer.append(value)
+        self.assertEqual(4, len(buffer))
+        self.assertEqual([2, 3, 4, 5], buffer.values().tolist())
+        self.assertEqual(2, buffer[0])
+        self.assertEqual(5, buffer[-1])
+        with self.assertRaises(IndexError):
+            buffer[4]
+
+    def test_unbounded_grows(self):
+        buffer = RingBuffer(dtype=np.int32)
+        for value in range(100):
+            buffer.append(value)
+        self.assertEqual(list(range(100)), buffer.values().tolist())
+        self.assertEqual(np.int32, buffer.values().dtype)
+
+    def test_add_to_last(self):
+        buffer = RingBuffer(2, dtype=np.int32)
+        for value in [1, 1, 1]:
+            buffer.append(value)
+        buffer.add_to_last(4)
+        self.assertEqual([1, 5], buffer.values().tolist())
+
+    def test_insert(self):
+        buffer = RingBuffer(4)
+        for value in [1.0, 3.0, 4.0]:
+            buffer.append(value)
+        buffer.insert(1, 2.0)
+        self.assertEqual([1.0, 2.0, 3.0, 4.0], buffer.values().tolist())
+
+        # Full: the oldest value makes room
+        buffer.insert(3, 3.5)
+        self.assertEqual([2.0, 3.0, 3.5, 4.0], buffer.values().tolist())
+        buffer.append(5.0)
+        self.assertEqual([3.0, 3.5, 4.0, 5.0], buffer.values().tolist())
+
+        unbounded = RingBuffer()
+        for value in range(8):
+            unbounded.append(float(value))
+        unbounded.insert(0, -1.0)
+        self.assertEqual([-1.0] + [float(value) for value in range(8)], unbounded.values().tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import sys
+import json
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeClassifier
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.models.model_pipeline import ModelPipeline
+from core.sniffer.detect_worker import DetectWorker
+from core.sniffer.sharded_worker import ShardedDetector
+from test_detect_worker_base import make_packet
+
+
+WORKER_KWARGS = dict(
+    start_packet_number_threshold=10,
+    end_packet_number_threshold=30,
+    flow_number_for_detect=2,
+    total_detected_flow_threshold=1,
+    predict_batch_size=8
+)
+
+
+def make_capture():
+    """Flows of four client hosts; every flow sends packets both ways, long payloads are labelled vpn."""
+    records = []
+    for host_index in range(4):
+        host = f'10.0.0.{host_index + 1}'
+        for flow_index in range(6):
+            sport = 40000 + flow_index
+            payload_length = 100 + 100 * ((host_index + flow_index) % 4)
+            start_time = 1000.0 + flow_index * 0.1
+            for i in range(12):
+                if i % 3 == 2:
+                    record = make_packet(start_time + i * 0.01, '1.2.3.4', payload_length, sport=443, dst=host, dport=sport)
+                else:
+                    record = make_packet(start_time + i * 0.01, host, payload_length, sport=sport)
+                records.append(record)
+    records.sort(key=lambda record: record.time)
+    return records
+
+
+class TestShardedDetector(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        model_dir = Path(cls.tmp_dir.name)
+        X = pd.DataFrame({'avg_packet_length': np.arange(0, 600, 10.0), 'max_packet_length': np.arange(0, 600, 10.0)})
+        with open(model_dir / 'clf.pkl', 'wb') as f:
+            pickle.dump(DecisionTreeClassifier().fit(X, np.where(X['avg_packet_length'] > 300, 'vpn', 'normal')), f)
+        cls.config_path = model_dir / 'pipeline_config.json'
+        cls.config_path.write_text(json.dumps({'steps': {'classifier': 'clf.pkl'}}))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def make_detector(self, verdicts, **kwargs):
+        detector = ShardedDetector(self.config_path, 2, verdict_callback=verdicts.append, **dict(WORKER_KWARGS, **kwargs))
+        self.addCleanup(detector.stop)
+        return detector
+
+    def run_capture(self, consumer, records):
+        for record in records:
+            consumer.process_packet(record)
+        consumer.flush(expire_flows=True)
+
+    def test_matches_single_worker(self):
+        records = make_capture()
+        single_verdicts = []
+        worker = DetectWorker(ModelPipeline.from_config(self.config_path), verdict_callback=single_verdicts.append, **WORKER_KWARGS)
+        self.run_capture(worker, records)
+        sharded_verdicts = []
+        detector = self.make_detector(sharded_verdicts)
+        self.run_capture(detector, records)
+
+        def summary(verdicts):
+            return sorted((str(verdict.flow_key), verdict.timestamp, verdict.label, verdict.packet_number, verdict.total_length) for verdict in verdicts)
+
+        # Both directions of a flow end up in one flow of one shard
+        self.assertEqual(24, detector.get_created_flow_number())
+        self.assertEqual(worker.get_created_flow_number(), detector.get_created_flow_number())
+        self.assertEqual(summary(single_verdicts), summary(sharded_verdicts))
+        self.assertEqual({'vpn', 'normal'}, {verdict.label for verdict in sharded_verdicts})
+
+        # Per-host counters merged from both shards
+        host_keys = {verdict.flow_key.host_key for verdict in single_verdicts}
+        self.assertEqual(4, len(host_keys))
+        for host_key in host_keys:
+            expected = worker.host_verdicts.get(host_key)
+            merged = detector.host_verdicts.get(host_key)
+            self.assertEqual((expected.vpn_number, expected.non_vpn_number), (merged.vpn_number, merged.non_vpn_number))
+            self.assertEqual(worker.is_vpn_flow(host_key), detector.detection_rule(merged))
+        self.assertEqual(worker.get_host_statistic(), detector.get_host_statistic())
+
+    def test_host_window_capacity(self):
+        kwargs = dict(WORKER_KWARGS, flow_number_for_detect=100)
+        worker = DetectWorker(ModelPipeline.from_config(self.config_path), **kwargs)
+        detector = self.make_detector([], flow_number_for_detect=100)
+        self.assertEqual(100, detector.host_verdicts.window_capacity)
+        self.assertEqual(worker.host_verdicts.window_capacity, detector.host_verdicts.window_capacity)
+
+    def test_flush_without_expire(self):
+        verdicts = []
+        detector = self.make_detector(verdicts)
+        for record in make_capture():
+            detector.process_packet(record)
+        detector.flush()
+        # Every flow reached start_packet_number_threshold and was predicted once
+        self.assertEqual(24, len(verdicts))
+        self.assertEqual(24, len({verdict.flow_key for verdict in verdicts}))
+
+    def test_stop(self):
+        detector = self.make_detector([])
+        detector.stop()
+        self.assertFalse(any(process.is_alive() for process in detector._processes))
+
+    def test_bad_config_fails_before_fork(self):
+        with self.assertRaises(FileNotFoundError):
+            ShardedDetector('/nonexistent/pipeline_config.json', 2)
+
+    def test_dead_shard(self):
+        detector = self.make_detector([])
+        detector._processes[0].terminate()
+        detector._processes[0].join()
+        for record in make_capture():
+            detector.process_packet(record)
+        with self.assertRaisesRegex(RuntimeError, 'shard 0 exited'):
+            detector.flush()
+        self.assertFalse(any(process.is_alive() for process in detector._processes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.utils.timing_wheel import TimingWheel
+
+
+class TestTimingWheel(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimingWheel(tick=1.0, slot_number=8)
+        self.wheel.advance(100.0)
+
+    def test_expire_after_deadline_tick(self):
+        self.wheel.add(102.5, 'a')
+        self.wheel.add(101.2, 'b')
+        self.assertEqual(2, len(self.wheel))
+
+        self.assertEqual([], self.wheel.advance(101.9))
+        self.assertEqual(['b'], self.wheel.advance(102.9))
+        self.assertEqual(['a'], self.wheel.advance(103.0))
+        self.assertEqual(0, len(self.wheel))
+
+    def test_deadline_beyond_one_revolution(self):
+        self.wheel.add(120.0, 'far')
+        self.wheel.add(104.0, 'near')
+        self.assertEqual(['near'], self.wheel.advance(110.0))
+        self.assertEqual([], self.wheel.advance(118.0))
+        self.assertEqual(['far'], self.wheel.advance(121.0))
+
+    def test_time_jump(self):
+        for i in range(20):
+            self.wheel.add(100.0 + i, i)
+        self.assertEqual(list(range(20)), sorted(self.wheel.advance(1000.0)))
+
+    def test_time_going_back(self):
+        self.wheel.add(101.0, 'a')
+        self.assertEqual([], self.wheel.advance(95.0))
+        self.assertEqual(['a'], self.wheel.advance(102.0))
+
+    def test_past_deadline(self):
+        self.wheel.advance(110.0)
+        self.wheel.add(105.0, 'late')
+        self.assertEqual(['late'], self.wheel.advance(111.0))
+
+    def test_pop_all(self):
+        self.wheel.add(101.0, 'a')
+        self.wheel.add(150.0, 'b')
+        self.assertEqual(['a', 'b'], sorted(self.wheel.pop_all()))
+        self.assertEqual(0, len(self.wheel))
+        self.assertEqual([], self.wheel.advance(200.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import pickle
+import unittest
+from pathlib import Path
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from core.models.tree_ensemble import FlatTreeEnsemble
+
+
+def make_data(rng, row_number, class_number=2):
+    X = rng.normal(size=(row_number, 6))
+    y = np.array(['normal', 'vpn', 'other'])[(X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1) * (class_number - 2)]
+    return X, y
+
+
+class TestFlatTreeEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(5)
+        self.X_test = self.rng.normal(size=(3000, 6)) * 2
+
+    def assert_same_predictions(self, classifier, X_test=None):
+        X_test = self.X_test if X_test is None else X_test
+        flat = FlatTreeEnsemble.compile(classifier)
+        self.assertIsNotNone(flat)
+        np.testing.assert_array_equal(flat.predict(X_test), classifier.predict(X_test))
+        np.testing.assert_array_equal(flat.predict(X_test[:1]), classifier.predict(X_test[:1]))
+        return flat
+
+    def test_random_forest(self):
+        X, y = make_data(self.rng, 500)
+        classifier = RandomForestClassifier(n_estimators=15, max_features=2, criterion='entropy', random_state=0).fit(X, y)
+        flat = self.assert_same_predictions(classifier)
+        np.testing.assert_array_equal(flat.predict_proba(self.X_test), classifier.predict_proba(self.X_test))
+
+    def test_extra_trees_multiclass(self):
+        X, y = make_data(self.rng, 500, class_number=3)
+        self.assert_same_predictions(ExtraTreesClassifier(n_estimators=10, random_state=0).fit(X, y))
+
+    def test_gradient_boosting(self):
+        X, y = make_data(self.rng, 500)
+        classifier = GradientBoostingClassifier(n_estimators=30, random_state=0).fit(X, y)
+        flat = self.assert_same_predictions(classifier)
+        np.testing.assert_array_equal(flat.decision_function(self.X_test)[:, 0], classifier.decision_function(self.X_test))
+
+    def test_gradient_boosting_multiclass(self):
+        X, y = make_data(self.rng, 500, class_number=3)
+        classifier = GradientBoostingClassifier(n_estimators=10, random_state=0).fit(X, y)
+        flat = self.assert_same_predictions(classifier)
+        np.testing.assert_array_equal(flat.decision_function(self.X_test), classifier.decision_function(self.X_test))
+
+    def test_missing_values(self):
+        X, y = make_data(self.rng, 500)
+        X[self.rng.random(X.shape) < 0.1] = np.nan
+        classifier = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+        X_test = self.X_test.copy()
+        X_test[self.rng.random(X_test.shape) < 0.1] = np.nan
+        self.assert_same_predictions(classifier, X_test)
+
+    def test_shipped_model(self):
+        with open(ROOT / 'models' / 'interval-27-30-reality-0_915' / 'clf.pkl', 'rb') as f:
+            classifier = pickle.load(f)
+        self.assert_same_predictions(classifier, self.rng.normal(size=(3000, classifier.n_features_in_)))
+
+    def test_unsupported_estimator(self):
+        X, y = make_data(self.rng, 100)
+        self.assertIsNone(FlatTreeEnsemble.compile(LogisticRegression().fit(X, y)))
+
+
+if __name__ == '__main__':
+    unittest.main()
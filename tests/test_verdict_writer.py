@@ -0,0 +1,237 @@
+import io
+import sys
+import json
+import socket
+import tempfile
+import threading
+import unittest
+import http.server
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.flow.flow_key import FlowKey, IPPROTO_TCP
+from core.sniffer.verdict_writer import (
+    Verdict,
+    CsvVerdictWriter,
+    JsonLinesVerdictWriter,
+    RotatingVerdictWriter,
+    UnixSocketVerdictSink,
+    HttpVerdictSink,
+    DashboardVerdictSink,
+    VerdictStream
+)
+from core.utils.concurrent_queue import ConcurrentQueue
+
+
+def make_verdict(index, label='vpn', host_detected=False):
+    flow_key = FlowKey.from_addresses(4, 0x0a000001, 40000 + index, 0x01020304, 443, IPPROTO_TCP)
+    return Verdict(
+        1000.0 + index,
+        flow_key,
+        label,
+        30,
+        12345,
+        'v1',
+        flow_duration=0.5,
+        extract_time=0.01,
+        predict_time=0.002,
+        host_vpn_number=index + 1,
+        host_non_vpn_number=1,
+        host_detected=host_detected
+    )
+
+
+class ListSink:
+    def __init__(self, name='list'):
+        self.name = name
+        self.batches = []
+        self.closed = False
+
+    def write_batch(self, verdicts):
+        self.batches.append(list(verdicts))
+
+    def close(self):
+        self.closed = True
+
+
+class BlockedSink(ListSink):
+    def __init__(self):
+        super().__init__('blocked')
+        self.release = threading.Event()
+
+    def write_batch(self, verdicts):
+        self.release.wait(5)
+        super().write_batch(verdicts)
+
+
+class FailingSink(ListSink):
+    def write_batch(self, verdicts):
+        raise OSError("consumer is gone")
+
+
+class TestVerdictStream(unittest.TestCase):
+    def test_batches_and_close(self):
+        sink = ListSink()
+        stream = VerdictStream([sink], batch_size=4, flush_interval=10)
+        for index in range(10):
+            stream(make_verdict(index))
+        stream.close()
+
+        self.assertTrue(sink.closed)
+        self.assertEqual(list(range(10)), [int(verdict.timestamp) - 1000 for batch in sink.batches for verdict in batch])
+        self.assertTrue(all(len(batch) <= 4 for batch in sink.batches))
+        statistic = stream.get_statistic()['list']
+        self.assertEqual(10, statistic['written'])
+        self.assertEqual(0, statistic['dropped'])
+
+    def test_flush_interval(self):
+        sink = ListSink()
+        stream = VerdictStream([sink], batch_size=100, flush_interval=0.05)
+        self.addCleanup(stream.close)
+        stream(make_verdict(0))
+        for _ in range(100):
+            if sink.batches:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(1, len(sink.batches))
+
+    def test_slow_sink_drops_instead_of_blocking(self):
+        blocked = BlockedSink()
+        fast = ListSink()
+        stream = VerdictStream([blocked, fast], buffer_size=20, batch_size=2, flush_interval=0.01)
+        for index in range(100):
+            stream(make_verdict(index))
+            threading.Event().wait(0.002)
+
+        # The fast sink gets every verdict while the blocked one sheds them
+        for _ in range(200):
+            if stream.get_statistic()['list']['written'] == 100:
+                break
+            threading.Event().wait(0.01)
+        blocked.release.set()
+        stream.close()
+
+        statistic = stream.get_statistic()
+        self.assertEqual(100, statistic['list']['written'])
+        self.assertGreater(statistic['blocked']['dropped'], 0)
+        self.assertEqual(100, statistic['blocked']['written'] + statistic['blocked']['dropped'])
+
+    def test_failing_sink(self):
+        failing = FailingSink('failing')
+        sink = ListSink()
+        stream = VerdictStream([failing, sink], drop_policy=ConcurrentQueue.BLOCK)
+        for index in range(5):
+            stream(make_verdict(index))
+        stream.close()
+
+        statistic = stream.get_statistic()
+        self.assertEqual(5, statistic['failing']['failed'])
+        self.assertIn("consumer is gone", statistic['failing']['last_error'])
+        self.assertEqual(5, statistic['list']['written'])
+
+
+class TestVerdictSinks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name)
+
+    def test_csv(self):
+        writer = CsvVerdictWriter(self.path / 'verdicts.csv')
+        writer.write_batch([make_verdict(0)])
+        writer(make_verdict(1, 'normal'))
+        writer.close()
+
+        lines = (self.path / 'verdicts.csv').read_text().splitlines()
+        self.assertEqual(','.join(CsvVerdictWriter.FIELDS), lines[0])
+        self.assertEqual('1001.0,1.2.3.4:443<-->10.0.0.1:40001,1.2.3.4<-->10.0.0.1,normal,30,12345,v1', lines[2])
+        self.assertEqual(2, writer.verdict_number)
+
+    def test_json_lines(self):
+        writer = JsonLinesVerdictWriter(self.path / 'verdicts.jsonl')
+        writer.write_batch([make_verdict(0), make_verdict(1, 'normal', True)])
+        writer.close()
+
+        records = [json.loads(line) for line in (self.path / 'verdicts.jsonl').read_text().splitlines()]
+        self.assertEqual(['vpn', 'normal'], [record['label'] for record in records])
+        self.assertEqual('1.2.3.4<-->10.0.0.1', records[0]['host_pair'])
+        self.assertEqual(2, records[1]['host_vpn_number'])
+        self.assertTrue(records[1]['host_detected'])
+
+    def test_rotation(self):
+        path = self.path / 'verdicts.jsonl'
+        writer = RotatingVerdictWriter(path, max_bytes=1000, backup_count=2)
+        for index in range(20):
+            writer.write_batch([make_verdict(index)])
+        writer.close()
+
+        self.assertEqual(
+            ['verdicts.jsonl', 'verdicts.jsonl.1', 'verdicts.jsonl.2'],
+            sorted(file.name for file in self.path.iterdir())
+        )
+        self.assertTrue(all(file.stat().st_size <= 1000 for file in self.path.iterdir()))
+        last = json.loads(path.read_text().splitlines()[-1])
+        self.assertEqual('1.2.3.4:443<-->10.0.0.1:40019', last['flow'])
+
+    def test_unix_socket(self):
+        address = str(self.path / 'verdicts.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(address)
+        server.listen(1)
+
+        sink = UnixSocketVerdictSink(address)
+        sink.write_batch([make_verdict(0), make_verdict(1)])
+        connection, _ = server.accept()
+        self.addCleanup(connection.close)
+        sink.close()
+
+        data = b''
+        while True:
+            chunk = connection.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        self.assertEqual(2, len(data.splitlines()))
+
+    def test_unix_socket_without_reader(self):
+        sink = UnixSocketVerdictSink(str(self.path / 'missing.sock'))
+        with self.assertRaises(OSError):
+            sink.write_batch([make_verdict(0)])
+
+    def test_http(self):
+        bodies = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                bodies.append((self.headers['Content-Type'], self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        sink = HttpVerdictSink(f"http://127.0.0.1:{server.server_port}/verdicts")
+        sink.write_batch([make_verdict(0), make_verdict(1)])
+        self.assertEqual(1, len(bodies))
+        self.assertEqual('application/x-ndjson', bodies[0][0])
+        self.assertEqual(2, len(bodies[0][1].splitlines()))
+
+    def test_dashboard(self):
+        output = io.StringIO()
+        dashboard = DashboardVerdictSink(output)
+        dashboard.write_batch([make_verdict(0), make_verdict(1, 'normal', True), make_verdict(2, host_detected=True)])
+
+        self.assertEqual(1, output.getvalue().count("Flow Group: 1.2.3.4<-->10.0.0.1"))
+        self.assertIn("VPN flows to node: 3\n", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,43 @@
+import glob
 import argparse
 import threading
 from pathlib import Path
 from core.sniffer.sniffer import Sniffer
+from core.sniffer.pcap_sniffer import PcapSniffer
 from core.sniffer.detect_worker import DetectWorker
+from core.sniffer.sharded_worker import ShardedDetector
+from core.sniffer.verdict_writer import (
+    CsvVerdictWriter,
+    JsonLinesVerdictWriter,
+    RotatingVerdictWriter,
+    UnixSocketVerdictSink,
+    HttpVerdictSink,
+    DashboardVerdictSink,
+    VerdictStream
+)
 from core.models.model_pipeline import ModelPipeline
+from core.models.model_watcher import ModelWatcher, model_version
+from core.feature.feature_storage import FeatureStorage
+from core.utils.concurrent_queue import ConcurrentQueue
 
 
 def make_argparser():
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
-    parser.add_argument(
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
         "-i",
         "--iface",
         type=str,
-        required=True,
         help="Listening interface",
     )
+    source.add_argument(
+        "--pcap",
+        type=str,
+        nargs="+",
+        help="Analyze pcap/pcapng files (glob patterns are expanded) instead of live capture",
+    )
     parser.add_argument(
         "-c",
         "--model_pipeline_config",
@@ -45,18 +66,269 @@ def make_argparser():
         default=10000,
         help="Set the maximum allowed number of threads to be processed. If exceeded, the oldest flow will be destroyed"
     )
+    parser.add_argument(
+        "--flow_max_age",
+        type=float,
+        default=3,
+        help="Expire a flow this many seconds (packet time) after its first packet"
+    )
+    parser.add_argument(
+        "--flow_idle_timeout",
+        type=float,
+        default=None,
+        help="Expire a flow this many seconds (packet time) after its last packet"
+    )
+    parser.add_argument(
+        "--host_storage_size",
+        type=int,
+        default=10000,
+        help="Maximum number of host pairs with VPN/non-VPN verdict counters; the least recently seen is forgotten first"
+    )
+    parser.add_argument(
+        "--host_ttl",
+        type=float,
+        default=600,
+        help="Forget the counters of a host pair this many seconds (packet time) after its last verdict"
+    )
+    parser.add_argument(
+        "--host_decay",
+        type=float,
+        default=None,
+        help="Half-life in seconds of the per-host verdict counters; without it they are plain counts"
+    )
+    parser.add_argument(
+        "--full_dissection",
+        action="store_true",
+        help="Dissect every captured packet with scapy instead of the raw header decoder"
+    )
+    parser.add_argument(
+        "--ring",
+        action="store_true",
+        help="Capture through a TPACKET_V3 memory-mapped ring and hand packets to the worker in blocks"
+    )
+    parser.add_argument(
+        "--header_only",
+        action="store_true",
+        help="Copy only the first bytes (headers) of every packet out of the kernel; the wire length is kept for the features"
+    )
+    parser.add_argument(
+        "--no_kernel_filter",
+        action="store_true",
+        help="Do not attach the BPF filter that keeps only TCP/UDP port 443 in the kernel"
+    )
+    parser.add_argument(
+        "-b",
+        "--batch_size",
+        type=int,
+        default=64,
+        help="Number of flows predicted together in one model call"
+    )
+    parser.add_argument(
+        "-l",
+        "--batch_latency",
+        type=float,
+        default=0.05,
+        help="Maximum time in seconds a flow waits for its batch to be predicted"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of detection processes; flows are sharded between them by flow key hash"
+    )
+    parser.add_argument(
+        "-q",
+        "--queue_size",
+        type=int,
+        default=100000,
+        help="Capacity of the packet queue between capture and detection"
+    )
+    parser.add_argument(
+        "--drop_policy",
+        choices=ConcurrentQueue.DROP_POLICIES,
+        default=ConcurrentQueue.DROP_NEWEST,
+        help="What to do with captured packets when the queue is full"
+    )
+    parser.add_argument(
+        "--reload_interval",
+        type=float,
+        default=0,
+        help="Check the model config every given number of seconds and swap in changed models without a restart (0 disables)"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("verdicts.csv"),
+        help="CSV file for per-flow verdicts in --pcap mode"
+    )
+    parser.add_argument(
+        "--verdict_jsonl",
+        type=Path,
+        default=None,
+        help="Append per-flow verdicts as JSON Lines to this file"
+    )
+    parser.add_argument(
+        "--verdict_rotate_size",
+        type=int,
+        default=0,
+        help="Rotate the --verdict_jsonl file once it grows past this many bytes (0 disables)"
+    )
+    parser.add_argument(
+        "--verdict_rotate_backups",
+        type=int,
+        default=5,
+        help="Number of rotated --verdict_jsonl files kept"
+    )
+    parser.add_argument(
+        "--verdict_socket",
+        type=str,
+        default=None,
+        help="Stream per-flow verdicts as JSON Lines to this Unix socket"
+    )
+    parser.add_argument(
+        "--verdict_http",
+        type=str,
+        default=None,
+        help="POST batches of per-flow verdicts as JSON Lines to this URL"
+    )
+    parser.add_argument(
+        "--verdict_buffer_size",
+        type=int,
+        default=10000,
+        help="Verdicts queued for every output before new ones are dropped in live mode"
+    )
+    parser.add_argument(
+        "--no_dashboard",
+        action="store_true",
+        help="Do not draw the terminal dashboard of detected VPN nodes in live mode"
+    )
 
     return parser
 
-if __name__ == "__main__":
-    args = make_argparser().parse_args()
-    model_pipeline = ModelPipeline.from_config(args.model_pipeline_config)
-    consumer = DetectWorker(
-        model_pipeline,
+def expand_pcap_paths(patterns):
+    pcap_paths = []
+    for pattern in patterns:
+        pcap_paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return pcap_paths
+
+def make_verdict_sinks(args):
+    sinks = []
+    if args.verdict_jsonl is not None:
+        if args.verdict_rotate_size:
+            sinks.append(RotatingVerdictWriter(args.verdict_jsonl, args.verdict_rotate_size, args.verdict_rotate_backups))
+        else:
+            sinks.append(JsonLinesVerdictWriter(args.verdict_jsonl))
+    if args.verdict_socket is not None:
+        sinks.append(UnixSocketVerdictSink(args.verdict_socket))
+    if args.verdict_http is not None:
+        sinks.append(HttpVerdictSink(args.verdict_http))
+    return sinks
+
+def print_verdict_statistic(verdict_stream):
+    for name, statistic in verdict_stream.get_statistic().items():
+        print(
+            f"Verdict output {name}: {statistic['written']} written, "
+            f"{statistic['dropped']} dropped, {statistic['failed']} failed"
+        )
+
+def make_consumer(args, verdict_callback=None):
+    worker_kwargs = dict(
         start_packet_number_threshold=args.start_threshold,
         end_packet_number_threshold=args.end_threshold,
-        flow_storage_size=args.flow_storage_size
+        flow_storage_size=args.flow_storage_size,
+        flow_max_age=args.flow_max_age,
+        flow_idle_timeout=args.flow_idle_timeout,
+        host_storage_size=args.host_storage_size,
+        host_ttl=args.host_ttl,
+        host_decay_half_life=args.host_decay,
+        predict_batch_size=args.batch_size,
+        predict_max_latency=args.batch_latency
+    )
+    if args.workers > 1:
+        return ShardedDetector(
+            args.model_pipeline_config,
+            args.workers,
+            max_latency=args.batch_latency,
+            verdict_callback=verdict_callback,
+            model_reload_interval=args.reload_interval,
+            **worker_kwargs
+        )
+
+    model_watcher = None
+    if args.reload_interval:
+        model_watcher = ModelWatcher(args.model_pipeline_config, FeatureStorage.get_schema(), poll_interval=args.reload_interval)
+        model_watcher.start()
+
+    return DetectWorker(
+        ModelPipeline.from_config(args.model_pipeline_config),
+        verdict_callback=verdict_callback,
+        model_version=model_version(args.model_pipeline_config),
+        model_watcher=model_watcher,
+        **worker_kwargs
+    )
+
+def run_offline(args):
+    verdict_writer = CsvVerdictWriter(args.output)
+    # Offline nothing is dropped: the capture is read only as fast as the outputs take verdicts
+    verdict_stream = VerdictStream([verdict_writer] + make_verdict_sinks(args), drop_policy=ConcurrentQueue.BLOCK)
+    consumer = make_consumer(args, verdict_callback=verdict_stream)
+    sniffer = PcapSniffer(consumer, expand_pcap_paths(args.pcap))
+    try:
+        sniffer.run()
+    finally:
+        verdict_stream.close()
+        if args.workers > 1:
+            consumer.stop()
+
+    print(sniffer.get_statistic())
+    print(f"{verdict_writer.verdict_number} verdicts written to {args.output}")
+    print_verdict_statistic(verdict_stream)
+    for model_version, verdict_number in consumer.get_model_statistic()['verdicts'].items():
+        print(f"Model {model_version}: {verdict_number} verdicts")
+    if args.workers == 1:
+        expiry_statistic = consumer.get_expiry_statistic()
+        print(
+            f"Expired {expiry_statistic['expired_flows']} flows, "
+            f"{expiry_statistic['final_predictions']} of them got a final prediction"
+        )
+        for stage, statistic in consumer.model_pipeline.get_filter_statistic().items():
+            print(
+                f"Filter stage {stage}: rejected {statistic['rejected']} of {statistic['rows']} rows, "
+                f"{statistic['avg_time_spent'] * 1e3:.2f}ms per call"
+            )
+
+def run_live(args):
+    sinks = make_verdict_sinks(args)
+    if not args.no_dashboard:
+        sinks.append(DashboardVerdictSink())
+    # Outputs are written on their own threads; a slow one drops its verdicts instead of stalling detection
+    verdict_stream = VerdictStream(sinks, buffer_size=args.verdict_buffer_size)
+    consumer = make_consumer(args, verdict_callback=verdict_stream)
+    sniffer = Sniffer(
+        consumer,
+        args.iface,
+        raw_decode=not args.full_dissection,
+        queue_size=args.queue_size,
+        drop_policy=args.drop_policy,
+        kernel_filter=not args.no_kernel_filter,
+        ring=args.ring,
+        snaplen=Sniffer.HEADER_SNAPLEN if args.header_only else None
     )
-    sniffer = Sniffer(consumer, args.iface)
     thread_sniff = threading.Thread(target=sniffer.run, args=())
-    thread_sniff.start()
\ No newline at end of file
+    thread_sniff.start()
+
+if __name__ == "__main__":
+    args = make_argparser().parse_args()
+    if args.workers > 1 and args.full_dissection:
+        raise SystemExit("--workers requires the raw header decoder, drop --full_dissection")
+    if args.ring and args.full_dissection:
+        raise SystemExit("--ring requires the raw header decoder, drop --full_dissection")
+    if args.header_only and args.full_dissection:
+        raise SystemExit("--header_only requires the raw header decoder, drop --full_dissection")
+
+    if args.pcap:
+        run_offline(args)
+    else:
+        run_live(args)